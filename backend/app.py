@@ -1,15 +1,41 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
+import functools
+import hashlib
+import hmac
+import itertools
+import json
 import os
+import sys
+import threading
+import time
 
 # Import recommendation engine
 from model.recommendation_engine import RecommendationEngine
+from model.pipeline import (
+    RecommendationPipeline, InvertedIndexGenerator, CategoryGenerator,
+    TrendingGenerator, CoVisitationGenerator, CollaborativeGenerator
+)
+from model.diversity import MMRReranker
+from model.covisitation import event_time
 from services.product_api import ProductAPIService
+from services.facet_index import FACETS
+from services.interaction_log import InteractionLog
+from services.interaction_store import InteractionStore
+from services.refresh_scheduler import CatalogRefreshScheduler
+from services.product_json import ProductSerializer, parse_fields
+from utils import metrics
+from utils.logging_setup import configure_logging, logging_stats
+from utils.profiler import ProfilerBusy, SamplingProfiler
+from utils.metrics import CACHE_REQUESTS, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS, stage
 
 # Load environment variables
 load_dotenv()
 
+# Leveled, sampled logging through a background writer (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES)
+configure_logging()
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -24,6 +50,448 @@ CORS(app, resources={
 recommendation_engine = RecommendationEngine()
 product_api_service = ProductAPIService()
 
+# Product text vectors, the item-to-item similarity table and diversity vectors
+# are built into every catalog snapshot and swapped in with it
+catalog = product_api_service.catalog
+catalog.add_component('text_vectors', recommendation_engine.text_cache)
+catalog.add_component('similarity_table', recommendation_engine.similarity_builder)
+catalog.add_component('diversity_vectors', recommendation_engine.product_vectors)
+
+# Pre-serialized product JSON for list responses, rebuilt with every snapshot
+product_serializer = ProductSerializer()
+catalog.add_component('json_fragments', product_serializer)
+
+# Diversity re-ranking per endpoint; "diversity" in a request body overrides it
+DIVERSITY_RERANKERS = {
+    'recommendations': MMRReranker(recommendation_engine.product_vectors, diversity=0.3, max_per_category=8),
+    'similar-products': MMRReranker(recommendation_engine.product_vectors, diversity=0.2,
+                                    score_key='similarityScore')
+}
+
+# Catalog partitions are refreshed in the background; requests only read snapshots
+catalog_refresh = CatalogRefreshScheduler(
+    catalog,
+    interval=float(os.getenv('CATALOG_REFRESH_INTERVAL', 6 * 3600)),
+    hot_interval=float(os.getenv('CATALOG_HOT_REFRESH_INTERVAL', 3600)),
+    jitter=float(os.getenv('CATALOG_REFRESH_JITTER', 0.1))
+)
+
+def catalog_candidates(context, limit):
+    """Plain catalog query for the request filters, used when no generator produced candidates"""
+    return catalog.query(context['filters'], limit=limit)
+
+# Candidate generation -> ranking -> re-ranking for /api/recommendations
+recommendation_pipeline = RecommendationPipeline(
+    generators=[
+        InvertedIndexGenerator(catalog, budget_ms=40, limit=150),
+        CategoryGenerator(catalog, budget_ms=40, limit=100),
+        CollaborativeGenerator(catalog, recommendation_engine, budget_ms=40, limit=100),
+        CoVisitationGenerator(catalog, recommendation_engine, budget_ms=30, limit=50),
+        TrendingGenerator(catalog, recommendation_engine, budget_ms=20, limit=50)
+    ],
+    ranker=recommendation_engine.rank,
+    rerankers=[DIVERSITY_RERANKERS['recommendations']],
+    fallback=catalog_candidates
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Durable write-behind log for /api/track-interaction; models are fed from committed batches
+interaction_log = InteractionLog(
+    os.getenv('INTERACTION_LOG_DIR', os.path.join(DATA_DIR, 'interactions')),
+    max_buffer=int(os.getenv('INTERACTION_BUFFER_SIZE', 100000))
+)
+interaction_log.add_listener(recommendation_engine.train_on_interactions)
+
+# Columnar interaction history, compacted from sealed log segments in the background
+interaction_store = InteractionStore(
+    os.getenv('INTERACTION_STORE_DIR', os.path.join(DATA_DIR, 'interaction_store')),
+    interaction_log.directory
+)
+
+# On-demand stack sampling of this process (POST /api/admin/profile)
+profiler = SamplingProfiler(
+    os.getenv('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles')),
+    max_seconds=float(os.getenv('PROFILE_MAX_SECONDS', 300))
+)
+
+# Request methods reported as metric labels; anything else is counted as "other"
+METRIC_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'}
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and start its latency clock"""
+    g.request_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Record the request's latency and status when its response is closed,
+    so a streamed body is included in the latency
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    method = request.method if request.method in METRIC_METHODS else 'other'
+    status = str(response.status_code)
+    
+    def record():
+        HTTP_LATENCY.labels(endpoint, method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(endpoint, method, status).inc()
+        HTTP_IN_FLIGHT.dec()
+        if profiler.running:
+            profiler.request_finished()
+    
+    response.call_on_close(record)
+    return response
+
+def cache_counts():
+    """Hits and misses of caches that count for themselves"""
+    counts = {}
+    for cache, stats in (('profile_vectors', recommendation_engine.profile_encoder.stats()),
+                         ('json_fragments', product_serializer.stats())):
+        counts[(cache, 'hit')] = stats['hits']
+        counts[(cache, 'miss')] = stats['misses']
+    return counts
+
+def collect_catalog_metrics():
+    """Catalog snapshot and partition refresh state, read at scrape time"""
+    status = catalog.status()
+    partitions = catalog_refresh.status()
+    return [
+        ('catalog_snapshot_version', 'gauge', 'Version of the served catalog snapshot',
+         [({}, status['version'])]),
+        ('catalog_snapshot_build_seconds', 'gauge', 'Build time of the served catalog snapshot',
+         [({}, status['buildSeconds'])]),
+        ('catalog_products', 'gauge', 'Products in the served catalog snapshot',
+         [({}, status['products'])]),
+        ('catalog_loading', 'gauge', 'Whether a catalog snapshot is being built',
+         [({}, int(status['loading']))]),
+        ('catalog_partition_staleness_seconds', 'gauge', 'Seconds since a partition was last refreshed',
+         [({'partition': name}, state['stalenessSeconds']) for name, state in partitions.items()]),
+        ('catalog_partition_refresh_failures_total', 'counter', 'Failed refreshes per partition',
+         [({'partition': name}, state['failures']) for name, state in partitions.items()])
+    ]
+
+def collect_logging_metrics():
+    """Log records waiting for the writer thread and dropped because its queue was full"""
+    stats = logging_stats() or {'queued': None, 'dropped': None}
+    return [
+        ('log_records_queued', 'gauge', 'Log records waiting to be written', [({}, stats['queued'])]),
+        ('log_records_dropped_total', 'counter', 'Log records dropped on a full queue', [({}, stats['dropped'])])
+    ]
+
+CACHE_REQUESTS.add_callback(cache_counts)
+metrics.REGISTRY.add_collector(collect_catalog_metrics)
+metrics.REGISTRY.add_collector(collect_logging_metrics)
+
+def warm_up():
+    """Import the ML libraries, load the catalog (building its indexes and vectors) and stored history"""
+    recommendation_engine.warm_up()
+    try:
+        if not catalog.load():
+            app.logger.warning("⚠ No catalog loaded during warm-up, the refresh scheduler will retry")
+    except Exception as e:
+        app.logger.exception("❌ Error loading catalog during warm-up: %s", e)
+    recommendation_engine.load_interaction_history(interaction_store)
+
+def train_collaborative():
+    """Compact pending interactions and retrain the collaborative model"""
+    try:
+        interaction_store.compact()
+    except Exception as e:
+        app.logger.exception("❌ Error compacting interactions before training: %s", e)
+    recommendation_engine.train_collaborative(interaction_store)
+
+def train_models(retrain_interval, first_delay=0):
+    """Retrain the collaborative model from the interaction store periodically"""
+    time.sleep(first_delay)
+    while True:
+        train_collaborative()
+        time.sleep(retrain_interval)
+
+def warm_up_and_train(retrain_interval):
+    # Let the server come up and answer its first requests before the ML
+    # imports start competing with it for the GIL
+    time.sleep(WARM_UP_DELAY)
+    warm_up()
+    catalog_refresh.start()
+    train_models(retrain_interval)
+
+def gunicorn_preloading():
+    """
+    Check whether this is a gunicorn master preloading the app with
+    gunicorn.conf.py, whose post_fork hook starts the background tasks
+    in every worker
+    
+    Any other way of running the app (python app.py, flask run, another
+    server or config) starts the background tasks on import instead.
+    """
+    return 'gunicorn' in sys.modules and os.environ.get(PRELOAD_MARKER) == '1'
+
+def preload():
+    """
+    Build all shared state up front, for gunicorn's preload mode
+    
+    Runs in the master process: the catalog snapshot (indexes, vectors and
+    similarity table) and the trained models are complete before workers are forked,
+    so workers share them copy-on-write. No threads are left running,
+    since they would not survive the fork.
+    
+    Raises:
+        RuntimeError: If no gunicorn post_fork hook will start the background tasks
+    """
+    if not gunicorn_preloading():
+        raise RuntimeError("preload() requires gunicorn with gunicorn.conf.py and preload_app on")
+    started = time.time()
+    warm_up()
+    train_collaborative()
+    app.logger.info("✓ Preloaded models and catalog in %.2fs", time.time() - started)
+
+def start_background_tasks():
+    """Start the per-process catalog refresh, compaction and retraining threads"""
+    if PRELOADED or not FAST_START:
+        # Otherwise started by the warm-up thread once the first catalog is loaded
+        catalog_refresh.start()
+    interaction_store.start_background(interval=int(os.getenv('COMPACTION_INTERVAL', 60)))
+    threading.Thread(
+        target=train_models if PRELOADED or not FAST_START else warm_up_and_train,
+        args=(MF_RETRAIN_INTERVAL,),
+        kwargs={'first_delay': MF_RETRAIN_INTERVAL} if PRELOADED else {},
+        name='model-trainer',
+        daemon=True
+    ).start()
+
+# Fast start (default): serve immediately and warm up in the background; heavy
+# modules are imported lazily by whichever comes first. FAST_START=false warms
+# up before the app is returned to the server.
+FAST_START = os.getenv('FAST_START', 'true').lower() == 'true'
+WARM_UP_DELAY = float(os.getenv('WARM_UP_DELAY', 0.5))
+MF_RETRAIN_INTERVAL = int(os.getenv('MF_RETRAIN_INTERVAL', 6 * 3600))
+
+# Set by gunicorn.conf.py when preload_app is on: the master builds everything
+# once and each forked worker starts its own background threads (post_fork)
+PRELOAD_MARKER = 'GUNICORN_CONF_PRELOAD'
+PRELOADED = gunicorn_preloading()
+
+if PRELOADED:
+    preload()
+else:
+    if not FAST_START:
+        warm_up()
+    start_background_tasks()
+
+# Maximum ids accepted by /api/products/batch
+MAX_BATCH_IDS = 100
+
+# Most similar products returned by /api/similar-products
+MAX_SIMILAR_PRODUCTS = 50
+
+def parse_limit(value, default, maximum):
+    """
+    Parse a result count from a request, clamped to [1, maximum]
+    
+    Raises:
+        ValueError: If the value is not an integer
+    """
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"limit must be an integer, got {value!r}")
+    return min(max(limit, 1), maximum)
+
+def get_facet_filters():
+    """Read facet filters (category, gender, source, priceRange, rating) from query args"""
+    filters = {}
+    for facet in FACETS:
+        value = request.args.get(facet)
+        if value:
+            filters[facet] = value
+    return filters
+
+def get_sorted_page(category, limit, filters, default_sort='rating', snapshot=None, lazy=False):
+    """
+    Serve one cursor-paginated page from the presorted catalog indexes
+    
+    Returns (products, next cursor), or with lazy=True a SortedPage to
+    iterate, whose next_cursor is set once it has been iterated.
+    """
+    filters = dict(filters)
+    gender = filters.pop('gender', 'unisex')
+    
+    get_page = product_api_service.iter_sorted_products if lazy else product_api_service.get_sorted_products
+    return get_page(
+        category=category,
+        gender=gender,
+        sort=request.args.get('sort', default_sort),
+        cursor=request.args.get('cursor'),
+        limit=limit,
+        filters=filters,
+        snapshot=snapshot
+    )
+
+# Products per chunk written to a streamed response
+STREAM_CHUNK_SIZE = 64
+
+# The categories /api/products/all mixes when no category is requested
+ALL_CATEGORIES = [
+    'Casual Wear', 'Formal Wear', 'Streetwear',
+    'Athletic Wear', 'Party Wear', 'Traditional Wear'
+]
+
+# Seconds clients may reuse catalog-backed GET responses before revalidating their ETag
+CACHE_MAX_AGE = int(os.getenv('CACHE_MAX_AGE', 60))
+
+# Retry-After (seconds) of catalog-backed responses before the first snapshot is loaded
+CATALOG_RETRY_AFTER = 5
+
+def catalog_versions(snapshot):
+    """Data versions of a catalog-only response built from snapshot: (versions, weak)"""
+    return (snapshot.fingerprint,), False
+
+def trending_versions(snapshot):
+    """
+    Data versions of /api/trending
+    
+    Interaction-ranked responses also depend on the trending order; their
+    decayed scores drift continuously, so their ETag is weak.
+    """
+    if request.args.get('sort') or request.args.get('cursor'):
+        return catalog_versions(snapshot)
+    return (snapshot.fingerprint, recommendation_engine.trending.fingerprint()), True
+
+def request_etag(versions):
+    """ETag of the current request: path, query args, response format and data versions"""
+    key = json.dumps([request.path, sorted(request.args.items(multi=True)), wants_stream(), versions])
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+def conditional_get(versions=catalog_versions):
+    """
+    Add ETag and Cache-Control to a GET endpoint and answer 304 when the
+    client's copy is current, before the view runs (nothing is serialized)
+    
+    The catalog snapshot is read once and passed to the view as `snapshot`,
+    so the response body and its ETag always describe the same version,
+    even if a new snapshot is published while the view runs. Before the
+    first snapshot is loaded the endpoint answers 503 instead of waiting.
+    
+    Args:
+        versions (callable): Takes the snapshot, returns (versions of the data
+            the response is built from, weak)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            catalog.ensure_fresh()
+            snapshot = catalog.snapshot
+            if not snapshot.version:
+                response = jsonify({
+                    'status': 'error',
+                    'message': 'Product catalog is loading, try again shortly'
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(CATALOG_RETRY_AFTER)
+                return response
+            data_versions, weak = versions(snapshot)
+            etag = request_etag(data_versions)
+            if request.if_none_match.contains_weak(etag):
+                CACHE_REQUESTS.labels('http_etag', 'hit').inc()
+                response = Response(status=304)
+            else:
+                CACHE_REQUESTS.labels('http_etag', 'miss').inc()
+                response = make_response(view(*args, snapshot=snapshot, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=weak)
+            response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}'
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
+
+def get_fields():
+    """Read the fields= projection (a named projection like "card" or field names)"""
+    return parse_fields(request.args.get('fields'))
+
+def products_response(products, **envelope):
+    """
+    Build a product list response from pre-serialized product fragments
+    
+    Equivalent to jsonify(dict(envelope, products=products)) with the
+    fields= projection applied to every product.
+    
+    Raises:
+        ValueError: If fields= is invalid
+    """
+    fields = get_fields()
+    with stage('serialise'):
+        body = product_serializer.response_body(products, fields, **envelope)
+    return Response(body, mimetype='application/json')
+
+def wants_stream():
+    """Whether the client asked for NDJSON (Accept: application/x-ndjson or ?stream=1)"""
+    return (request.args.get('stream') == '1' or
+            request.accept_mimetypes.best == 'application/x-ndjson')
+
+def stream_products(products, **summary):
+    """
+    Stream products as NDJSON while they are produced
+    
+    One product per line, followed by a summary line
+    {"status": "success", "count": n, ...summary}. An error while iterating
+    ends the stream with {"status": "error", "message": ...} instead.
+    
+    Args:
+        products (iterable): Products, typically a lazy catalog iterator
+        **summary: Extra fields for the summary line; callables are called
+            once the products are exhausted
+        
+    Returns:
+        Response: Chunked application/x-ndjson response
+    """
+    fields = get_fields()
+    
+    def generate():
+        count = 0
+        lines = []
+        try:
+            for product in products:
+                lines.append(product_serializer.encode(product, fields))
+                count += 1
+                if len(lines) == STREAM_CHUNK_SIZE:
+                    yield b'\n'.join(lines) + b'\n'
+                    lines = []
+            resolved = {k: v() if callable(v) else v for k, v in summary.items()}
+            lines.append(json.dumps(dict({'status': 'success', 'count': count}, **resolved)).encode('utf-8'))
+        except Exception as e:
+            app.logger.error(f'Error while streaming products: {str(e)}')
+            lines.append(json.dumps({'status': 'error', 'message': str(e)}).encode('utf-8'))
+        yield b'\n'.join(lines) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def get_streaming_trending(category, limit, filters, snapshot=None):
+    """Rank products by decayed interaction counts, filled up by rating"""
+    scored = recommendation_engine.get_trending_ids(top_n=recommendation_engine.trending.top_k)
+    scores = dict(scored)
+    
+    products, _ = product_api_service.get_products_by_ids([pid for pid, _ in scored], snapshot)
+    products = product_api_service.catalog.restrict(products, dict(filters, category=category), snapshot)
+    trending = [dict(p, trendingScore=scores[p['id']]) for p in products[:limit]]
+    
+    if len(trending) < limit:
+        seen = {p['id'] for p in trending}
+        rated, _ = get_sorted_page(category, limit + len(seen), filters, snapshot=snapshot)
+        trending.extend(dict(p, trendingScore=0.0) for p in rated if p['id'] not in seen)
+    
+    return trending[:limit]
+
 @app.route('/')
 def home():
     """Health check endpoint"""
@@ -33,6 +501,126 @@ def home():
         'version': '1.0.0'
     })
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """
+    Liveness and readiness check
+    
+    Always answers 200 once the process serves requests; "ready" turns
+    true when the background warm-up has loaded the models and catalog.
+    """
+    return jsonify({
+        'status': 'success',
+        'ready': recommendation_engine.warmed_up and catalog.loaded_at is not None,
+        'catalogVersion': catalog.version
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics of this process: request latency per route, stage
+    latencies, cache hit/miss counts, upstream outcomes, requests in flight
+    and catalog state
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def is_admin_request():
+    """Whether the request carries ADMIN_TOKEN in X-Admin-Token (always false when ADMIN_TOKEN is unset)"""
+    token = os.getenv('ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+@app.route('/api/admin/snapshot', methods=['GET', 'POST'])
+def catalog_snapshot():
+    """
+    Catalog snapshot and partition refresh status; POST refreshes all
+    partitions (or {"partition": name}) in the background now and requires
+    X-Admin-Token
+    
+    The served snapshot is replaced atomically once the new one is fully
+    built; requests already running finish on the snapshot they started with.
+    """
+    if request.method == 'POST' and not is_admin_request():
+        return jsonify({
+            'status': 'error',
+            'message': 'Admin token required'
+        }), 403
+    
+    try:
+        if request.method == 'POST':
+            catalog_refresh.refresh_soon((request.get_json(silent=True) or {}).get('partition'))
+            return jsonify({
+                'status': 'success',
+                'reloadStarted': True,
+                'snapshot': catalog.status()
+            }), 202
+        
+        return jsonify({
+            'status': 'success',
+            'snapshot': catalog.status(),
+            'partitions': catalog_refresh.status(),
+            'collaborativeModel': {
+                'trainedAt': recommendation_engine.collaborative.trained_at
+            }
+        })
+    
+    except Exception as e:
+        app.logger.error(f'Error in catalog_snapshot: {str(e)}')
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def sampling_profile():
+    """
+    Profile this worker process on demand (requires X-Admin-Token)
+    
+    POST starts sampling the stacks of all threads and writes them as
+    collapsed stacks (flame graph input) to PROFILE_DIR when done;
+    DELETE stops early; GET shows progress and the last profile.
+    
+    Request Body (POST, all optional):
+    {
+        "seconds": 30,          (stop after this long, at most PROFILE_MAX_SECONDS)
+        "requests": 500,        (stop after this many finished requests)
+        "interval": 0.01        (seconds between samples)
+    }
+    """
+    if not is_admin_request():
+        return jsonify({
+            'status': 'error',
+            'message': 'Admin token required'
+        }), 403
+    
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            return jsonify({
+                'status': 'success',
+                'profile': profiler.start(
+                    seconds=data.get('seconds'),
+                    requests=data.get('requests'),
+                    interval=data.get('interval')
+                )
+            }), 202
+        
+        if request.method == 'DELETE':
+            return jsonify({'status': 'success', 'profile': profiler.stop()})
+        
+        return jsonify({'status': 'success', 'profile': profiler.status()})
+    
+    except ProfilerBusy as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'profile': profiler.status()
+        }), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
 @app.route('/api/test', methods=['GET'])
 def test_api():
     """Test endpoint to verify ProductAPIService works"""
@@ -60,6 +648,8 @@ def get_recommendations():
         "interests": ["casual", "streetwear"],
         "fashionStyle": "minimalist",
         "gender": "male",
+        "userId": "user_123",              (optional, enables collaborative scoring)
+        "diversity": 0.3,                  (optional, 0 = pure relevance)
         "filters": {
             "category": "all",
             "priceRange": "all",
@@ -79,69 +669,33 @@ def get_recommendations():
         user_profile = {
             'interests': interests,
             'fashion_style': fashion_style,
-            'gender': gender
+            'gender': gender,
+            'user_id': data.get('userId')
         }
         
-        # Fetch products from real APIs based on user interests and gender
-        products = []
-        
-        # Fetch products based on category filter or interests
-        category = filters.get('category', 'all')
-        source = 'amazon'  # Only Amazon for now
+        # Generators only hit the in-memory indexes; this never fetches inline
+        catalog.ensure_fresh()
         
-        if category and category != 'all':
-            # Fetch by category with gender filter
-            products = product_api_service.get_products_by_category(
-                category=category,
-                source=source,
-                max_results=50,
-                gender=gender
-            )
-        else:
-            # Fetch based on user interests with gender filter
-            if interests and len(interests) > 0:
-                for interest in interests[:3]:  # Limit to first 3 interests to reduce API calls
-                    print(f"Fetching products for interest: {interest}")
-                    amazon_products = product_api_service.search_amazon_products(
-                        query=interest,
-                        max_results=20,
-                        gender=gender
-                    )
-                    print(f"Got {len(amazon_products)} products for {interest}")
-                    products.extend(amazon_products)
-            else:
-                # No interests specified, fetch general products
-                print("No interests specified, fetching general products")
-                amazon_products = product_api_service.search_amazon_products(
-                    query="clothing fashion",
-                    max_results=30,
-                    gender=gender
-                )
-                products.extend(amazon_products)
-        
-        # If no products found, get some trending items
-        if not products:
-            print("No products found, fetching trending items")
-            products = product_api_service.get_trending_products(limit=30, gender=gender)
-        
-        print(f"Total products collected: {len(products)}")
-        
-        # Get recommendations using ML model
-        recommendations = recommendation_engine.get_recommendations(
-            user_profile=user_profile,
-            products=products,
-            filters=filters,
-            top_n=20
-        )
+        context = {
+            'user_profile': user_profile,
+            'filters': {**filters, 'gender': gender},
+            'gender': gender,
+            'user_id': user_profile['user_id']
+        }
+        if data.get('diversity') is not None:
+            context['diversity'] = min(max(float(data['diversity']), 0.0), 1.0)
+        recommendations, timings = recommendation_pipeline.run(context, top_n=20)
         
-        print(f"Generated {len(recommendations)} recommendations")
+        app.logger.debug('Generated %d recommendations', len(recommendations),
+                         extra={'timings_ms': timings})
         
-        return jsonify({
-            'status': 'success',
-            'count': len(recommendations),
-            'products': recommendations,
-            'message': 'Showing recommendations from Amazon'
-        })
+        with stage('serialise'):
+            return jsonify({
+                'status': 'success',
+                'count': len(recommendations),
+                'products': recommendations,
+                'message': 'Showing recommendations from Amazon'
+            })
         
     except Exception as e:
         app.logger.error(f'Error in get_recommendations: {str(e)}')
@@ -157,15 +711,33 @@ def get_similar_products():
     
     Request Body:
     {
-        "product": {...product object...},
-        "limit": 5
+        "productId": "platzi_12",
+        "limit": 5              (1-50)
     }
+    
+    The full product object ("product": {...}) is still accepted in place
+    of "productId" for products that are not in the catalog.
     """
     try:
         data = request.get_json()
         
+        product_id = data.get('productId')
         product = data.get('product')
-        limit = data.get('limit', 5)
+        try:
+            limit = parse_limit(data.get('limit'), 5, MAX_SIMILAR_PRODUCTS)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        if product_id:
+            product = product_api_service.get_product_by_id(product_id)
+            if not product:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Product {product_id} not found'
+                }), 404
         
         if not product:
             return jsonify({
@@ -173,20 +745,34 @@ def get_similar_products():
                 'message': 'Product data is required'
             }), 400
         
-        # Fetch products from same category
-        category = product.get('category', 'Casual Wear')
-        all_products = product_api_service.get_products_by_category(
-            category=category,
-            source='both',
-            max_results=100
+        # Serve from the precomputed similarity table when it has the product,
+        # over-fetching so the diversity re-ranker has something to choose from
+        similar_products = recommendation_engine.lookup_similar_products(
+            product.get('id'),
+            top_n=limit * 3
         )
+        if similar_products is not None:
+            similar_products = DIVERSITY_RERANKERS['similar-products'].rerank(
+                similar_products,
+                limit,
+                data.get('diversity')
+            )
         
-        # Get similar products using semantic embeddings
-        similar_products = recommendation_engine.get_similar_products(
-            product=product,
-            all_products=all_products,
-            top_n=limit
-        )
+        if similar_products is None:
+            # Fetch products from same category
+            category = product.get('category', 'Casual Wear')
+            all_products = product_api_service.get_products_by_category(
+                category=category,
+                source='both',
+                max_results=100
+            )
+            
+            # Get similar products using semantic embeddings
+            similar_products = recommendation_engine.get_similar_products(
+                product=product,
+                all_products=all_products,
+                top_n=limit
+            )
         
         return jsonify({
             'status': 'success',
@@ -211,7 +797,7 @@ def track_interaction():
         "userId": "user123",
         "productId": "prod456",
         "interactionType": "view|click|like",
-        "timestamp": "2025-10-29T10:00:00Z"
+        "timestamp": "2025-10-29T10:00:00Z"   (optional, clamped to the last 30 days)
     }
     """
     try:
@@ -222,10 +808,31 @@ def track_interaction():
         interaction_type = data.get('interactionType')
         timestamp = data.get('timestamp')
         
-        # In production, save this to a database for ML training
-        app.logger.info(f'Interaction: User {user_id} {interaction_type} product {product_id}')
+        if timestamp is not None and (isinstance(timestamp, bool) or not isinstance(timestamp, (str, int, float))):
+            return jsonify({
+                'status': 'error',
+                'message': 'timestamp must be an ISO-8601 string or epoch seconds'
+            }), 400
         
-        # TODO: Save to database/Firestore for future ML model training
+        # Client clocks can be anything; models only ever see times in [now - 30 days, now]
+        received_at = time.time()
+        
+        # Enqueue only; the log writer persists the event and feeds the models
+        accepted = interaction_log.append({
+            'user_id': user_id,
+            'product_id': product_id,
+            'action': interaction_type,
+            'timestamp': event_time(timestamp, now=received_at),
+            'received_at': received_at
+        })
+        
+        if not accepted:
+            response = jsonify({
+                'status': 'error',
+                'message': 'Interaction buffer is full, retry later'
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 503
         
         return jsonify({
             'status': 'success',
@@ -239,27 +846,84 @@ def track_interaction():
             'message': str(e)
         }), 500
 
+@app.route('/api/also-viewed', methods=['GET'])
+def get_also_viewed():
+    """
+    Get products customers also viewed alongside a product
+    
+    Query Parameters:
+    - productId: product id
+    - limit: number of results (default: 10)
+    """
+    try:
+        product_id = request.args.get('productId')
+        limit = int(request.args.get('limit', 10))
+        
+        if not product_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'productId is required'
+            }), 400
+        
+        scored = recommendation_engine.get_also_viewed(product_id, top_n=limit)
+        scores = dict(scored)
+        
+        products, _ = product_api_service.get_products_by_ids([pid for pid, _ in scored])
+        products = [dict(p, covisitationScore=scores[p['id']]) for p in products]
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(products),
+            'products': products,
+            'message': 'Customers also viewed'
+        })
+        
+    except Exception as e:
+        app.logger.error(f'Error in get_also_viewed: {str(e)}')
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/trending', methods=['GET'])
-def get_trending():
+@conditional_get(trending_versions)
+def get_trending(snapshot=None):
     """
     Get trending products from Amazon
     
     Query Parameters:
     - limit: number of results (default: 20)
+    - sort: rating|reviews|price_asc|price_desc (optional, enables pagination)
+    - cursor: nextCursor from the previous page (optional)
+    - fields: "card" or comma-separated product fields to return (optional)
+    
+    Without sort/cursor, products are ranked by recent (time-decayed)
+    interactions and topped up with the best rated products.
     """
     try:
         limit = int(request.args.get('limit', 20))
+        filters = get_facet_filters()
+        category = filters.pop('category', 'all')
+        
+        if request.args.get('sort') or request.args.get('cursor'):
+            # Serve trending products from the presorted indexes
+            trending, next_cursor = get_sorted_page(category, limit, filters, snapshot=snapshot)
+        else:
+            trending, next_cursor = get_streaming_trending(category, limit, filters, snapshot), None
         
-        # Fetch trending products from Amazon
-        trending = product_api_service.get_trending_products(limit=limit)
+        return products_response(
+            trending,
+            status='success',
+            count=len(trending),
+            nextCursor=next_cursor,
+            message='Showing trending products from Amazon'
+        )
         
+    except ValueError as e:
         return jsonify({
-            'status': 'success',
-            'count': len(trending),
-            'products': trending,
-            'message': 'Showing trending products from Amazon'
-        })
-        
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         app.logger.error(f'Error in get_trending: {str(e)}')
         return jsonify({
@@ -268,7 +932,8 @@ def get_trending():
         }), 500
 
 @app.route('/api/products/search', methods=['GET'])
-def search_products():
+@conditional_get()
+def search_products(snapshot=None):
     """
     Search products by keyword from Amazon
     
@@ -276,14 +941,14 @@ def search_products():
     - q: search query
     - source: amazon (default: amazon)
     - limit: number of results (default: 20)
+    - fields: "card" or comma-separated product fields to return (optional)
     """
     try:
-        app.logger.info("=== /api/products/search endpoint called ===")
         query = request.args.get('q', '')
         source = 'amazon'  # Only Amazon for now
         limit = int(request.args.get('limit', 20))
         
-        app.logger.info(f"Query: {query}, Limit: {limit}")
+        app.logger.debug('Product search', extra={'query': query, 'limit': limit})
         
         if not query:
             return jsonify({
@@ -292,20 +957,25 @@ def search_products():
             }), 400
         
         # Fetch products from Amazon
-        app.logger.info(f"Calling product_api_service.search_amazon_products...")
         products = product_api_service.search_amazon_products(
             query=query,
-            max_results=limit
+            max_results=limit,
+            snapshot=snapshot
         )
-        app.logger.info(f"Received {len(products)} products from service")
+        app.logger.debug('Received %d products from service', len(products))
         
-        return jsonify({
-            'status': 'success',
-            'count': len(products),
-            'products': products,
-            'message': 'Search results from Amazon'
-        })
+        return products_response(
+            products,
+            status='success',
+            count=len(products),
+            message='Search results from Amazon'
+        )
         
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         app.logger.error(f'Error in search_products: {str(e)}')
         return jsonify({
@@ -314,7 +984,8 @@ def search_products():
         }), 500
 
 @app.route('/api/products/all', methods=['GET'])
-def get_all_products():
+@conditional_get()
+def get_all_products(snapshot=None):
     """
     Get all products from Amazon
     
@@ -322,58 +993,93 @@ def get_all_products():
     - category: product category (optional)
     - source: amazon (default: amazon)
     - limit: number of results (default: 60)
+    - gender, priceRange, rating: facet filters (optional)
+    - sort: price_asc|price_desc|rating|reviews (optional, enables pagination)
+    - cursor: nextCursor from the previous page (optional)
+    - stream: 1 to stream NDJSON, one product per line plus a summary line
+      (same as sending Accept: application/x-ndjson)
+    - fields: "card" or comma-separated product fields to return (optional)
     """
     try:
-        print("=== /api/products/all endpoint called ===")
         category = request.args.get('category', 'all')
         source = 'amazon'  # Only Amazon for now
         limit = int(request.args.get('limit', 60))
+        filters = get_facet_filters()
+        filters.pop('category', None)
+        filters.pop('source', None)
+        
+        app.logger.debug('All products', extra={'category': category, 'limit': limit})
         
-        print(f"Category: {category}, Limit: {limit}")
+        if request.args.get('sort') or request.args.get('cursor'):
+            if wants_stream():
+                page = get_sorted_page(category, limit, filters, snapshot=snapshot, lazy=True)
+                return stream_products(page, nextCursor=lambda: page.next_cursor)
+            products, next_cursor = get_sorted_page(category, limit, filters, snapshot=snapshot)
+            return products_response(
+                products,
+                status='success',
+                count=len(products),
+                nextCursor=next_cursor,
+                message='All products from Amazon'
+            )
+        
+        if wants_stream():
+            if category and category != 'all':
+                products = product_api_service.iter_products_by_category(
+                    category=category, max_results=limit, filters=filters, snapshot=snapshot)
+            else:
+                per_category = max(1, limit // len(ALL_CATEGORIES))
+                products = itertools.islice(itertools.chain.from_iterable(
+                    product_api_service.iter_products_by_category(
+                        category=cat, max_results=per_category, filters=filters, snapshot=snapshot)
+                    for cat in ALL_CATEGORIES
+                ), limit)
+            return stream_products(products)
         
         products = []
         
         if category and category != 'all':
             # Fetch by specific category
-            print(f"Fetching products for category: {category}")
             products = product_api_service.get_products_by_category(
                 category=category,
                 source=source,
-                max_results=limit
+                max_results=limit,
+                filters=filters,
+                snapshot=snapshot
             )
         else:
             # Fetch from multiple categories
-            print("Fetching products from multiple categories")
-            categories = [
-                'Casual Wear', 'Formal Wear', 'Streetwear',
-                'Athletic Wear', 'Party Wear', 'Traditional Wear'
-            ]
-            
             # Calculate products per category, ensuring at least 1 per category
-            per_category = max(1, limit // len(categories))
+            per_category = max(1, limit // len(ALL_CATEGORIES))
             
-            for cat in categories:
-                print(f"Fetching {per_category} products for: {cat}")
+            for cat in ALL_CATEGORIES:
                 cat_products = product_api_service.get_products_by_category(
                     category=cat,
                     source=source,
-                    max_results=per_category
+                    max_results=per_category,
+                    filters=filters,
+                    snapshot=snapshot
                 )
-                print(f"Got {len(cat_products)} products for {cat}")
+                app.logger.debug('Got %d of %d products for %s', len(cat_products), per_category, cat)
                 products.extend(cat_products)
         
-        print(f"Total products collected: {len(products)}")
+        app.logger.debug('Total products collected: %d', len(products))
         
         # Limit to requested amount
         products = products[:limit]
         
-        return jsonify({
-            'status': 'success',
-            'count': len(products),
-            'products': products,
-            'message': 'All products from Amazon'
-        })
+        return products_response(
+            products,
+            status='success',
+            count=len(products),
+            message='All products from Amazon'
+        )
         
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         app.logger.error(f'Error in get_all_products: {str(e)}')
         return jsonify({
@@ -382,7 +1088,8 @@ def get_all_products():
         }), 500
 
 @app.route('/api/products/category/<category>', methods=['GET'])
-def get_category_products(category):
+@conditional_get()
+def get_category_products(category, snapshot=None):
     """
     Get products by category from Amazon
     
@@ -392,27 +1099,139 @@ def get_category_products(category):
     Query Parameters:
     - source: amazon (default: amazon)
     - limit: number of results (default: 30)
+    - gender, priceRange, rating: facet filters (optional)
+    - sort: price_asc|price_desc|rating|reviews (optional, enables pagination)
+    - cursor: nextCursor from the previous page (optional)
+    - stream: 1 to stream NDJSON, one product per line plus a summary line
+      (same as sending Accept: application/x-ndjson)
+    - fields: "card" or comma-separated product fields to return (optional)
     """
     try:
         source = 'amazon'  # Only Amazon for now
         limit = int(request.args.get('limit', 30))
+        filters = get_facet_filters()
+        filters.pop('category', None)
+        filters.pop('source', None)
+        
+        if request.args.get('sort') or request.args.get('cursor'):
+            if wants_stream():
+                page = get_sorted_page(category, limit, filters, snapshot=snapshot, lazy=True)
+                return stream_products(page, nextCursor=lambda: page.next_cursor, category=category)
+            products, next_cursor = get_sorted_page(category, limit, filters, snapshot=snapshot)
+            return products_response(
+                products,
+                status='success',
+                count=len(products),
+                nextCursor=next_cursor,
+                category=category,
+                message=f'{category} products from Amazon'
+            )
+        
+        if wants_stream():
+            return stream_products(
+                product_api_service.iter_products_by_category(
+                    category=category, max_results=limit, filters=filters, snapshot=snapshot),
+                category=category
+            )
         
         products = product_api_service.get_products_by_category(
             category=category,
             source=source,
-            max_results=limit
+            max_results=limit,
+            filters=filters,
+            snapshot=snapshot
+        )
+        
+        return products_response(
+            products,
+            status='success',
+            count=len(products),
+            category=category,
+            message=f'{category} products from Amazon'
+        )
+        
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        app.logger.error(f'Error in get_category_products: {str(e)}')
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/products/batch', methods=['GET'])
+def get_products_batch():
+    """
+    Get several products by id, e.g. to hydrate a cart or wishlist
+    
+    Query Parameters:
+    - ids: comma-separated product ids (max 100)
+    - fields: "card" or comma-separated product fields to return (optional)
+    """
+    try:
+        ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+        
+        if not ids:
+            return jsonify({
+                'status': 'error',
+                'message': 'Product ids are required'
+            }), 400
+        
+        if len(ids) > MAX_BATCH_IDS:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {MAX_BATCH_IDS} ids can be requested at once'
+            }), 400
+        
+        products, missing = product_api_service.get_products_by_ids(ids)
+        
+        return products_response(
+            products,
+            status='success',
+            count=len(products),
+            missing=missing
         )
         
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        app.logger.error(f'Error in get_products_batch: {str(e)}')
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/products/facets', methods=['GET'])
+def get_product_facets():
+    """
+    Get product counts per facet value for the active filters
+    
+    Query Parameters:
+    - category, gender, source, priceRange, rating: active filters (optional,
+      comma-separated values are OR-ed within a facet)
+    
+    Counts for each facet ignore that facet's own filter, so they show how
+    many products every alternative value would return.
+    """
+    try:
+        filters = get_facet_filters()
+        result = product_api_service.get_facet_counts(filters)
+        
         return jsonify({
             'status': 'success',
-            'count': len(products),
-            'products': products,
-            'category': category,
-            'message': f'{category} products from Amazon'
+            'total': result['total'],
+            'facets': result['facets'],
+            'filters': filters
         })
         
     except Exception as e:
-        app.logger.error(f'Error in get_category_products: {str(e)}')
+        app.logger.error(f'Error in get_product_facets: {str(e)}')
         return jsonify({
             'status': 'error',
             'message': str(e)
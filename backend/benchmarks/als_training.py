@@ -0,0 +1,65 @@
+"""
+Benchmark: collaborative model training time against interaction volume
+
+Generates synthetic implicit feedback with a power-law product popularity
+and times a full ALS fit plus a single-user fold-in at each volume.
+
+Usage (from the backend directory):
+    python -m benchmarks.als_training
+    python -m benchmarks.als_training --volumes 10000 100000 1000000 --factors 32
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.matrix_factorization import CollaborativeModel
+
+
+def synthetic_interactions(n_interactions, n_users, n_products, seed=0):
+    """Random (user, product, strength) arrays with Zipf-like product popularity"""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_products + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    users = rng.integers(0, n_users, n_interactions)
+    products = rng.choice(n_products, n_interactions, p=popularity)
+    strengths = rng.choice([1.0, 2.0, 3.0], n_interactions, p=[0.7, 0.2, 0.1]).astype(np.float32)
+    return users, products, strengths
+
+
+def run(volumes, factors, iterations, threads):
+    print(f"{'interactions':>12} {'users':>8} {'products':>9} {'fit (s)':>9} {'per iter (s)':>13} {'fold-in (ms)':>13}")
+    for volume in volumes:
+        n_users = max(100, volume // 20)
+        n_products = max(50, min(50000, volume // 50))
+        users, products, strengths = synthetic_interactions(volume, n_users, n_products)
+
+        model = CollaborativeModel(factors=factors, iterations=iterations, num_threads=threads)
+        elapsed = model.fit(users, products, strengths,
+                            [f"u{i}" for i in range(n_users)],
+                            [f"p{i}" for i in range(n_products)])
+
+        started = time.time()
+        model.add_interactions([
+            {'user_id': 'new_user', 'product_id': f"p{i}", 'action': 'view'} for i in range(10)
+        ])
+        fold_in = (time.time() - started) * 1000
+
+        print(f"{volume:>12} {n_users:>8} {n_products:>9} {elapsed:>9.2f} "
+              f"{elapsed / iterations:>13.3f} {fold_in:>13.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--volumes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--factors', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    run(args.volumes, args.factors, args.iterations, args.threads)
@@ -0,0 +1,90 @@
+"""
+Benchmark: near-duplicate detection throughput on synthetic product titles
+
+Generates titles from a fashion vocabulary, a share of them near-duplicate
+variants (case, punctuation, one extra or swapped word) of earlier titles,
+and times signature computation, a first snapshot, and a follow-up snapshot
+in which `batch` products were replaced.
+
+Usage (from the backend directory):
+    python -m benchmarks.minhash_dedup
+    python -m benchmarks.minhash_dedup --count 100000 --batch 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.dedup import NearDuplicateDetector
+
+COLORS = ['black', 'white', 'navy', 'red', 'olive', 'beige', 'grey', 'maroon', 'pink', 'teal']
+MATERIALS = ['cotton', 'linen', 'denim', 'silk', 'wool', 'polyester', 'leather', 'fleece']
+FITS = ['slim fit', 'regular fit', 'oversized', 'relaxed', 'tailored', 'cropped']
+ITEMS = ['t-shirt', 'shirt', 'jeans', 'dress', 'kurta', 'hoodie', 'jacket', 'blazer', 'sneakers', 'skirt']
+AUDIENCE = ['men', 'women', 'unisex', 'kids']
+
+
+def synthetic_titles(count, duplicate_ratio=0.2, seed=0):
+    """Synthetic titles where roughly duplicate_ratio of them are near-duplicates"""
+    rng = np.random.default_rng(seed)
+    parts = [rng.choice(words, count) for words in (COLORS, MATERIALS, FITS, ITEMS, AUDIENCE)]
+    brands = rng.integers(97, 123, (count, 8), dtype=np.uint8).view('S8').ravel()
+    is_duplicate = rng.random(count) < duplicate_ratio
+    sources = rng.random(count)
+    variants = rng.integers(0, 3, count)
+
+    titles = []
+    for n in range(count):
+        if n and is_duplicate[n]:
+            words = titles[int(sources[n] * n)].split()
+            if variants[n] == 0:
+                words[0] = words[0].upper()
+            elif variants[n] == 1:
+                words.append('new')
+            else:
+                words[-1], words[-2] = words[-2], words[-1]
+            titles.append(' '.join(words))
+        else:
+            color, material, fit, item, audience = (p[n] for p in parts)
+            titles.append(f"{color} {material} {fit} {item} for {audience} {brands[n].decode()}")
+    return titles
+
+
+def run(count, batch):
+    titles = synthetic_titles(count + batch)
+    products = [{'id': f"p{n}", 'title': title, 'description': ''} for n, title in enumerate(titles)]
+    detector = NearDuplicateDetector()
+
+    started = time.perf_counter()
+    signatures = detector.signatures_of([title.lower() for title in titles[:batch]])
+    signature_rate = len(signatures) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    canonical = detector.add(products[:count])
+    first = time.perf_counter() - started
+
+    # Next snapshot: the oldest `batch` products are gone, `batch` new ones arrived
+    started = time.perf_counter()
+    detector.add(products[batch:count + batch])
+    follow_up = time.perf_counter() - started
+
+    clusters = len(set(canonical.values()))
+    print(f"titles:             {count}")
+    print(f"signatures only:    {signature_rate:,.0f} titles/s")
+    print(f"first snapshot:     {count / first:,.0f} titles/s ({first:.1f}s total)")
+    print(f"next snapshot:      {follow_up:.1f}s ({batch} products replaced)")
+    print(f"clusters:           {clusters} ({count - clusters} collapsed duplicates)")
+    print(f"signature memory:   {detector.signatures.nbytes / 1e6:.0f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=100000)
+    args = parser.parse_args()
+
+    run(args.count, args.batch)
@@ -0,0 +1,73 @@
+"""
+Gunicorn configuration
+Loaded automatically when gunicorn is started from the backend directory
+(`gunicorn app:app`, as in the Procfile).
+
+With preload (default) the master imports the app once and builds the
+catalog, its indexes, the similarity table and the models before forking,
+so workers share that read-only state copy-on-write instead of each
+building their own. GUNICORN_PRELOAD=false gives every worker its own
+fast-start copy instead.
+
+These settings are read from the environment of the gunicorn process;
+backend/.env is only loaded later, by app.py.
+
+One worker by default: the interaction state (the interaction log,
+trending counters, co-visitation counts, seen-item filters and the
+collaborative fold-in) lives in each worker's memory and is only fed by
+the requests that worker served. With several workers, trending results
+and their ETags depend on which worker answers and seen-item suppression
+misses events tracked elsewhere, until the state is shared. Scale a
+single worker with GUNICORN_THREADS; WEB_CONCURRENCY > 1 is only safe
+when those differences are acceptable.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Tell app.py to build everything synchronously and leave thread start-up
+# to post_fork below; app.py only honours this inside gunicorn
+if preload_app:
+    os.environ['GUNICORN_CONF_PRELOAD'] = '1'
+else:
+    os.environ.pop('GUNICORN_CONF_PRELOAD', None)
+
+if preload_app:
+    # Collections in the master would free objects between long-lived ones
+    # and leave holes that the workers then dirty; no collections run until
+    # everything is frozen
+    gc.disable()
+
+
+def when_ready(server):
+    """Warn that interaction state is not shared between workers"""
+    if workers > 1:
+        server.log.warning(f"⚠ {workers} workers: interaction state (trending, co-visitation, "
+                           f"seen items) is per worker and will differ between them")
+
+
+def pre_fork(server, worker):
+    """
+    Move everything allocated so far out of the collector's reach
+
+    A frozen object is never traversed by a worker's garbage collector, so
+    collections do not write to (and copy) the pages holding shared state.
+    """
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Re-enable garbage collection and start this worker's background threads"""
+    if preload_app:
+        gc.enable()
+
+        import app
+        app.start_background_tasks()
+        server.log.info(f"Worker {worker.pid} sharing {gc.get_freeze_count()} frozen objects")
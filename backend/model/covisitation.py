@@ -0,0 +1,251 @@
+"""
+Co-visitation model for "customers also viewed" recommendations
+Counts how often two products are interacted with in the same user
+session, with exponential time decay, updated in micro-batches
+"""
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from operator import itemgetter
+
+# Interaction weight per action type
+ACTION_WEIGHTS = {
+    'view': 1.0,
+    'click': 2.0,
+    'like': 3.0
+}
+
+# Event times are clamped to [now - MAX_EVENT_AGE, now]; client clocks can be anything
+MAX_EVENT_AGE = 30 * 86400
+
+# Forward-decay exponents above this rebase the reference time instead of overflowing exp()
+MAX_DECAY_EXPONENT = 50.0
+
+
+def parse_timestamp(timestamp):
+    """
+    Convert an ISO-8601 timestamp (or epoch seconds) to epoch seconds
+
+    Args:
+        timestamp (str|float): Event timestamp, e.g. "2025-10-29T10:00:00Z"
+
+    Returns:
+        float: Epoch seconds, or the current time if unparseable
+    """
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return time.time()
+
+
+def event_time(timestamp, now=None, max_age=MAX_EVENT_AGE):
+    """
+    Parse an event timestamp and clamp it to [now - max_age, now]
+
+    Args:
+        timestamp (str|float): Event timestamp, None for now
+        now (float): Current epoch seconds (defaults to time.time())
+        max_age (float): Oldest accepted age in seconds
+
+    Returns:
+        float: Epoch seconds
+    """
+    now = time.time() if now is None else now
+    if timestamp is None or timestamp == '':
+        return now
+    parsed = parse_timestamp(timestamp)
+    if not math.isfinite(parsed):
+        return now
+    return min(max(parsed, now - max_age), now)
+
+
+class CoVisitationModel:
+    """
+    Sparse item x item co-visitation counts with time decay
+
+    Counts are stored as a dict-of-dicts sparse matrix using forward decay:
+    each increment is scaled by exp(rate * (t - reference)), so older counts
+    never need rewriting. Each micro-batch trims the rows it touched to
+    max_neighbors and drops their entries below min_weight, and expires
+    sessions idle for longer than the session gap; once per prune interval
+    everything is rescaled to the current time.
+
+    Each item's top-k neighbours are kept presorted and refreshed only for
+    items touched by a micro-batch, so lookups are O(k).
+    """
+
+    def __init__(self, half_life_days=7, session_gap_minutes=30, max_session_items=10,
+                 max_neighbors=200, top_k=50, min_weight=0.1, batch_size=100,
+                 flush_interval=5.0, prune_interval_hours=24):
+        self.decay_rate = math.log(2) / (half_life_days * 86400)
+        self.session_gap = session_gap_minutes * 60
+        self.max_session_items = max_session_items
+        self.max_neighbors = max_neighbors
+        self.top_k = top_k
+        self.min_weight = min_weight
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval_hours * 3600
+
+        self.reference_time = None
+        self.counts = {}
+        self.top = {}
+        # user -> OrderedDict(product -> last time), least recently active user first
+        self.sessions = OrderedDict()
+
+        self.pending = []
+        self.last_flush = time.time()
+        self._pending_lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+
+    def add(self, user_id, product_id, timestamp=None, action='view'):
+        """
+        Queue one interaction for the next micro-batch
+
+        Args:
+            user_id (str): User id
+            product_id (str): Product id
+            timestamp (str|float): Event time (defaults to now, clamped by event_time())
+            action (str): view, click or like
+        """
+        if not user_id or not product_id:
+            return
+
+        event = (
+            event_time(timestamp),
+            str(user_id),
+            str(product_id),
+            ACTION_WEIGHTS.get(action, 1.0)
+        )
+
+        with self._pending_lock:
+            self.pending.append(event)
+            due = (len(self.pending) >= self.batch_size or
+                   time.time() - self.last_flush >= self.flush_interval)
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Apply all queued interactions as one micro-batch"""
+        with self._pending_lock:
+            batch, self.pending = self.pending, []
+            self.last_flush = time.time()
+
+        if not batch:
+            return
+
+        batch.sort(key=itemgetter(0))
+
+        with self._apply_lock:
+            touched = set()
+            for timestamp, user_id, product_id, weight in batch:
+                if self.reference_time is None:
+                    self.reference_time = timestamp
+
+                session = self.sessions.get(user_id)
+                if session is None or timestamp - next(reversed(session.values())) > self.session_gap:
+                    session = self.sessions[user_id] = OrderedDict()
+                self.sessions.move_to_end(user_id)
+
+                if self.decay_rate * (timestamp - self.reference_time) > MAX_DECAY_EXPONENT:
+                    self._prune(timestamp)
+                increment = weight * math.exp(self.decay_rate * (timestamp - self.reference_time))
+                for other in session:
+                    if other != product_id:
+                        self._bump(product_id, other, increment)
+                        self._bump(other, product_id, increment)
+                        touched.add(other)
+                touched.add(product_id)
+
+                session[product_id] = timestamp
+                session.move_to_end(product_id)
+                if len(session) > self.max_session_items:
+                    session.popitem(last=False)
+
+            latest = batch[-1][0]
+            self._expire_sessions(latest)
+            if latest - self.reference_time >= self.prune_interval:
+                self._prune(latest)
+            else:
+                for product_id in touched:
+                    self._trim_row(product_id, latest)
+                    self._refresh_top(product_id)
+
+    def _bump(self, product_id, other, increment):
+        """Add to one cell"""
+        row = self.counts.setdefault(product_id, {})
+        row[other] = row.get(other, 0.0) + increment
+
+    def _trim_row(self, product_id, now):
+        """Keep a row's max_neighbors heaviest entries that still weigh min_weight at now"""
+        row = self.counts.get(product_id)
+        if not row:
+            return
+        # Forward-decayed weights below this are below min_weight at now
+        threshold = self.min_weight * math.exp(self.decay_rate * (now - self.reference_time))
+        kept = [(other, w) for other, w in row.items() if w >= threshold]
+        if len(kept) > self.max_neighbors:
+            kept = heapq.nlargest(self.max_neighbors, kept, key=itemgetter(1))
+        if not kept:
+            del self.counts[product_id]
+        elif len(kept) < len(row):
+            self.counts[product_id] = dict(kept)
+
+    def _expire_sessions(self, now):
+        """Forget sessions that can no longer be continued"""
+        while self.sessions:
+            user_id, session = next(iter(self.sessions.items()))
+            if now - next(reversed(session.values())) <= self.session_gap:
+                break
+            del self.sessions[user_id]
+
+    def _refresh_top(self, product_id):
+        """Recompute the presorted top-k list of one item"""
+        row = self.counts.get(product_id)
+        if row:
+            self.top[product_id] = heapq.nlargest(self.top_k, row.items(), key=itemgetter(1))
+        else:
+            self.top.pop(product_id, None)
+
+    def _prune(self, now):
+        """Rescale counts to the current time and drop low-weight entries"""
+        factor = math.exp(-self.decay_rate * (now - self.reference_time))
+        self.reference_time = now
+
+        counts = {}
+        for product_id, row in self.counts.items():
+            kept = {other: w * factor for other, w in row.items() if w * factor >= self.min_weight}
+            if kept:
+                counts[product_id] = kept
+        self.counts = counts
+        self.top = {
+            product_id: heapq.nlargest(self.top_k, row.items(), key=itemgetter(1))
+            for product_id, row in counts.items()
+        }
+
+    def lookup(self, product_id, top_n=10):
+        """
+        Get the products most often co-visited with a product
+
+        Args:
+            product_id (str): Product id
+            top_n (int): Number of products to return
+
+        Returns:
+            list: [(product_id, decayed co-visitation weight)] best first
+        """
+        if self.pending and time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+        top = self.top.get(product_id)
+        if not top or self.reference_time is None:
+            return []
+
+        scale = math.exp(-self.decay_rate * max(0.0, time.time() - self.reference_time))
+        return [(other, weight * scale) for other, weight in top[:top_n]]
@@ -0,0 +1,183 @@
+"""
+Diversity re-ranking
+Maximal marginal relevance over a precomputed, L2-normalised product
+vector block, with optional per-category quotas
+"""
+import threading
+
+import numpy as np
+
+
+class ProductVectorBlock:
+    """
+    Dense float32 block of unit-length product vectors, one row per product
+
+    Vectors are hashed bag-of-words features of the product text, so the
+    block can be rebuilt for any catalog without fitting a vocabulary.
+    Rebuilds swap the block and id map in together.
+    """
+
+    def __init__(self, text_fn, n_features=256):
+        self.text_fn = text_fn
+        self.n_features = n_features
+        self._hasher = None
+        self.vectors = np.zeros((0, n_features), dtype=np.float32)
+        self.row_by_id = {}
+        self._lock = threading.Lock()
+
+    @property
+    def hasher(self):
+        """Hashing vectorizer, created on first use (sklearn is slow to import)"""
+        if self._hasher is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._hasher = HashingVectorizer(
+                n_features=self.n_features,
+                alternate_sign=False,
+                norm='l2',
+                ngram_range=(1, 1)
+            )
+        return self._hasher
+
+    def build(self, products):
+        """
+        Rebuild the block for a product list
+
+        Args:
+            products (list): Catalog products
+        """
+        self.install(self.prepare(products))
+
+    def prepare(self, products):
+        """
+        Compute the block for a product list without serving it
+
+        Args:
+            products (list): Catalog products
+
+        Returns:
+            tuple: (vectors, row_by_id)
+        """
+        vectors = self.hasher.transform([self.text_fn(p) for p in products]).toarray().astype(np.float32)
+        return vectors, {p.get('id'): row for row, p in enumerate(products)}
+
+    def install(self, block):
+        """
+        Start serving a block returned by prepare()
+
+        Args:
+            block (tuple): (vectors, row_by_id)
+        """
+        with self._lock:
+            self.vectors, self.row_by_id = block
+
+    def gather(self, products):
+        """
+        Get the vectors of products; products outside the block are embedded on the fly
+
+        Args:
+            products (list): Products
+
+        Returns:
+            np.array: (len(products), n_features) float32 unit vectors
+        """
+        vectors, row_by_id = self.vectors, self.row_by_id
+        rows = np.array([row_by_id.get(p.get('id'), -1) for p in products], dtype=np.int64)
+        block = np.zeros((len(products), vectors.shape[1]), dtype=np.float32)
+
+        known = rows >= 0
+        block[known] = vectors[rows[known]]
+        unknown = np.flatnonzero(~known)
+        if len(unknown):
+            block[unknown] = self.hasher.transform(
+                [self.text_fn(products[i]) for i in unknown]).toarray()
+        return block
+
+
+class MMRReranker:
+    """
+    Maximal marginal relevance re-ranker
+
+    Picks products greedily by lambda * relevance - (1 - lambda) * max
+    similarity to the products already picked. The similarity matrix of the
+    top `depth` candidates is one matrix product; each pick then updates the
+    running max-similarity vector, so k picks cost O(k * depth).
+
+    Args:
+        vectors (ProductVectorBlock): Precomputed product vectors
+        diversity (float): 1 - lambda; 0 keeps the ranking unchanged
+        depth (int): Number of top candidates considered
+        max_per_category (int): Optional cap on picks per category
+        score_key (str): Product field holding the relevance score
+    """
+
+    name = 'mmr'
+
+    def __init__(self, vectors, diversity=0.3, depth=200, max_per_category=None, score_key='relevanceScore'):
+        self.vectors = vectors
+        self.diversity = diversity
+        self.depth = depth
+        self.max_per_category = max_per_category
+        self.score_key = score_key
+
+    def __call__(self, context, ranked, top_n):
+        return self.rerank(ranked, top_n, (context or {}).get('diversity', self.diversity))
+
+    def rerank(self, ranked, top_n, diversity=None):
+        """
+        Re-order ranked products for diversity
+
+        Args:
+            ranked (list): Products sorted by relevance, best first
+            top_n (int): Number of products to pick
+            diversity (float): Overrides the configured diversity (0-1)
+
+        Returns:
+            list: top_n products; the rest of ranked is dropped
+        """
+        diversity = self.diversity if diversity is None else float(diversity)
+        if diversity <= 0 and not self.max_per_category:
+            return ranked[:top_n]
+
+        candidates = ranked[:self.depth]
+        n = len(candidates)
+        k = min(top_n, n)
+        if k == 0:
+            return []
+
+        relevance = np.array([p.get(self.score_key, 0.0) for p in candidates], dtype=np.float32)
+        spread = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+
+        block = self.vectors.gather(candidates)
+        similarity = block @ block.T
+
+        available = np.ones(n, dtype=bool)
+        if self.max_per_category:
+            categories = np.array([str(p.get('category', '')).lower() for p in candidates])
+            quota = {}
+
+        max_similarity = np.zeros(n, dtype=np.float32)
+        weights = (1.0 - diversity, diversity)
+        picks = []
+        for _ in range(k):
+            scores = weights[0] * relevance - weights[1] * max_similarity
+            scores[~available] = -np.inf
+            pick = int(np.argmax(scores))
+            if not available[pick]:
+                break
+            picks.append(pick)
+            available[pick] = False
+            np.maximum(max_similarity, similarity[pick], out=max_similarity)
+
+            if self.max_per_category:
+                category = categories[pick]
+                quota[category] = quota.get(category, 0) + 1
+                if quota[category] >= self.max_per_category:
+                    available &= categories != category
+
+        # Quotas can run out before k picks; fill up in relevance order
+        if len(picks) < k:
+            picked = set(picks)
+            picks.extend([i for i in range(n) if i not in picked][:k - len(picks)])
+
+        return [candidates[i] for i in picks]
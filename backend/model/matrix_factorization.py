@@ -0,0 +1,338 @@
+"""
+Implicit-feedback matrix factorization (ALS) for collaborative scoring
+Learns float32 user and product factors from interaction counts, with
+fold-in of new users and products between full retrains
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from model.covisitation import ACTION_WEIGHTS
+
+
+class ImplicitALS:
+    """
+    Alternating least squares for implicit feedback (Hu, Koren & Volinsky)
+
+    Confidence is 1 + alpha * r for observed interactions. Each half-step
+    solves one small k x k system per row using the precomputed Gram matrix
+    of the fixed side, so a row costs O(nnz_row * k^2 + k^3). Rows are
+    split across a thread pool; the solves release the GIL.
+    """
+
+    def __init__(self, factors=32, regularization=0.05, alpha=40.0, iterations=8,
+                 num_threads=None, random_state=42):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.random_state = random_state
+
+        self.user_factors = np.zeros((0, factors), dtype=np.float32)
+        self.item_factors = np.zeros((0, factors), dtype=np.float32)
+        self.user_gram = None
+        self.item_gram = None
+
+    def fit(self, user_items):
+        """
+        Train factors from a users x items interaction matrix
+
+        Args:
+            user_items (sparse.csr_matrix): Interaction strength per (user, item)
+        """
+        from scipy import sparse
+
+        user_items = sparse.csr_matrix(user_items, dtype=np.float32)
+        item_users = user_items.T.tocsr()
+        n_users, n_items = user_items.shape
+
+        rng = np.random.default_rng(self.random_state)
+        users = (rng.standard_normal((n_users, self.factors)) * 0.01).astype(np.float32)
+        items = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.num_threads) as pool:
+            for _ in range(self.iterations):
+                self._solve(user_items, users, items, pool)
+                self._solve(item_users, items, users, pool)
+
+        self.user_factors, self.item_factors = users, items
+        # Kept for fold-in, which solves against the fixed trained factors
+        self.user_gram = self._gram(users)
+        self.item_gram = self._gram(items)
+
+    def _gram(self, fixed):
+        """Y^T Y + lambda * I for the fixed side"""
+        return (fixed.T @ fixed).astype(np.float64) + self.regularization * np.eye(self.factors)
+
+    def _solve(self, matrix, target, fixed, pool):
+        """Recompute every row of target with fixed held constant"""
+        gram = self._gram(fixed)
+        chunks = np.array_split(np.arange(matrix.shape[0]), self.num_threads * 4)
+        list(pool.map(lambda rows: self._solve_rows(matrix, target, fixed, gram, rows), chunks))
+
+    def _solve_rows(self, matrix, target, fixed, gram, rows):
+        """Least-squares update for a chunk of rows"""
+        indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+        for row in rows:
+            start, end = indptr[row], indptr[row + 1]
+            if start == end:
+                target[row] = 0.0
+                continue
+            target[row] = self.solve_vector(fixed, gram, indices[start:end], data[start:end])
+
+    def solve_vector(self, fixed, gram, indices, strengths):
+        """
+        Solve for one factor vector given the other side's factors
+
+        Args:
+            fixed (np.array): Factors of the other side
+            gram (np.array): _gram(fixed)
+            indices (np.array): Rows of fixed this vector interacted with
+            strengths (np.array): Interaction strengths
+
+        Returns:
+            np.array: float32 factor vector
+        """
+        confidence = self.alpha * np.asarray(strengths, dtype=np.float64)
+        vectors = fixed[indices].astype(np.float64)
+        a = gram + (vectors.T * confidence) @ vectors
+        b = vectors.T @ (1.0 + confidence)
+        return np.linalg.solve(a, b).astype(np.float32)
+
+
+class CollaborativeModel:
+    """
+    Serving wrapper around ImplicitALS
+
+    Maps user and product ids to factor rows, collects interactions that
+    arrive after training, and folds new users and products in with one
+    least-squares solve each instead of a full retrain.
+
+    Recent interactions are kept for at most max_recent_users users, least
+    recently active first out; an evicted user falls back to their trained
+    factors. Readers take their references under the same lock fit() swaps
+    the model under, so a score never mixes two trained models.
+    """
+
+    def __init__(self, min_interactions=3, max_recent_users=100000, **als_params):
+        self.min_interactions = min_interactions
+        self.max_recent_users = max_recent_users
+        self.als_params = als_params
+
+        self.als = None
+        self.user_index = {}
+        self.item_index = {}
+        self.item_ids = []
+        self.user_items = None
+        self.trained_at = None
+
+        # Interactions since the last full fit: user -> {product: strength},
+        # least recently active user first, and product -> users who touched it
+        self.recent = OrderedDict()
+        self.item_users = {}
+        self.folded_users = {}
+        self.folded_items = {}
+        self._lock = threading.Lock()
+
+    def fit(self, user_rows, item_rows, strengths, user_ids, item_ids):
+        """
+        Train from aligned interaction arrays
+
+        Args:
+            user_rows (np.array): User row per interaction, indexing user_ids
+            item_rows (np.array): Product row per interaction, indexing item_ids
+            strengths (np.array): Interaction strength per interaction
+            user_ids (list): User id of each row
+            item_ids (list): Product id of each row
+
+        Returns:
+            float: Training time in seconds
+        """
+        from scipy import sparse
+
+        started = time.time()
+
+        # Duplicate (user, item) pairs are summed
+        user_items = sparse.csr_matrix(
+            (np.asarray(strengths, dtype=np.float32), (user_rows, item_rows)),
+            shape=(len(user_ids), len(item_ids))
+        )
+        user_items.sum_duplicates()
+
+        als = ImplicitALS(**self.als_params)
+        als.fit(user_items)
+
+        with self._lock:
+            self.als = als
+            self.user_index = {str(user_id): row for row, user_id in enumerate(user_ids)}
+            self.item_index = {str(item_id): row for row, item_id in enumerate(item_ids)}
+            self.item_ids = [str(item_id) for item_id in item_ids]
+            self.user_items = user_items
+            self.recent, self.item_users = OrderedDict(), {}
+            self.folded_users, self.folded_items = {}, {}
+            self.trained_at = time.time()
+
+        return time.time() - started
+
+    def add_interactions(self, interactions):
+        """
+        Record interactions that arrived after training and fold them in
+
+        Args:
+            interactions (list): [{'user_id', 'product_id', 'action'}]
+        """
+        if self.als is None:
+            return
+
+        with self._lock:
+            touched_users, touched_items = set(), set()
+            for interaction in interactions:
+                user_id, product_id = interaction.get('user_id'), interaction.get('product_id')
+                if not user_id or not product_id:
+                    continue
+                user_id, product_id = str(user_id), str(product_id)
+                row = self.recent.setdefault(user_id, {})
+                self.recent.move_to_end(user_id)
+                row[product_id] = row.get(product_id, 0.0) + ACTION_WEIGHTS.get(
+                    interaction.get('action'), 1.0)
+                self.item_users.setdefault(product_id, set()).add(user_id)
+                touched_users.add(user_id)
+                touched_items.add(product_id)
+            self._evict_recent()
+            touched_users &= self.recent.keys()
+
+            for product_id in touched_items - set(self.item_index):
+                self._fold_in_item(product_id)
+            for user_id in touched_users:
+                self._fold_in_user(user_id)
+
+    def _evict_recent(self):
+        """Drop the least recently active users beyond max_recent_users"""
+        while len(self.recent) > self.max_recent_users:
+            user_id, items = self.recent.popitem(last=False)
+            self.folded_users.pop(user_id, None)
+            for product_id in items:
+                users = self.item_users.get(product_id)
+                users.discard(user_id)
+                if not users:
+                    del self.item_users[product_id]
+
+    def _user_history(self, user_id):
+        """Trained plus recent interactions of a user as {product: strength}"""
+        history = {}
+        row = self.user_index.get(user_id)
+        if row is not None:
+            start, end = self.user_items.indptr[row], self.user_items.indptr[row + 1]
+            for col, value in zip(self.user_items.indices[start:end], self.user_items.data[start:end]):
+                history[self.item_ids[col]] = float(value)
+        for product_id, value in self.recent.get(user_id, {}).items():
+            history[product_id] = history.get(product_id, 0.0) + value
+        return history
+
+    def _item_vector(self, product_id):
+        """Factor vector of a trained or folded-in product"""
+        row = self.item_index.get(product_id)
+        if row is not None:
+            return self.als.item_factors[row]
+        return self.folded_items.get(product_id)
+
+    def _fold_in_user(self, user_id):
+        """Solve a user's factors against fixed product factors"""
+        history = [(p, v) for p, v in self._user_history(user_id).items() if self._item_vector(p) is not None]
+        if len(history) < self.min_interactions:
+            return
+        vectors = np.stack([self._item_vector(p) for p, _ in history])
+        self.folded_users[user_id] = self.als.solve_vector(
+            vectors, self.als.item_gram, np.arange(len(history)), [v for _, v in history])
+
+    def _fold_in_item(self, product_id):
+        """Solve a new product's factors against the factors of users who touched it"""
+        users = [
+            (self._user_vector(user_id), self.recent[user_id][product_id])
+            for user_id in self.item_users.get(product_id, ())
+        ]
+        users = [(vector, value) for vector, value in users if vector is not None]
+        if not users:
+            return
+        vectors = np.stack([vector for vector, _ in users])
+        self.folded_items[product_id] = self.als.solve_vector(
+            vectors, self.als.user_gram, np.arange(len(users)),
+            [value for _, value in users])
+
+    def _user_vector(self, user_id):
+        """Factor vector of a trained or folded-in user"""
+        vector = self.folded_users.get(user_id)
+        if vector is not None:
+            return vector
+        row = self.user_index.get(user_id)
+        if row is not None:
+            return self.als.user_factors[row]
+        return None
+
+    def score(self, user_id, product_ids):
+        """
+        Collaborative scores of candidate products for a user
+
+        Args:
+            user_id (str): User id
+            product_ids (list): Candidate product ids
+
+        Returns:
+            np.array: float32 scores (0 for unknown products), or None if
+                the user has no factors
+        """
+        if self.als is None or not user_id:
+            return None
+        with self._lock:
+            user_vector = self._user_vector(str(user_id))
+            if user_vector is None:
+                return None
+            item_factors = self.als.item_factors
+            rows = np.array([self.item_index.get(p, -1) for p in product_ids], dtype=np.int64)
+            folded = [(n, self.folded_items.get(product_ids[n])) for n in np.flatnonzero(rows < 0)]
+
+        known = rows >= 0
+        scores = np.zeros(len(product_ids), dtype=np.float32)
+        scores[known] = item_factors[rows[known]] @ user_vector
+        for n, vector in folded:
+            if vector is not None:
+                scores[n] = vector @ user_vector
+        return scores
+
+    def recommend(self, user_id, top_n=20, exclude_seen=True):
+        """
+        Top products for a user over the whole trained item set
+
+        Args:
+            user_id (str): User id
+            top_n (int): Number of products
+            exclude_seen (bool): Skip products the user already interacted with
+
+        Returns:
+            list: [(product_id, score)] best first
+        """
+        if self.als is None:
+            return []
+        with self._lock:
+            user_vector = self._user_vector(str(user_id))
+            if user_vector is None:
+                return []
+            item_factors, item_ids = self.als.item_factors, self.item_ids
+            seen = [self.item_index.get(p) for p in self._user_history(str(user_id))] if exclude_seen else []
+
+        scores = item_factors @ user_vector
+        for row in seen:
+            if row is not None:
+                scores[row] = -np.inf
+
+        k = min(top_n, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(item_ids[row], float(scores[row])) for row in top if np.isfinite(scores[row])]
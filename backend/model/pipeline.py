@@ -0,0 +1,312 @@
+"""
+Two-stage recommendation pipeline
+Candidate generators run concurrently under per-stage time budgets; their
+results are merged and deduplicated, then ranked and re-ranked
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from utils.metrics import STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class CandidateGenerator:
+    """
+    Base class for candidate generators
+
+    Subclasses implement generate(context, limit) and return catalog
+    products. A generator that runs past its budget is skipped for
+    `cooldown` seconds so slow sources stop costing latency under load;
+    primary generators are never skipped.
+    """
+
+    name = 'generator'
+    primary = False
+
+    def __init__(self, budget_ms=50, limit=100, cooldown=30):
+        self.budget_ms = budget_ms
+        self.limit = limit
+        self.cooldown = cooldown
+        self.skip_until = 0.0
+
+    def generate(self, context, limit):
+        """
+        Produce candidate products
+
+        Args:
+            context (dict): Request context (user_profile, filters, gender, user_id)
+            limit (int): Maximum candidates
+
+        Returns:
+            list: Candidate products
+        """
+        raise NotImplementedError
+
+
+class InvertedIndexGenerator(CandidateGenerator):
+    """Keyword matches of the user's interests and style in the catalog text index"""
+
+    name = 'inverted_index'
+    primary = True
+
+    def __init__(self, catalog, **kwargs):
+        super().__init__(**kwargs)
+        self.catalog = catalog
+
+    def generate(self, context, limit):
+        profile = context['user_profile']
+        text = ' '.join(list(profile.get('interests', [])) + [profile.get('fashion_style', '')])
+        if not text.strip():
+            return []
+        return self.catalog.search(text, filters=context['filters'], limit=limit)
+
+
+class CategoryGenerator(CandidateGenerator):
+    """Catalog products in the requested category, or in the user's interest categories"""
+
+    name = 'category'
+    primary = True
+
+    def __init__(self, catalog, **kwargs):
+        super().__init__(**kwargs)
+        self.catalog = catalog
+
+    def generate(self, context, limit):
+        filters = dict(context['filters'])
+        category = filters.get('category', 'all')
+        categories = [category] if category and category != 'all' else context['user_profile'].get('interests', [])[:3]
+
+        products = []
+        for category in categories or ['all']:
+            filters['category'] = category
+            products.extend(self.catalog.query(filters, limit=limit))
+        return products[:limit]
+
+
+class TrendingGenerator(CandidateGenerator):
+    """Currently trending products from the streaming counters"""
+
+    name = 'trending'
+
+    def __init__(self, catalog, engine, **kwargs):
+        super().__init__(**kwargs)
+        self.catalog = catalog
+        self.engine = engine
+
+    def generate(self, context, limit):
+        product_ids = [product_id for product_id, _ in self.engine.get_trending_ids(limit)]
+        products, _ = self.catalog.get_many(product_ids)
+        return self.catalog.restrict(products, context['filters'])
+
+
+class CoVisitationGenerator(CandidateGenerator):
+    """Products co-visited with the ones in the user's current session"""
+
+    name = 'covisitation'
+
+    def __init__(self, catalog, engine, seeds=5, **kwargs):
+        super().__init__(**kwargs)
+        self.catalog = catalog
+        self.engine = engine
+        self.seeds = seeds
+
+    def generate(self, context, limit):
+        session = self.engine.covisitation.sessions.get(str(context.get('user_id')))
+        if not session:
+            return []
+
+        product_ids = []
+        for seed in list(session)[-self.seeds:]:
+            product_ids.extend(product_id for product_id, _ in self.engine.get_also_viewed(seed, limit))
+        products, _ = self.catalog.get_many(product_ids)
+        return self.catalog.restrict(products, context['filters'])
+
+
+class CollaborativeGenerator(CandidateGenerator):
+    """Top products by matrix factorization score for known users"""
+
+    name = 'collaborative'
+
+    def __init__(self, catalog, engine, **kwargs):
+        super().__init__(**kwargs)
+        self.catalog = catalog
+        self.engine = engine
+
+    def generate(self, context, limit):
+        if not context.get('user_id'):
+            return []
+        product_ids = [product_id for product_id, _ in self.engine.collaborative.recommend(context['user_id'], limit)]
+        products, _ = self.catalog.get_many(product_ids)
+        return self.catalog.restrict(products, context['filters'])
+
+
+class RecommendationPipeline:
+    """
+    Generate -> merge -> rank -> re-rank
+
+    Generators share a thread pool. Each gets its budget from the moment it
+    starts running, so time spent queued behind other requests does not
+    count against it; a generator still queued after `queue_wait_ms` is
+    dropped from the request without a cooldown. Results that arrive late
+    are dropped. When no generator produced anything, `fallback` supplies
+    the candidates. Stage latencies of every run are returned and
+    aggregated in stats().
+
+    Args:
+        generators (list): CandidateGenerator instances
+        ranker (callable): ranker(context, candidates, top_n) -> ranked products
+        rerankers (list): reranker(context, ranked, top_n) -> products, applied in order
+        fallback (callable): fallback(context, limit) -> products, used when no candidates were generated
+        max_candidates (int): Cap on merged candidates passed to the ranker
+        rank_depth (int): Products kept from ranking for the re-rankers
+        queue_wait_ms (float): How long a generator may wait for a pool thread
+    """
+
+    def __init__(self, generators, ranker, rerankers=None, fallback=None, max_candidates=300, rank_depth=200,
+                 max_workers=8, queue_wait_ms=200):
+        self.generators = generators
+        self.ranker = ranker
+        self.rerankers = rerankers or []
+        self.fallback = fallback
+        self.max_candidates = max_candidates
+        self.rank_depth = rank_depth
+        self.queue_wait_ms = queue_wait_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='candidates')
+
+        self.latency = {}
+        self._lock = threading.Lock()
+
+    def run(self, context, top_n=20):
+        """
+        Produce recommendations for one request
+
+        Args:
+            context (dict): Request context (user_profile, filters, gender, user_id)
+            top_n (int): Number of products to return
+
+        Returns:
+            tuple: (list of products, {stage: milliseconds})
+        """
+        timings = {}
+        started = time.perf_counter()
+
+        candidates = self._generate(context, timings)
+
+        stage = time.perf_counter()
+        ranked = self.ranker(context, candidates, max(top_n, self.rank_depth))
+        timings['rank'] = (time.perf_counter() - stage) * 1000
+
+        for reranker in self.rerankers:
+            stage = time.perf_counter()
+            ranked = reranker(context, ranked, top_n)
+            timings[f"rerank.{getattr(reranker, 'name', type(reranker).__name__)}"] = (time.perf_counter() - stage) * 1000
+
+        timings['total'] = (time.perf_counter() - started) * 1000
+        self._record(timings)
+        return ranked[:top_n], timings
+
+    def _generate(self, context, timings):
+        """Run generators concurrently and merge their candidates"""
+        started = time.perf_counter()
+        now = time.time()
+
+        runs = []
+        for generator in self.generators:
+            if generator.skip_until > now and not generator.primary:
+                timings[f"generate.{generator.name}"] = None
+                continue
+            run = {'started': threading.Event(), 'at': None}
+            runs.append((generator, run, self.executor.submit(self._timed, generator, context, run)))
+
+        results = []
+        for generator, run, future in sorted(runs, key=lambda item: item[0].budget_ms):
+            timings[f"generate.{generator.name}"] = None
+            queue_left = self.queue_wait_ms / 1000 - (time.perf_counter() - started)
+            if not run['started'].wait(max(0.0, queue_left)):
+                # Pool saturated: this request goes without the generator, which is not penalised
+                future.cancel()
+                logger.debug("Candidate generator '%s' did not start within %sms", generator.name, self.queue_wait_ms)
+                continue
+
+            remaining = generator.budget_ms / 1000 - (time.perf_counter() - run['at'])
+            try:
+                products, elapsed = future.result(timeout=max(0.0, remaining))
+                timings[f"generate.{generator.name}"] = elapsed
+                results.append((generator.name, products))
+            except TimeoutError:
+                if generator.primary:
+                    logger.warning("Candidate generator '%s' exceeded %sms", generator.name, generator.budget_ms)
+                else:
+                    generator.skip_until = time.time() + generator.cooldown
+                    logger.warning("⚠ Candidate generator '%s' exceeded %sms, skipping it for %ss",
+                                   generator.name, generator.budget_ms, generator.cooldown)
+            except Exception as e:
+                logger.error("Error in candidate generator '%s': %s", generator.name, e)
+
+        stage = time.perf_counter()
+        candidates = self._merge(results)
+        timings['merge'] = (time.perf_counter() - stage) * 1000
+
+        if not candidates and self.fallback is not None:
+            stage = time.perf_counter()
+            candidates = self.fallback(context, self.max_candidates)
+            timings['fallback'] = (time.perf_counter() - stage) * 1000
+        return candidates
+
+    def _timed(self, generator, context, run):
+        """Run one generator and measure it, marking when it started"""
+        run['at'] = started = time.perf_counter()
+        run['started'].set()
+        products = generator.generate(context, generator.limit)
+        return products, (time.perf_counter() - started) * 1000
+
+    def _merge(self, results):
+        """Deduplicate candidates by id, interleaving generators round-robin"""
+        seen = set()
+        merged = []
+        position = 0
+        while len(merged) < self.max_candidates and any(position < len(p) for _, p in results):
+            for _, products in results:
+                if position < len(products):
+                    product = products[position]
+                    product_id = product.get('id')
+                    if product_id not in seen:
+                        seen.add(product_id)
+                        merged.append(product)
+            position += 1
+        return merged[:self.max_candidates]
+
+    def _record(self, timings):
+        """Aggregate stage latencies (also exported as stage_duration_seconds, total as "pipeline")"""
+        for stage, ms in timings.items():
+            if ms is not None:
+                STAGE_LATENCY.labels('pipeline' if stage == 'total' else stage).observe(ms / 1000)
+
+        with self._lock:
+            for stage, ms in timings.items():
+                if ms is None:
+                    continue
+                entry = self.latency.setdefault(stage, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                entry['count'] += 1
+                entry['total_ms'] += ms
+                entry['max_ms'] = max(entry['max_ms'], ms)
+
+    def stats(self):
+        """
+        Get per-stage latency statistics
+
+        Returns:
+            dict: {stage: {'count', 'avg_ms', 'max_ms'}}
+        """
+        with self._lock:
+            return {
+                stage: {
+                    'count': entry['count'],
+                    'avg_ms': round(entry['total_ms'] / entry['count'], 3),
+                    'max_ms': round(entry['max_ms'], 3)
+                }
+                for stage, entry in self.latency.items()
+            }
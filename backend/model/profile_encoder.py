@@ -0,0 +1,106 @@
+"""
+Memoized user profile encoder
+Interests and styles come from small fixed vocabularies, so the same few
+profiles recur constantly; their vectors are computed once and reused
+"""
+import threading
+from collections import OrderedDict
+
+
+def canonical_profile(user_profile):
+    """
+    Reduce a profile to the fields that determine its vectors
+
+    Args:
+        user_profile (dict): User's interests and fashion style
+
+    Returns:
+        tuple: (sorted distinct lowercase interests, lowercase style)
+    """
+    interests = tuple(sorted({str(i).strip().lower() for i in user_profile.get('interests', []) if i}))
+    return interests, str(user_profile.get('fashion_style') or '').strip().lower()
+
+
+class ProfileEncoder:
+    """
+    LRU cache from canonical profile to its TF-IDF vector and dense embedding
+
+    Keys include the version of the text cache state the TF-IDF row was
+    encoded with, read together with the vocabulary itself, so a row is
+    never filed under another catalog version; stale entries simply age
+    out of the LRU. A missing embedding is not cached: it is computed again
+    on the next hit, so profiles seen before the semantic model finished
+    loading get their embedding once it is available.
+
+    Args:
+        text_cache (ProductTextCache): Source of the catalog vocabulary
+        text_fn (callable): Profile dict -> profile text
+        embed_fn (callable): Text -> dense embedding, or None
+        max_size (int): Maximum cached profiles
+    """
+
+    def __init__(self, text_cache, text_fn, embed_fn=None, max_size=4096):
+        self.text_cache = text_cache
+        self.text_fn = text_fn
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def encode(self, user_profile, state=None):
+        """
+        Get the vectors of a profile
+
+        Args:
+            user_profile (dict): User's interests and fashion style
+            state (tuple): Text cache state from current() (default: the
+                served one); product vectors compared with the TF-IDF row
+                must come from the same state
+
+        Returns:
+            tuple: (1 x vocabulary sparse TF-IDF row or None if no catalog is
+                cached yet, dense embedding or None)
+        """
+        state = self.text_cache.current() if state is None else state
+        interests, style = canonical_profile(user_profile)
+        key = (interests, style, state[-1] if state is not None else 0)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            if entry[1] is not None or self.embed_fn is None:
+                return entry
+            embedding = self.embed_fn(self.text_fn({'interests': list(interests), 'fashion_style': style}))
+            if embedding is None:
+                return entry
+            entry = (entry[0], embedding)
+            with self._lock:
+                if key in self.entries:
+                    self.entries[key] = entry
+            return entry
+
+        with self._lock:
+            self.misses += 1
+
+        text = self.text_fn({'interests': list(interests), 'fashion_style': style})
+        entry = (
+            self.text_cache.encode(text, state) if state is not None else None,
+            self.embed_fn(text) if self.embed_fn else None
+        )
+
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        """Get cache size and hit counters"""
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
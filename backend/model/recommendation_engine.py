@@ -1,12 +1,32 @@
+import importlib.util
+import logging
+import os
+import time
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import warnings
+from model.similarity_table import SimilarityTableBuilder
+from model.covisitation import ACTION_WEIGHTS, CoVisitationModel
+from model.trending import TrendingCounter, interaction_events
+from model.matrix_factorization import CollaborativeModel
+from model.seen_filter import SeenItemFilter
+from model.diversity import ProductVectorBlock
+from model.text_cache import ProductTextCache
+from model.profile_encoder import ProfileEncoder
+from services.interaction_store import ACTIONS
+from utils.metrics import observe_stage, stage
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
+# sklearn and sentence_transformers are imported lazily (warm_up() or first use):
+# together they add seconds to process start.
 # Don't import sentence_transformers at module level - it causes issues with Python 3.13
-SENTENCE_TRANSFORMERS_AVAILABLE = False
-print("⚠ sentence-transformers not available, using TF-IDF only")
+SEMANTIC_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+def sentence_transformers_available():
+    """Check whether sentence-transformers is installed, without importing it"""
+    return importlib.util.find_spec('sentence_transformers') is not None
 
 class RecommendationEngine:
     """
@@ -21,16 +41,96 @@ class RecommendationEngine:
     """
     
     def __init__(self):
-        # TF-IDF vectorizer (fallback method)
-        self.vectorizer = TfidfVectorizer(
-            max_features=500,
-            stop_words='english',
-            ngram_range=(1, 2)
-        )
+        # TF-IDF vectorizer (fallback method), created on first use
+        self._vectorizer = None
         
-        # Sentence Transformer model (semantic embeddings)
+        # Sentence Transformer model (semantic embeddings), opt-in via USE_SEMANTIC_MODEL
         self.semantic_model = None
-        self.use_semantic = False  # Disabled due to Python 3.13 compatibility
+        self.use_semantic = False
+        self.warmed_up = False
+        
+        # Product texts and TF-IDF term vectors, computed once per catalog build
+        self.text_cache = ProductTextCache(self._build_product_text)
+        
+        # Memoized profile vectors, keyed by canonical profile and catalog version
+        self.profile_encoder = ProfileEncoder(
+            self.text_cache,
+            self._create_user_profile_text,
+            embed_fn=self._get_semantic_embedding
+        )
+        
+        # Precomputed top-K neighbours per catalog product, built in the background
+        self.similarity_builder = SimilarityTableBuilder(self._create_product_text)
+        
+        # Unit-length product vectors for diversity re-ranking
+        self.product_vectors = ProductVectorBlock(self._create_product_text)
+        
+        # Session co-visitation counts for "customers also viewed"
+        self.covisitation = CoVisitationModel()
+        
+        # Exponentially decayed per-product interaction counters for trending
+        self.trending = TrendingCounter()
+        
+        # Implicit-feedback matrix factorization for collaborative scoring
+        self.collaborative = CollaborativeModel()
+        self.collaborative_weight = 0.3
+        
+        # Products each user already interacted with; seen products are demoted
+        self.seen_items = SeenItemFilter()
+        self.seen_penalty = 0.5
+    
+    @property
+    def vectorizer(self):
+        """Per-request TF-IDF vectorizer used when no catalog text cache exists"""
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._vectorizer = TfidfVectorizer(
+                max_features=500,
+                stop_words='english',
+                ngram_range=(1, 2)
+            )
+        return self._vectorizer
+    
+    def warm_up(self):
+        """
+        Import the ML libraries and load optional models ahead of the first request
+        
+        Safe to call from a background thread; requests that arrive earlier
+        import what they need on first use.
+        """
+        started = time.time()
+        import sklearn.feature_extraction.text  # noqa: F401
+        import sklearn.metrics.pairwise  # noqa: F401
+        import scipy.sparse  # noqa: F401
+        
+        if os.getenv('USE_SEMANTIC_MODEL', 'false').lower() == 'true':
+            if sentence_transformers_available():
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self.semantic_model = SentenceTransformer(SEMANTIC_MODEL_NAME)
+                    self.use_semantic = True
+                    logger.info("✓ Loaded semantic model %s", SEMANTIC_MODEL_NAME)
+                except Exception as e:
+                    logger.warning("⚠ Could not load semantic model, using TF-IDF only: %s", e)
+            else:
+                logger.warning("⚠ sentence-transformers not available, using TF-IDF only")
+        
+        self.warmed_up = True
+        logger.info("✓ Recommendation engine warmed up in %.2fs", time.time() - started)
+    
+    def lookup_similar_products(self, product_id, top_n=5):
+        """
+        Get similar products from the precomputed similarity table
+        
+        Args:
+            product_id (str): Target product id
+            top_n (int): Number of similar products to return
+            
+        Returns:
+            list: Similar products with similarity scores, or None if the
+                table is not built yet or does not contain the product
+        """
+        return self.similarity_builder.lookup(product_id, top_n)
     
     def _get_semantic_embedding(self, text):
         """
@@ -49,7 +149,7 @@ class RecommendationEngine:
             embedding = self.semantic_model.encode(text, convert_to_numpy=True)
             return embedding
         except Exception as e:
-            print(f"⚠ Error generating semantic embedding: {str(e)}")
+            logger.warning("⚠ Error generating semantic embedding: %s", e)
             return None
 
     def get_recommendations(self, user_profile, products, filters=None, top_n=20):
@@ -65,31 +165,28 @@ class RecommendationEngine:
         Returns:
             list: Sorted list of recommended products with relevance scores
         """
-        print(f"🤖 Recommendation engine: Received {len(products)} products")
-        print(f"🤖 User profile: {user_profile}")
-        print(f"🤖 Filters: {filters}")
+        logger.debug("🤖 Recommendation engine: Received %d products", len(products),
+                     extra={'profile': user_profile, 'filters': filters})
         
         if not products:
-            print("⚠️  No products to recommend!")
+            logger.warning("⚠️  No products to recommend!")
             return []
         
-        # Create user preference text
-        user_text = self._create_user_profile_text(user_profile)
-        
-        # Create product texts
-        product_texts = [self._create_product_text(p) for p in products]
-        
         try:
+            stage_started = time.perf_counter()
+            
+            # Cached vectors of the user preference text, encoded with the
+            # same catalog vocabulary as the product vectors below
+            text_state = self.text_cache.current()
+            user_tfidf, user_embedding = self.profile_encoder.encode(user_profile, text_state)
+            
             # Method 1: Semantic similarity using Sentence Transformers
             semantic_scores = []
             if self.use_semantic and self.semantic_model is not None:
-                # Get user embedding
-                user_embedding = self._get_semantic_embedding(user_text)
-                
                 if user_embedding is not None:
                     # Get product embeddings
                     product_embeddings = self.semantic_model.encode(
-                        product_texts, 
+                        [self._create_product_text(p) for p in products], 
                         convert_to_numpy=True,
                         show_progress_bar=False
                     )
@@ -106,11 +203,26 @@ class RecommendationEngine:
                 semantic_scores = [0.0] * len(products)
             
             # Method 2: TF-IDF similarity (fallback/complement)
-            all_texts = [user_text] + product_texts
-            tfidf_matrix = self.vectorizer.fit_transform(all_texts)
-            user_vector = tfidf_matrix[0:1]
-            product_vectors = tfidf_matrix[1:]
-            tfidf_scores = cosine_similarity(user_vector, product_vectors)[0]
+            if user_tfidf is not None:
+                # Precomputed unit-length term vectors: cosine is a sparse dot product
+                product_vectors = self.text_cache.vectors(products, text_state)
+                tfidf_scores = (product_vectors @ user_tfidf.T).toarray().ravel()
+            else:
+                user_text = self._create_user_profile_text(user_profile)
+                all_texts = [user_text] + [self._create_product_text(p) for p in products]
+                from sklearn.metrics.pairwise import cosine_similarity
+                tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+                user_vector = tfidf_matrix[0:1]
+                product_vectors = tfidf_matrix[1:]
+                tfidf_scores = cosine_similarity(user_vector, product_vectors)[0]
+            
+            stage_started = observe_stage('vectorise', stage_started)
+            
+            # Method 3: Collaborative score from the user's factor vector
+            cf_scores = self._collaborative_scores(user_profile.get('user_id'), products)
+            
+            # Products the user already interacted with
+            seen = self.seen_items.contains(user_profile.get('user_id'), [p.get('id') for p in products])
             
             # Hybrid scoring: 70% Semantic + 30% TF-IDF
             # If Semantic is not available, use 100% TF-IDF
@@ -125,6 +237,15 @@ class RecommendationEngine:
                     # TF-IDF only
                     hybrid_score = tfidf_scores[i]
                 
+                if cf_scores is not None:
+                    hybrid_score = ((1 - self.collaborative_weight) * hybrid_score +
+                                    self.collaborative_weight * cf_scores[i])
+                    product_copy['collaborativeScore'] = float(cf_scores[i])
+                
+                if seen[i]:
+                    hybrid_score *= self.seen_penalty
+                    product_copy['seen'] = True
+                
                 product_copy['relevanceScore'] = float(hybrid_score)
                 product_copy['semanticScore'] = float(semantic_scores[i]) if semantic_scores else 0.0
                 product_copy['tfidfScore'] = float(tfidf_scores[i])
@@ -132,27 +253,97 @@ class RecommendationEngine:
             
             # Sort by relevance score
             products_with_scores.sort(key=lambda x: x['relevanceScore'], reverse=True)
+            observe_stage('score', stage_started)
             
             # Apply post-processing filters
-            print(f"🤖 Before filtering: {len(products_with_scores)} products")
-            filtered_products = self._apply_filters(products_with_scores, filters)
-            print(f"🤖 After filtering: {len(filtered_products)} products")
+            with stage('filter'):
+                filtered_products = self._apply_filters(products_with_scores, filters)
+            logger.debug("🤖 Filtered %d of %d products", len(filtered_products), len(products_with_scores))
             
-            if len(filtered_products) > 0:
-                print(f"🤖 Top product: {filtered_products[0].get('title', 'Unknown')} (score: {filtered_products[0].get('relevanceScore', 0):.3f})")
+            if filtered_products and logger.isEnabledFor(logging.DEBUG):
+                top = filtered_products[0]
+                logger.debug("🤖 Top product: %s (score: %.3f)", top.get('title', 'Unknown'), top.get('relevanceScore', 0))
             
             # Return top N recommendations
             return filtered_products[:top_n]
             
         except Exception as e:
-            print(f"Error in recommendation engine: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in recommendation engine: %s", e)
             # Fallback: return products as-is with default scores
             for product in products:
                 product['relevanceScore'] = 0.5
             return products[:top_n]
     
+    def rank(self, context, candidates, top_n):
+        """
+        Ranking stage of the recommendation pipeline
+        
+        Args:
+            context (dict): Pipeline request context
+            candidates (list): Merged candidate products
+            top_n (int): Number of ranked products to keep
+            
+        Returns:
+            list: Candidates with relevance scores, best first
+        """
+        return self.get_recommendations(context['user_profile'], candidates, context['filters'], top_n)
+    
+    def _collaborative_scores(self, user_id, products):
+        """
+        Score candidates by the dot product of user and product factors
+        
+        Args:
+            user_id (str): User id from the profile
+            products (list): Candidate products
+            
+        Returns:
+            np.array: Scores scaled to [0, 1], or None if the user is unknown
+        """
+        scores = self.collaborative.score(user_id, [str(p.get('id')) for p in products])
+        if scores is None or len(scores) == 0:
+            return None
+        
+        low, high = float(scores.min()), float(scores.max())
+        if high - low < 1e-9:
+            return None
+        return (scores - low) / (high - low)
+    
+    def train_collaborative(self, interaction_store, days=90):
+        """
+        Fully retrain the matrix factorization model from the interaction store
+        
+        Args:
+            interaction_store (InteractionStore): Compacted interaction history
+            days (int): How far back to train on
+            
+        Returns:
+            float: Training time in seconds, or None if there was nothing to train on
+        """
+        try:
+            history = interaction_store.scan(start=time.time() - days * 86400,
+                                             columns=('user', 'product', 'action'))
+            if len(history['user']) == 0:
+                return None
+            
+            action_weights = np.array([ACTION_WEIGHTS.get(a, 1.0) for a in ACTIONS], dtype=np.float32)
+            user_codes, user_rows = np.unique(history['user'], return_inverse=True)
+            product_codes, product_rows = np.unique(history['product'], return_inverse=True)
+            
+            elapsed = self.collaborative.fit(
+                user_rows,
+                product_rows,
+                action_weights[history['action']],
+                interaction_store.decode_users(user_codes),
+                interaction_store.decode_products(product_codes)
+            )
+            logger.info("✓ Trained collaborative model on %d interactions (%d users, %d products) in %.1fs",
+                        len(user_rows), len(user_codes), len(product_codes), elapsed)
+            return elapsed
+            
+        except Exception as e:
+            logger.error("Error training collaborative model: %s", e)
+            return None
+    
     def _create_user_profile_text(self, user_profile):
         """
         Create a text representation of user profile
@@ -180,6 +371,18 @@ class RecommendationEngine:
         return ' '.join(text_parts).lower()
     
     def _create_product_text(self, product):
+        """
+        Get the text representation of a product, cached for catalog products
+        
+        Args:
+            product (dict): Product information
+            
+        Returns:
+            str: Combined text of product features
+        """
+        return self.text_cache.text(product)
+    
+    def _build_product_text(self, product):
         """
         Create a text representation of product
         
@@ -271,13 +474,18 @@ class RecommendationEngine:
         Find similar products based on semantic embeddings
         
         Args:
-            product (dict): Target product
+            product (dict|str): Target product, or just its id
             all_products (list): List of all products
             top_n (int): Number of similar products to return
             
         Returns:
             list: Similar products with similarity scores
         """
+        if isinstance(product, str):
+            product = next((p for p in all_products if p.get('id') == product), None)
+            if product is None:
+                return []
+        
         if not self.use_semantic or not self.semantic_model:
             # Fallback to TF-IDF
             return self._get_similar_products_tfidf(product, all_products, top_n)
@@ -318,7 +526,7 @@ class RecommendationEngine:
             return similarities[:top_n]
             
         except Exception as e:
-            print(f"Error finding similar products: {str(e)}")
+            logger.error("Error finding similar products: %s", e)
             return self._get_similar_products_tfidf(product, all_products, top_n)
     
     def _get_similar_products_tfidf(self, product, all_products, top_n=5):
@@ -326,16 +534,21 @@ class RecommendationEngine:
         Fallback method using TF-IDF for finding similar products
         """
         try:
-            target_text = self._create_product_text(product)
-            product_texts = [self._create_product_text(p) for p in all_products]
-            
-            all_texts = [target_text] + product_texts
-            tfidf_matrix = self.vectorizer.fit_transform(all_texts)
-            
-            target_vector = tfidf_matrix[0:1]
-            product_vectors = tfidf_matrix[1:]
-            
-            similarities_scores = cosine_similarity(target_vector, product_vectors)[0]
+            if self.text_cache.ready:
+                vectors = self.text_cache.vectors([product] + list(all_products))
+                similarities_scores = (vectors[1:] @ vectors[0:1].T).toarray().ravel()
+            else:
+                target_text = self._create_product_text(product)
+                product_texts = [self._create_product_text(p) for p in all_products]
+                
+                all_texts = [target_text] + product_texts
+                from sklearn.metrics.pairwise import cosine_similarity
+                tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+                
+                target_vector = tfidf_matrix[0:1]
+                product_vectors = tfidf_matrix[1:]
+                
+                similarities_scores = cosine_similarity(target_vector, product_vectors)[0]
             
             similarities = []
             for i, other_product in enumerate(all_products):
@@ -349,72 +562,132 @@ class RecommendationEngine:
             similarities.sort(key=lambda x: x['similarityScore'], reverse=True)
             return similarities[:top_n]
         except Exception as e:
-            print(f"Error in TF-IDF similarity: {str(e)}")
+            logger.error("Error in TF-IDF similarity: %s", e)
             return []
 
     def train_on_interactions(self, interactions):
         """
-        Track user interactions for continuous learning
-        In production, this would update a database for future model retraining
+        Feed user interactions into the seen-item filters and the
+        co-visitation, trending and collaborative models
+        
+        Interactions are queued and applied in micro-batches, so this is
+        cheap enough to call once per tracked event. New users and products
+        are folded into the collaborative model without a full retrain.
         
         Args:
             interactions (list): List of user-product interactions
-                Format: [{'user_id': str, 'product': dict, 'action': str, 'timestamp': str}]
+                Format: [{'user_id': str, 'product_id': str, 'action': str, 'timestamp': str}]
+                ('product': dict is accepted in place of 'product_id')
+        
+        Invalid events are logged and skipped, and every model is updated
+        on its own, so neither a bad event nor a failing model costs the
+        other models the batch.
         """
+        events = self._valid_interactions(interactions or [])
+        if not events:
+            return
+        
+        for event in events:
+            try:
+                self.seen_items.add(event['user_id'], [event['product_id']])
+            except Exception as e:
+                logger.error("Error updating seen items with %s: %s", event, e)
+            try:
+                self.covisitation.add(
+                    user_id=event['user_id'],
+                    product_id=event['product_id'],
+                    timestamp=event.get('timestamp'),
+                    action=event['action']
+                )
+            except Exception as e:
+                logger.error("Error updating co-visitation with %s: %s", event, e)
+        
         try:
-            if not interactions:
-                return
-            
-            # Log interactions for future ML model updates
-            print(f"Logged {len(interactions)} user interactions for ML training")
-            
-            # In production: Save to database (Firebase, PostgreSQL, etc.)
-            # This data can be used to:
-            # 1. Fine-tune the semantic model
-            # 2. Build collaborative filtering
-            # 3. Track trending products
-            # 4. Personalize recommendations further
-                
+            self.trending.update(interaction_events(events))
+        except Exception as e:
+            logger.error("Error updating trending counters: %s", e)
+        try:
+            self.collaborative.add_interactions(events)
         except Exception as e:
-            print(f"Error training on interactions: {str(e)}")
+            logger.error("Error folding interactions into the collaborative model: %s", e)
     
-    def get_trending_items(self, products, interactions, top_n=10):
+    def _valid_interactions(self, interactions):
         """
-        Get trending products based on recent interactions and semantic relevance
+        Normalize interactions and drop invalid ones
         
         Args:
-            products (list): All products
-            interactions (list): Recent user interactions
-            top_n (int): Number of trending items to return
+            interactions (list): Raw interaction dicts
             
         Returns:
-            list: Trending products
+            list: Interactions with string 'user_id' and 'product_id' and a string 'action'
+        """
+        events = []
+        for interaction in interactions:
+            try:
+                product_id = interaction.get('product_id') or (interaction.get('product') or {}).get('id')
+                user_id = interaction.get('user_id')
+                action = interaction.get('action') or 'view'
+                if not all(isinstance(value, (str, int)) and not isinstance(value, bool) and value != ''
+                           for value in (user_id, product_id)) or not isinstance(action, str):
+                    raise ValueError('user_id and product_id must be strings or integers, action a string')
+            except (AttributeError, ValueError) as e:
+                logger.warning("Skipping invalid interaction %r: %s", interaction, e)
+                continue
+            events.append(dict(interaction, user_id=str(user_id), product_id=str(product_id), action=action))
+        return events
+    
+    def get_also_viewed(self, product_id, top_n=10):
+        """
+        Get products that customers also viewed alongside a product
+        
+        Args:
+            product_id (str): Product id
+            top_n (int): Number of products to return
+            
+        Returns:
+            list: [(product_id, co-visitation score)] best first
         """
         try:
-            # Count interactions per product
-            product_scores = {}
-            for interaction in interactions:
-                product_id = interaction.get('product', {}).get('id')
-                if product_id:
-                    product_scores[product_id] = product_scores.get(product_id, 0) + 1
-            
-            # Add trending score to products
-            trending_products = []
-            for product in products:
-                product_id = product.get('id')
-                interaction_count = product_scores.get(product_id, 0)
-                
-                product_copy = product.copy()
-                # Combine interaction count with rating for trending score
-                trending_score = interaction_count * 0.7 + product.get('rating', 0) * 0.3
-                product_copy['trendingScore'] = trending_score
-                trending_products.append(product_copy)
+            return self.covisitation.lookup(product_id, top_n)
+        except Exception as e:
+            logger.error("Error getting also-viewed products: %s", e)
+            return []
+    
+    def load_interaction_history(self, interaction_store, days=7):
+        """
+        Warm the trending counters from the columnar interaction store
+        
+        Args:
+            interaction_store (InteractionStore): Compacted interaction history
+            days (int): How far back to load
+        """
+        try:
+            history = interaction_store.scan(start=time.time() - days * 86400,
+                                             columns=('product', 'action', 'ts'))
+            action_weights = np.array([ACTION_WEIGHTS.get(a, 1.0) for a in ACTIONS])
             
-            # Sort by trending score
-            trending_products.sort(key=lambda x: x['trendingScore'], reverse=True)
+            reference_time, scores = self.trending.load(
+                history['product'],
+                history['ts'],
+                weights=action_weights[history['action']]
+            )
+            if scores:
+                product_ids = interaction_store.decode_products(list(scores))
+                self.trending.merge(reference_time, dict(zip(product_ids, scores.values())))
             
-            return trending_products[:top_n]
+            logger.info("✓ Loaded %d interactions into trending counters", len(history['ts']))
             
         except Exception as e:
-            print(f"Error getting trending items: {str(e)}")
-            return products[:top_n]
+            logger.error("Error loading interaction history: %s", e)
+    
+    def get_trending_ids(self, top_n=20):
+        """
+        Get the currently trending product ids
+        
+        Args:
+            top_n (int): Number of products to return
+            
+        Returns:
+            list: [(product_id, decayed interaction score)] best first
+        """
+        return self.trending.top(top_n)
@@ -0,0 +1,134 @@
+"""
+Per-user seen-item filters
+Remembers which products a user already interacted with in a fixed few
+hundred bytes per user, so rankers can demote them in one vectorized pass
+"""
+import hashlib
+import threading
+
+import numpy as np
+
+
+class SeenItemFilter:
+    """
+    Per-user Bloom filters packed into one NumPy byte block
+
+    Every user owns a row of two Bloom filters: the current generation and
+    the previous one. Once the current generation holds `capacity` items it
+    becomes the previous one and a fresh filter starts, so old items age out
+    and the false-positive rate stays bounded (under 2% per generation at
+    capacity with the defaults). Membership checks are constant time per item.
+
+    Memory is 2 * bits / 8 bytes per user (256 bytes by default) plus the
+    id-to-row map; rows are recycled oldest-first beyond max_users.
+    """
+
+    def __init__(self, bits=1024, hashes=5, capacity=120, max_users=1000000, initial_users=1024):
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = capacity
+        self.max_users = max_users
+        self.row_bytes = bits // 8
+
+        self.rows = {}
+        self.row_users = []
+        self.filters = np.zeros((initial_users, 2, self.row_bytes), dtype=np.uint8)
+        self.counts = np.zeros(initial_users, dtype=np.int32)
+        self.current = np.zeros(initial_users, dtype=np.int8)
+        self._next_evict = 0
+
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def _bit_positions(self, product_id):
+        """Bit positions of a product (double hashing), cached per product"""
+        positions = self._positions.get(product_id)
+        if positions is None:
+            digest = hashlib.blake2b(str(product_id).encode('utf-8'), digest_size=16).digest()
+            h1 = int.from_bytes(digest[:8], 'little')
+            h2 = int.from_bytes(digest[8:], 'little') | 1
+            positions = np.array([(h1 + i * h2) % self.bits for i in range(self.hashes)], dtype=np.int64)
+            if len(self._positions) < 1000000:
+                self._positions[product_id] = positions
+        return positions
+
+    def _row(self, user_id):
+        """Get or allocate the filter row of a user"""
+        row = self.rows.get(user_id)
+        if row is not None:
+            return row
+
+        if len(self.row_users) < self.max_users:
+            row = len(self.row_users)
+            if row >= len(self.filters):
+                size = min(self.max_users, len(self.filters) * 2)
+                self.filters = np.concatenate([self.filters, np.zeros_like(self.filters)])[:size]
+                self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])[:size]
+                self.current = np.concatenate([self.current, np.zeros_like(self.current)])[:size]
+            self.row_users.append(user_id)
+        else:
+            # Recycle the oldest allocated row
+            row = self._next_evict
+            self._next_evict = (row + 1) % self.max_users
+            del self.rows[self.row_users[row]]
+            self.row_users[row] = user_id
+            self.filters[row] = 0
+            self.counts[row] = 0
+            self.current[row] = 0
+
+        self.rows[user_id] = row
+        return row
+
+    def add(self, user_id, product_ids):
+        """
+        Mark products as seen by a user
+
+        Args:
+            user_id (str): User id
+            product_ids (list): Product ids
+        """
+        if not user_id or not product_ids:
+            return
+
+        with self._lock:
+            row = self._row(str(user_id))
+            for product_id in product_ids:
+                if self.counts[row] >= self.capacity:
+                    # Rotate generations: the current filter becomes the previous one
+                    self.current[row] ^= 1
+                    self.filters[row, self.current[row]] = 0
+                    self.counts[row] = 0
+
+                positions = self._bit_positions(str(product_id))
+                generation = self.filters[row, self.current[row]]
+                masks = (1 << (positions & 7)).astype(np.uint8)
+                if np.all(generation[positions >> 3] & masks):
+                    continue  # Already in the current generation
+                np.bitwise_or.at(generation, positions >> 3, masks)
+                self.counts[row] += 1
+
+    def contains(self, user_id, product_ids):
+        """
+        Check which products a user has probably seen
+
+        Args:
+            user_id (str): User id
+            product_ids (list): Candidate product ids
+
+        Returns:
+            np.array: Boolean mask aligned with product_ids (all False for
+                unknown users)
+        """
+        row = self.rows.get(str(user_id)) if user_id else None
+        if row is None or not product_ids:
+            return np.zeros(len(product_ids), dtype=bool)
+
+        positions = np.stack([self._bit_positions(str(p)) for p in product_ids])
+        filters = self.filters[row]
+        bits = (filters[:, positions >> 3] >> (positions & 7).astype(np.uint8)) & 1
+        # Seen if all hash bits are set in either generation
+        return bits.all(axis=2).any(axis=0)
+
+    def memory_bytes(self):
+        """Bytes held by the filter block"""
+        return self.filters.nbytes + self.counts.nbytes + self.current.nbytes
@@ -0,0 +1,261 @@
+"""
+Item-to-item similarity table
+Precomputes the top-K TF-IDF neighbours of every catalog product so that
+similar-product requests become a table lookup instead of refitting a
+vectorizer per request
+"""
+import copy
+import hashlib
+import logging
+
+import numpy as np
+
+from services.facet_index import normalize_category
+
+logger = logging.getLogger(__name__)
+
+
+class SimilarityTable:
+    """
+    Compact top-K neighbour table over a product list
+
+    Neighbours are computed within category blocks using chunked sparse
+    matrix products and stored as an (n, K) int32 row array plus an
+    (n, K) float16 score array. Missing neighbours are padded with -1.
+
+    Features:
+    - Full build with a vectorizer fitted on the whole catalog
+    - Incremental update that only recomputes rows affected by changed,
+      added or removed products
+    """
+
+    def __init__(self, text_fn, top_k=20, chunk_size=256):
+        self.text_fn = text_fn
+        self.top_k = top_k
+        self.chunk_size = chunk_size
+
+        self.vectorizer = None
+        self.products = []
+        self.row_by_id = {}
+        self.digests = []
+        self.categories = np.empty(0, dtype=object)
+        self.vectors = None
+        self.neighbors = np.empty((0, top_k), dtype=np.int32)
+        self.scores = np.empty((0, top_k), dtype=np.float16)
+
+    def _digest(self, text):
+        """Content hash used to detect changed products"""
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    def build(self, products):
+        """
+        Build the table from scratch
+
+        Args:
+            products (list): Catalog products
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        texts = [self.text_fn(p) for p in products]
+
+        self.vectorizer = TfidfVectorizer(
+            max_features=5000,
+            stop_words='english',
+            ngram_range=(1, 2)
+        )
+        vectors = self.vectorizer.fit_transform(texts).tocsr() if texts else None
+
+        self._load(products, texts, vectors)
+        self.neighbors = np.full((len(products), self.top_k), -1, dtype=np.int32)
+        self.scores = np.zeros((len(products), self.top_k), dtype=np.float16)
+        self._compute_rows(np.arange(len(products)))
+
+    def update(self, products, max_changed_ratio=0.5):
+        """
+        Bring the table up to date with a new product list
+
+        Only rows for new or changed products, rows that pointed at
+        removed or changed products, and rows that a changed product now
+        outranks are recomputed. Falls back to a full build when there is
+        no fitted vectorizer or too much of the catalog changed.
+
+        Args:
+            products (list): New catalog products
+            max_changed_ratio (float): Changed fraction above which the
+                table is rebuilt from scratch
+        """
+        if self.vectorizer is None or not products:
+            self.build(products)
+            return
+
+        texts = [self.text_fn(p) for p in products]
+        digests = [self._digest(t) for t in texts]
+
+        # Map old rows to new rows; changed or removed products map to -1
+        old_to_new = np.full(len(self.products), -1, dtype=np.int32)
+        changed = []
+        for row, product in enumerate(products):
+            old_row = self.row_by_id.get(product.get('id'))
+            if old_row is not None and self.digests[old_row] == digests[row]:
+                old_to_new[old_row] = row
+            else:
+                changed.append(row)
+
+        if len(changed) > max_changed_ratio * len(products):
+            self.build(products)
+            return
+
+        old_neighbors = self.neighbors
+        old_scores = self.scores
+        kept = np.flatnonzero(old_to_new >= 0)
+
+        neighbors = np.full((len(products), self.top_k), -1, dtype=np.int32)
+        scores = np.zeros((len(products), self.top_k), dtype=np.float16)
+
+        remapped = np.where(old_neighbors[kept] >= 0, old_to_new[old_neighbors[kept]], -1)
+        neighbors[old_to_new[kept]] = remapped
+        scores[old_to_new[kept]] = old_scores[kept]
+
+        # Rows that lost a neighbour to a removal or content change
+        lost = (old_neighbors[kept] >= 0) & (remapped < 0)
+        dirty = set(old_to_new[kept][lost.any(axis=1)].tolist())
+        dirty.update(changed)
+
+        self._load(products, texts, self.vectorizer.transform(texts).tocsr(), digests)
+        self.neighbors, self.scores = neighbors, scores
+
+        # Unchanged rows that a changed product would now enter
+        if changed:
+            changed = np.array(changed)
+            for category in set(self.categories[changed]):
+                block = np.flatnonzero(self.categories == category)
+                block_changed = changed[self.categories[changed] == category]
+                sims = (self.vectors[block_changed] @ self.vectors[block].T).toarray()
+                floor = self.scores[block, -1].astype(np.float32)
+                floor[self.neighbors[block, -1] < 0] = 0.0
+                entered = (sims > floor[None, :]).any(axis=0)
+                dirty.update(block[entered].tolist())
+
+        self._compute_rows(np.array(sorted(dirty), dtype=np.int64))
+
+    def _load(self, products, texts, vectors, digests=None):
+        """Set the per-row state shared by build and update"""
+        self.products = products
+        self.row_by_id = {p.get('id'): row for row, p in enumerate(products)}
+        self.digests = digests if digests is not None else [self._digest(t) for t in texts]
+        self.categories = np.array([normalize_category(p.get('category')) for p in products], dtype=object)
+        self.vectors = vectors
+
+    def _compute_rows(self, rows):
+        """
+        Recompute the neighbour lists of the given rows
+
+        Rows are grouped by category block and processed in chunks, so
+        the dense score matrix is at most chunk_size x block size.
+        """
+        if not len(rows) or self.vectors is None:
+            return
+
+        for category in set(self.categories[rows]):
+            block = np.flatnonzero(self.categories == category)
+            block_rows = rows[self.categories[rows] == category]
+            block_vectors = self.vectors[block].T.tocsc()
+            k = min(self.top_k, len(block) - 1)
+
+            for start in range(0, len(block_rows), self.chunk_size):
+                chunk = block_rows[start:start + self.chunk_size]
+                sims = (self.vectors[chunk] @ block_vectors).toarray()
+
+                # Exclude each row from its own neighbour list
+                sims[chunk[:, None] == block[None, :]] = -np.inf
+
+                self.neighbors[chunk] = -1
+                self.scores[chunk] = 0
+                if k <= 0:
+                    continue
+
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(sims, top, axis=1)
+                order = np.argsort(-top_scores, axis=1, kind='stable')
+
+                self.neighbors[chunk, :k] = block[np.take_along_axis(top, order, axis=1)]
+                self.scores[chunk, :k] = np.take_along_axis(top_scores, order, axis=1)
+
+    def lookup(self, product_id, top_n=5):
+        """
+        Get the precomputed neighbours of a product
+
+        Args:
+            product_id (str): Product id
+            top_n (int): Number of similar products to return
+
+        Returns:
+            list: Similar products with similarity scores, or None if the
+                product is not in the table
+        """
+        row = self.row_by_id.get(product_id)
+        if row is None:
+            return None
+
+        similar = []
+        for neighbor, score in zip(self.neighbors[row, :top_n], self.scores[row, :top_n]):
+            if neighbor < 0:
+                break
+            product_copy = self.products[neighbor].copy()
+            product_copy['similarityScore'] = round(float(score), 4)
+            similar.append(product_copy)
+        return similar
+
+
+class SimilarityTableBuilder:
+    """
+    Catalog component serving the similarity table of the current snapshot
+
+    The catalog calls prepare() while it builds a snapshot, off the request
+    path, and install() once the snapshot is published; the served table
+    is replaced in a single reference assignment.
+    """
+
+    def __init__(self, text_fn, top_k=20):
+        self.text_fn = text_fn
+        self.top_k = top_k
+        self.table = None
+
+    def prepare(self, products):
+        """
+        Build a table for a product list without serving it
+
+        The table is derived incrementally from the served one when there
+        is one; update() replaces arrays instead of writing into them, so a
+        shallow copy leaves the served table untouched.
+
+        Args:
+            products (list): Catalog products
+
+        Returns:
+            SimilarityTable: The new table
+        """
+        if self.table is not None:
+            table = copy.copy(self.table)
+            table.update(products)
+        else:
+            table = SimilarityTable(self.text_fn, top_k=self.top_k)
+            table.build(products)
+        logger.info("✓ Similarity table built for %d products", len(products))
+        return table
+
+    def install(self, table):
+        """
+        Start serving a table returned by prepare()
+
+        Args:
+            table (SimilarityTable): Prepared table
+        """
+        self.table = table
+
+    def lookup(self, product_id, top_n=5):
+        """Look up neighbours in the current table, or None if unavailable"""
+        table = self.table
+        if table is None:
+            return None
+        return table.lookup(product_id, top_n)
@@ -0,0 +1,157 @@
+"""
+Product text cache
+Builds product text, vocabulary and TF-IDF term vectors once per catalog
+version so request paths reuse them instead of re-tokenising every product
+"""
+import threading
+
+import numpy as np
+
+
+class ProductTextCache:
+    """
+    Per-catalog product text and TF-IDF term-id vectors
+
+    On every catalog build the product texts are computed once, a
+    vocabulary and IDF weights are fitted over the whole catalog, and each
+    product's L2-normalised TF-IDF row is stored in one CSR matrix (the
+    row's indices are the product's term ids). Products outside the catalog
+    are encoded on the fly with the same vocabulary.
+
+    All state is swapped in as a single tuple, so readers never see a text
+    list and matrix from different catalog versions.
+    """
+
+    def __init__(self, text_fn, max_features=5000):
+        self.text_fn = text_fn
+        self.max_features = max_features
+        self.version = 0
+        self._state = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """Whether a catalog has been cached"""
+        return self._state is not None
+
+    def current(self):
+        """
+        Get the served state in a single read
+
+        Pass it to encode() and vectors() so that every vector of a request
+        comes from the same vocabulary, even if a rebuild is installed
+        meanwhile.
+
+        Returns:
+            tuple: (row_by_id, texts, vectorizer, matrix, version), or None
+                before the first build
+        """
+        return self._state
+
+    def build(self, products):
+        """
+        Precompute texts and term vectors for a catalog
+
+        Args:
+            products (list): Catalog products
+        """
+        state = self.prepare(products)
+        if state is not None:
+            self.install(state)
+
+    def prepare(self, products):
+        """
+        Compute texts and term vectors for a catalog without serving them
+
+        Args:
+            products (list): Catalog products
+
+        Returns:
+            tuple: (row_by_id, texts, vectorizer, matrix), or None for an
+                empty catalog
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        texts = [self.text_fn(p) for p in products]
+        if not texts:
+            return None
+
+        vectorizer = TfidfVectorizer(
+            max_features=self.max_features,
+            stop_words='english',
+            ngram_range=(1, 2),
+            dtype=np.float32
+        )
+        matrix = vectorizer.fit_transform(texts).tocsr()
+        row_by_id = {p.get('id'): row for row, p in enumerate(products)}
+        return row_by_id, texts, vectorizer, matrix
+
+    def install(self, state):
+        """
+        Start serving state returned by prepare()
+
+        Args:
+            state (tuple): Prepared catalog state
+        """
+        if state is None:
+            return
+        with self._lock:
+            self.version += 1
+            self._state = state + (self.version,)
+
+    def text(self, product):
+        """
+        Get the text of a product, from the cache when it is a catalog product
+
+        Args:
+            product (dict): Product information
+
+        Returns:
+            str: Product text
+        """
+        state = self._state
+        if state is not None:
+            row = state[0].get(product.get('id'))
+            if row is not None:
+                return state[1][row]
+        return self.text_fn(product)
+
+    def encode(self, text, state=None):
+        """
+        Encode free text with the catalog vocabulary
+
+        Args:
+            text (str): Input text
+            state (tuple): State from current() (default: the served one)
+
+        Returns:
+            sparse.csr_matrix: 1 x vocabulary L2-normalised TF-IDF row
+        """
+        state = self._state if state is None else state
+        return state[2].transform([text])
+
+    def vectors(self, products, state=None):
+        """
+        Get TF-IDF rows for products, in order
+
+        Args:
+            products (list): Products
+            state (tuple): State from current() (default: the served one)
+
+        Returns:
+            sparse.csr_matrix: len(products) x vocabulary matrix
+        """
+        row_by_id, _, vectorizer, matrix, _ = self._state if state is None else state
+        rows = np.array([row_by_id.get(p.get('id'), -1) for p in products], dtype=np.int64)
+        unknown = np.flatnonzero(rows < 0)
+        if len(unknown) == 0:
+            return matrix[rows]
+
+        # Encode products outside the catalog on the fly, then restore the order
+        from scipy import sparse
+        known = np.flatnonzero(rows >= 0)
+        extra = vectorizer.transform([self.text_fn(products[i]) for i in unknown])
+        stacked = sparse.vstack([matrix[rows[known]], extra], format='csr')
+        order = np.empty(len(products), dtype=np.int64)
+        order[np.concatenate([known, unknown])] = np.arange(len(products))
+        return stacked[order]
@@ -0,0 +1,189 @@
+"""
+Streaming trending counters
+Keeps an exponentially decayed interaction score per product and a
+continuously maintained top-k ranking, so trending lookups are O(k)
+"""
+import hashlib
+import heapq
+import math
+import threading
+import time
+from operator import itemgetter
+
+import numpy as np
+
+from model.covisitation import ACTION_WEIGHTS, MAX_DECAY_EXPONENT, event_time
+
+
+class TrendingCounter:
+    """
+    Exponentially decayed per-product interaction counters
+
+    Uses forward decay: an event at time t adds weight * exp(rate * (t - ref)).
+    All scores share the same reference time, so decay never reorders
+    products and a product can only move up when it receives an event.
+    That makes the top-k list maintainable by merging just the products
+    touched in a batch. Scores are rescaled to the current time and tiny
+    ones dropped once per prune interval, which bounds memory, and earlier
+    whenever an event is so far ahead that its exponent would exceed
+    MAX_DECAY_EXPONENT.
+    """
+
+    def __init__(self, half_life_hours=24, top_k=200, min_score=0.01, prune_interval_hours=24):
+        self.decay_rate = math.log(2) / (half_life_hours * 3600)
+        self.top_k = top_k
+        self.min_score = min_score
+        self.prune_interval = prune_interval_hours * 3600
+
+        self.reference_time = None
+        self.scores = {}
+        self.ranking = []
+        self._lock = threading.Lock()
+
+    def update(self, events):
+        """
+        Apply a batch of interaction events
+
+        Args:
+            events (list): [(product_id, timestamp, weight)]
+        """
+        if not events:
+            return
+
+        with self._lock:
+            if self.reference_time is None:
+                self.reference_time = min(ts for _, ts, _ in events)
+
+            touched = set()
+            latest = self.reference_time
+            for product_id, timestamp, weight in events:
+                if self.decay_rate * (timestamp - self.reference_time) > MAX_DECAY_EXPONENT:
+                    self._prune(timestamp)
+                    latest = timestamp
+                scores = self.scores
+                scores[product_id] = scores.get(product_id, 0.0) + weight * math.exp(
+                    self.decay_rate * (timestamp - self.reference_time))
+                touched.add(product_id)
+                latest = max(latest, timestamp)
+
+            if latest - self.reference_time >= self.prune_interval:
+                self._prune(latest)
+                return
+
+            # Only touched products can have moved up
+            candidates = {product_id for product_id, _ in self.ranking}
+            candidates.update(touched)
+            scores = self.scores
+            self.ranking = heapq.nlargest(
+                self.top_k, ((p, scores[p]) for p in candidates if p in scores), key=itemgetter(1))
+
+    def load(self, product_ids, timestamps, weights=None):
+        """
+        Bulk-load historical events with vectorized decay
+
+        Args:
+            product_ids (np.array): Integer product codes
+            timestamps (np.array): Epoch seconds
+            weights (np.array): Optional per-event weights
+
+        Returns:
+            tuple: (latest timestamp, {product code: decayed score at that time})
+        """
+        if len(product_ids) == 0:
+            return None, {}
+
+        latest = float(np.max(timestamps))
+        decayed = np.exp(self.decay_rate * (np.asarray(timestamps, dtype=np.float64) - latest))
+        if weights is not None:
+            decayed *= weights
+
+        totals = np.bincount(product_ids, weights=decayed)
+        codes = np.flatnonzero(totals >= self.min_score)
+        return latest, {int(code): float(totals[code]) for code in codes}
+
+    def merge(self, reference_time, scores):
+        """
+        Merge scores produced by load() into the counters
+
+        Args:
+            reference_time (float): Time the scores are expressed at
+            scores (dict): {product_id: score}
+        """
+        if not scores:
+            return
+
+        with self._lock:
+            if self.reference_time is None:
+                self.reference_time = reference_time
+            if self.decay_rate * (reference_time - self.reference_time) > MAX_DECAY_EXPONENT:
+                self._prune(reference_time)
+
+            factor = math.exp(self.decay_rate * (reference_time - self.reference_time))
+            for product_id, score in scores.items():
+                self.scores[product_id] = self.scores.get(product_id, 0.0) + score * factor
+
+            self.ranking = heapq.nlargest(self.top_k, self.scores.items(), key=itemgetter(1))
+
+    def _prune(self, now):
+        """Rescale scores to the current time and drop negligible ones"""
+        factor = math.exp(-self.decay_rate * (now - self.reference_time))
+        self.reference_time = now
+        self.scores = {
+            product_id: score * factor for product_id, score in self.scores.items()
+            if score * factor >= self.min_score
+        }
+        self.ranking = heapq.nlargest(self.top_k, self.scores.items(), key=itemgetter(1))
+
+    def fingerprint(self):
+        """
+        Hash of the current ranking order
+
+        Changes whenever the set or order of trending products changes;
+        scores alone decay uniformly and do not change it.
+
+        Returns:
+            str: Hex digest
+        """
+        ids = '\n'.join(str(product_id) for product_id, _ in self.ranking)
+        return hashlib.blake2b(ids.encode('utf-8'), digest_size=12).hexdigest()
+
+    def top(self, n=20):
+        """
+        Get the current top products
+
+        Args:
+            n (int): Number of products (at most top_k)
+
+        Returns:
+            list: [(product_id, decayed score now)] best first
+        """
+        ranking, reference_time = self.ranking, self.reference_time
+        if not ranking:
+            return []
+
+        scale = math.exp(-self.decay_rate * max(0.0, time.time() - reference_time))
+        return [(product_id, score * scale) for product_id, score in ranking[:n]]
+
+
+def interaction_events(interactions):
+    """
+    Convert interaction dicts into (product_id, timestamp, weight) tuples
+
+    Args:
+        interactions (list): [{'product_id'|'product', 'action', 'timestamp'}]
+
+    Returns:
+        list: Events accepted by TrendingCounter.update
+    """
+    events = []
+    for interaction in interactions:
+        product_id = interaction.get('product_id') or (interaction.get('product') or {}).get('id')
+        if not product_id:
+            continue
+        timestamp = interaction.get('timestamp') or interaction.get('received_at')
+        events.append((
+            str(product_id),
+            event_time(timestamp),
+            ACTION_WEIGHTS.get(interaction.get('action'), 1.0)
+        ))
+    return events
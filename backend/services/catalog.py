@@ -0,0 +1,589 @@
+"""
+Product Catalog - materialized product set with in-memory indexes
+Fetches the full Platzi fashion catalog once per cache period and serves
+category, gender, price and source queries from indexes instead of
+re-fetching and filtering lists on every request
+
+Each catalog version is an immutable snapshot; a new one is built off to
+the side and published by swapping a single reference
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+
+from services.dedup import NearDuplicateDetector
+from services.facet_index import FacetIndex, normalize_category
+from services.sorted_index import SortedIndex
+from services.text_index import TextIndex
+
+logger = logging.getLogger(__name__)
+
+class CatalogSnapshot:
+    """
+    One immutable catalog version
+
+    Bundles the products with every index built from them and the model
+    artifacts (text vectors, similarity table, ...) prepared for them.
+    Snapshots are never modified once published: readers take a single
+    reference and use it for the whole request, so a request that started
+    before a swap finishes on the version it started with. Superseded
+    snapshots are freed as soon as the last such request drops them.
+    """
+
+    def __init__(self, version, products, canonical_ids=None, artifacts=None, build_seconds=0.0,
+                 partition_categories=None):
+        self.version = version
+        self.products = products
+        self.canonical_ids = canonical_ids or {}
+        self.partition_categories = partition_categories or {}
+        self.row_by_id = {p['id']: row for row, p in enumerate(products)}
+        self.facet_index = FacetIndex(products)
+        self.sorted_index = SortedIndex(products)
+        self.text_index = TextIndex(products)
+        self.artifacts = artifacts or {}
+        self.build_seconds = build_seconds
+        self.built_at = datetime.now() if version else None
+
+        # Content hash: equal across processes that loaded the same data,
+        # unlike version numbers
+        self.fingerprint = hashlib.blake2b(
+            json.dumps(products, sort_keys=True, default=str).encode('utf-8'),
+            digest_size=12
+        ).hexdigest()
+
+
+class ProductCatalog:
+    """
+    In-memory product catalog with a bitmap facet index
+
+    The catalog is fetched as independent upstream partitions (Platzi
+    clothes and shoes) that can be refreshed one at a time. The first
+    snapshot is loaded at startup with load(); requests never fetch on
+    their own thread. Until a snapshot exists they see the empty version 0,
+    and stale catalogs are reloaded by a background loader while the
+    current snapshot keeps serving. Once a refresh scheduler takes over
+    (auto_reload off), it owns every fetch including retries.
+    """
+
+    def __init__(self, platzi_api, size=200, ttl=timedelta(hours=6), reload_backoff=30):
+        self.platzi_api = platzi_api
+        self.size = size
+        self.ttl = ttl
+        self.auto_reload = True
+        # Seconds between background loads started by ensure_fresh()
+        self.reload_backoff = reload_backoff
+        self._reload_started = None
+
+        # Upstream partitions: name -> fetch(limit)
+        self.partitions = {
+            'clothes': platzi_api.get_clothes,
+            'shoes': platzi_api.get_shoes
+        }
+        self.partition_products = {}
+
+        # Catalog reads per category of the served snapshot ('all' for
+        # unfiltered reads); folded into partition_hit_totals on every swap
+        self.category_hits = {}
+        self.partition_hit_totals = dict.fromkeys(self.partitions, 0)
+
+        self.snapshot = CatalogSnapshot(0, [])
+        self.dedup = NearDuplicateDetector()
+        self.components = []
+
+        # Every snapshot still referenced anywhere, by version
+        self.live_snapshots = weakref.WeakValueDictionary()
+        self.last_error = None
+        self._build_lock = threading.Lock()
+        self._loader = None
+        self._loader_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Version of the served snapshot (0 before the first load)"""
+        return self.snapshot.version
+
+    @property
+    def loaded_at(self):
+        """Build time of the served snapshot, or None before the first load"""
+        return self.snapshot.built_at
+
+    def add_component(self, name, component):
+        """
+        Register a model component whose state is built into every snapshot
+
+        The component's prepare(products) runs while the snapshot is built,
+        off the request path; its result is stored in the snapshot and
+        passed to install() right after the snapshot is published.
+
+        Args:
+            name (str): Artifact name in the snapshot
+            component: Object with prepare(products) and install(artifact)
+        """
+        self.components.append((name, component))
+
+    def is_stale(self):
+        """Check whether the catalog needs to be (re)loaded"""
+        loaded_at = self.loaded_at
+        return loaded_at is None or datetime.now() - loaded_at >= self.ttl
+
+    def ensure_fresh(self):
+        """
+        Start a background load if the catalog is missing or expired and no
+        refresh scheduler owns reloads; never fetches on the calling thread
+        """
+        if not self.auto_reload or not self.is_stale():
+            return
+        started = self._reload_started
+        if started is None or time.monotonic() - started >= self.reload_backoff:
+            self.reload()
+
+    def load(self):
+        """
+        Load the first snapshot on the calling thread (startup and preload)
+
+        Does nothing once a snapshot exists; a background load already in
+        progress is waited for instead of fetching twice.
+
+        Returns:
+            bool: Whether a snapshot is being served
+        """
+        with self._build_lock:
+            if self.snapshot.version == 0:
+                self._refresh()
+        return self.snapshot.version > 0
+
+    def refresh(self):
+        """
+        Fetch the catalog from Platzi API and publish a new snapshot
+
+        The previous catalog keeps serving if the fetch returns nothing.
+        """
+        with self._build_lock:
+            self._refresh()
+
+    def reload(self):
+        """
+        Build and publish a new snapshot in a background thread
+
+        Returns:
+            bool: False if a reload is already running
+        """
+        with self._loader_lock:
+            if self._loader is not None and self._loader.is_alive():
+                return False
+            self._reload_started = time.monotonic()
+            self._loader = threading.Thread(target=self._reload, name='catalog-loader', daemon=True)
+            self._loader.start()
+            return True
+
+    def is_loading(self):
+        """Check whether a background reload is running"""
+        loader = self._loader
+        return loader is not None and loader.is_alive()
+
+    def _reload(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Catalog reload failed: {e}")
+
+    def refresh_partition(self, name):
+        """
+        Fetch one partition and publish a snapshot with its new products
+
+        Args:
+            name (str): Partition name
+
+        Returns:
+            int: Products fetched
+
+        Raises:
+            ValueError: If the fetch returned nothing; the current
+                snapshot keeps serving
+        """
+        with self._build_lock:
+            products = self._fetch_partition(name)
+            if not products:
+                raise ValueError(f"Partition '{name}' fetch returned no products")
+            self.partition_products[name] = products
+            self._build_from_partitions()
+            return len(products)
+
+    def _refresh(self):
+        """Fetch every partition and build; callers hold the build lock"""
+        fetched = {}
+        for name in self.partitions:
+            try:
+                fetched[name] = self._fetch_partition(name)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Catalog partition '{name}' fetch failed: {e}")
+
+        fetched = {name: products for name, products in fetched.items() if products}
+        if not fetched:
+            self.last_error = self.last_error or 'Catalog fetch returned no products'
+            logger.warning("Catalog refresh returned no products, keeping current catalog")
+            return
+
+        self.partition_products.update(fetched)
+        self._build_from_partitions()
+        self.last_error = None
+
+    def _fetch_partition(self, name):
+        """Fetch one partition's products from upstream"""
+        return self.partitions[name](limit=self.size // len(self.partitions))
+
+    def _build_from_partitions(self):
+        """Build a snapshot from the latest products of every partition"""
+        products, partition_categories = [], {}
+        for name in self.partitions:
+            for product in self.partition_products.get(name, []):
+                products.append(product)
+                partition_categories.setdefault(normalize_category(product.get('category')), set()).add(name)
+
+        self._build(products, partition_categories)
+        logger.info(f"✓ Catalog v{self.version} built with {len(products)} products")
+
+    def record_access(self, category=None):
+        """
+        Count a catalog read, for refresh prioritisation
+
+        Only categories of the served snapshot are counted, so request
+        data cannot grow the counters.
+
+        Args:
+            category (str): Requested category (or comma-separated list), or None / 'all'
+        """
+        hits = self.category_hits
+        if not category or category == 'all':
+            hits['all'] = hits.get('all', 0) + 1
+            return
+
+        known = self.snapshot.facet_index.bitmaps['category']
+        values = category if isinstance(category, (list, tuple)) else str(category).split(',')
+        for key in {normalize_category(value) for value in values}:
+            if key in known:
+                hits[key] = hits.get(key, 0) + 1
+
+    def _hits_by_partition(self, category_hits, partition_categories):
+        """Map category reads to the partitions holding those categories"""
+        hits = dict.fromkeys(self.partitions, 0)
+        for category, count in list(category_hits.items()):
+            for name in (self.partitions if category == 'all' else partition_categories.get(category, ())):
+                hits[name] += count
+        return hits
+
+    def partition_hits(self):
+        """
+        Get reads per partition so far
+
+        Category reads count for every partition holding that category;
+        unfiltered reads count for all partitions.
+
+        Returns:
+            dict: {partition: reads}
+        """
+        hits = self._hits_by_partition(self.category_hits, self.snapshot.partition_categories)
+        for name, total in self.partition_hit_totals.items():
+            hits[name] += total
+        return hits
+
+    def _build(self, products, partition_categories=None):
+        """Build the next snapshot, then publish it by swapping one reference"""
+        started = time.time()
+        products, canonical_ids = self._collapse_duplicates(products)
+
+        artifacts = {}
+        for name, component in self.components:
+            try:
+                artifacts[name] = component.prepare(products)
+            except Exception as e:
+                logger.error(f"Catalog component '{name}' failed: {e}")
+
+        snapshot = CatalogSnapshot(
+            self.snapshot.version + 1,
+            products,
+            canonical_ids,
+            artifacts,
+            build_seconds=time.time() - started,
+            partition_categories=partition_categories
+        )
+        # Reads so far belong to the outgoing snapshot's categories
+        retired, self.category_hits = self.category_hits, {}
+        for name, count in self._hits_by_partition(retired, self.snapshot.partition_categories).items():
+            self.partition_hit_totals[name] += count
+
+        self.snapshot = snapshot
+        self.live_snapshots[snapshot.version] = snapshot
+
+        for name, component in self.components:
+            if name in artifacts:
+                component.install(artifacts[name])
+
+    def status(self):
+        """
+        Describe the served snapshot and any older ones still in use
+
+        Returns:
+            dict: Snapshot status for the admin endpoint
+        """
+        snapshot = self.snapshot
+        retained = sorted(v for v in list(self.live_snapshots.keys()) if v != snapshot.version)
+        return {
+            'version': snapshot.version,
+            'fingerprint': snapshot.fingerprint,
+            'builtAt': snapshot.built_at.isoformat() if snapshot.built_at else None,
+            'buildSeconds': round(snapshot.build_seconds, 3),
+            'products': len(snapshot.products),
+            'collapsedDuplicates': len(snapshot.canonical_ids),
+            'artifacts': sorted(snapshot.artifacts),
+            'partitions': {name: len(p) for name, p in self.partition_products.items()},
+            'stale': self.is_stale(),
+            'loading': self.is_loading(),
+            'retainedVersions': retained,
+            'lastError': self.last_error
+        }
+
+    def _collapse_duplicates(self, products):
+        """
+        Keep one representative per near-duplicate cluster
+
+        Args:
+            products (list): Fetched products
+
+        Returns:
+            tuple: (representative products in fetch order,
+                {duplicate id: representative id})
+        """
+        clusters = self.dedup.add(products)
+
+        representatives, representative_of, canonical_ids = [], {}, {}
+        for product in products:
+            cluster = clusters[product['id']]
+            representative = representative_of.get(cluster)
+            if representative is None:
+                representative_of[cluster] = product['id']
+                representatives.append(product)
+            elif representative != product['id']:
+                canonical_ids[product['id']] = representative
+
+        if canonical_ids:
+            logger.info(f"Collapsed {len(canonical_ids)} near-duplicate products")
+        return representatives, canonical_ids
+
+    def get(self, product_id, snapshot=None):
+        """
+        Get a catalog product by id
+
+        Args:
+            product_id (str): Product id (e.g. "platzi_12")
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            dict: Product (the cluster representative for a near-duplicate
+                id), or None if it is not in the catalog
+        """
+        self.ensure_fresh()
+
+        snapshot = snapshot or self.snapshot
+        row = snapshot.row_by_id.get(snapshot.canonical_ids.get(product_id, product_id))
+        return snapshot.products[row] if row is not None else None
+
+    def get_many(self, product_ids, snapshot=None):
+        """
+        Get catalog products by id, preserving the requested order
+
+        Near-duplicate ids resolve to their cluster representative.
+
+        Args:
+            product_ids (list): Product ids
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            tuple: (list of found products, list of missing ids)
+        """
+        self.ensure_fresh()
+
+        snapshot = snapshot or self.snapshot
+        products, row_by_id, canonical_ids = snapshot.products, snapshot.row_by_id, snapshot.canonical_ids
+        found, missing = [], []
+        for product_id in product_ids:
+            row = row_by_id.get(canonical_ids.get(product_id, product_id))
+            if row is None:
+                missing.append(product_id)
+            else:
+                found.append(products[row])
+        return found, missing
+
+    def query(self, filters=None, limit=None, snapshot=None):
+        """
+        Get catalog products matching filters
+
+        Args:
+            filters (dict): Filter criteria keyed by facet name
+                (category, gender, source, priceRange, rating)
+            limit (int): Maximum products to return
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            list: Matching products in catalog order
+        """
+        return list(self.iter_query(filters, limit, snapshot))
+
+    def iter_query(self, filters=None, limit=None, snapshot=None):
+        """
+        Iterate over catalog products matching filters
+
+        Products come straight from the given snapshot, or the one that was
+        current when iteration started, without building a result list.
+
+        Args:
+            filters (dict): Filter criteria keyed by facet name
+            limit (int): Maximum products to yield
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Yields:
+            dict: Matching products in catalog order
+        """
+        self.ensure_fresh()
+        self.record_access((filters or {}).get('category'))
+
+        snapshot = snapshot or self.snapshot
+        products, facet_index = snapshot.products, snapshot.facet_index
+        for row in facet_index.rows(facet_index.match(filters), limit=limit):
+            yield products[row]
+
+    def search(self, text, filters=None, limit=50, snapshot=None):
+        """
+        Keyword search over product titles, descriptions, categories and tags
+
+        Args:
+            text (str): Free-text query
+            filters (dict): Filter criteria keyed by facet name
+            limit (int): Maximum products to return
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            list: Matching products, best match first
+        """
+        self.ensure_fresh()
+        self.record_access((filters or {}).get('category'))
+
+        snapshot = snapshot or self.snapshot
+        products, facet_index, text_index = snapshot.products, snapshot.facet_index, snapshot.text_index
+
+        allowed = None
+        if filters and any(v and v != 'all' for v in filters.values()):
+            allowed = facet_index.mask(facet_index.match(filters))
+
+        return [products[row] for row in text_index.search(text, limit=limit, allowed=allowed)]
+
+    def page(self, category='all', gender='unisex', sort='rating', cursor=None, limit=20, filters=None,
+             snapshot=None):
+        """
+        Get one page of products from the presorted index
+
+        Args:
+            category (str): Category name or 'all'
+            gender (str): Gender filter ('unisex' for all)
+            sort (str): price_asc, price_desc, rating or reviews
+            cursor (str): Cursor returned with the previous page
+            limit (int): Page size
+            filters (dict): Extra facet filters (priceRange, source, rating)
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            tuple: (list of products, next cursor or None)
+
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        page = self.iter_page(category, gender, sort, cursor, limit, filters, snapshot)
+        products = list(page)
+        return products, page.next_cursor
+
+    def iter_page(self, category='all', gender='unisex', sort='rating', cursor=None, limit=20, filters=None,
+                  snapshot=None):
+        """
+        Get one page of products from the presorted index without building a list
+
+        Same arguments as page(). The sort and cursor are validated right
+        away; products are read from the snapshot while the page is iterated.
+
+        Returns:
+            SortedPage: Iterable of products; its next_cursor is set once iterated
+
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        self.ensure_fresh()
+        self.record_access(category)
+
+        snapshot = snapshot or self.snapshot
+        products, facet_index, sorted_index = snapshot.products, snapshot.facet_index, snapshot.sorted_index
+
+        allowed = None
+        extra = {k: v for k, v in (filters or {}).items() if k not in ('category', 'gender')}
+        if any(v and v != 'all' for v in extra.values()):
+            allowed = facet_index.mask(facet_index.match(extra))
+
+        return sorted_index.iter_page(
+            category=category,
+            gender=gender,
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            allowed=allowed,
+            items=products
+        )
+
+    def facets(self, filters=None, snapshot=None):
+        """
+        Get the match count and per-facet value counts for filters
+
+        Args:
+            filters (dict): Filter criteria keyed by facet name
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            dict: {'total': int, 'facets': {facet: {value: count}}}
+        """
+        self.ensure_fresh()
+        self.record_access((filters or {}).get('category'))
+
+        match, counts = (snapshot or self.snapshot).facet_index.search(filters)
+        return {
+            'total': match.bit_count(),
+            'facets': counts
+        }
+
+    def restrict(self, products, filters, snapshot=None):
+        """
+        Drop products that do not match filters, using the facet index
+
+        Args:
+            products (list): Candidate products
+            filters (dict): Filter criteria keyed by facet name
+            snapshot (CatalogSnapshot): Snapshot to read (default: the served one)
+
+        Returns:
+            list: Candidates whose catalog row matches every filter.
+                Products unknown to the catalog are kept so the caller's
+                own filtering can decide on them.
+        """
+        self.ensure_fresh()
+
+        snapshot = snapshot or self.snapshot
+        row_by_id, facet_index = snapshot.row_by_id, snapshot.facet_index
+        if not row_by_id:
+            return products
+
+        allowed = facet_index.mask(facet_index.match(filters))
+        return [
+            p for p in products
+            if p.get('id') not in row_by_id or allowed[row_by_id[p.get('id')]]
+        ]
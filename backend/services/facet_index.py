@@ -0,0 +1,207 @@
+"""
+Facet Index - bitmap index over the product catalog
+Answers conjunctive filters (category, gender, source, price, rating)
+with bitwise AND and returns per-facet counts in the same pass
+"""
+import numpy as np
+
+# Price buckets match the FilterBar price range options (INR)
+PRICE_BUCKETS = [
+    ('0-1000', 0, 1000),
+    ('1000-2500', 1000, 2500),
+    ('2500-5000', 2500, 5000),
+    ('5000-10000', 5000, 10000),
+    ('10000+', 10000, None)
+]
+
+RATING_BUCKETS = [
+    ('4.5+', 4.5, None),
+    ('4.0-4.5', 4.0, 4.5),
+    ('3.5-4.0', 3.5, 4.0),
+    ('0-3.5', 0, 3.5)
+]
+
+# Facet names double as filter keys in request bodies and query strings
+FACETS = ('category', 'gender', 'source', 'priceRange', 'rating')
+
+
+def normalize_category(category):
+    """Normalize a category name ("Casual Wear" -> "casual")"""
+    return str(category or '').lower().replace(' wear', '').replace(' ', '')
+
+
+def price_bucket(price):
+    """Map a price to its FilterBar price range label"""
+    price = price or 0
+    for label, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return label
+    return PRICE_BUCKETS[0][0]
+
+
+def rating_bucket(rating):
+    """Map a rating to its rating bucket label"""
+    rating = rating or 0
+    for label, low, high in RATING_BUCKETS:
+        if rating >= low and (high is None or rating < high):
+            return label
+    return RATING_BUCKETS[-1][0]
+
+
+def facet_value(facet, product):
+    """
+    Get the normalized facet value of a product
+
+    Args:
+        facet (str): Facet name
+        product (dict): Product information
+
+    Returns:
+        str: Facet value used as bitmap key
+    """
+    if facet == 'category':
+        return normalize_category(product.get('category'))
+    if facet == 'priceRange':
+        return price_bucket(product.get('price'))
+    if facet == 'rating':
+        return rating_bucket(product.get('rating'))
+    return str(product.get(facet) or 'unknown').lower()
+
+
+class FacetIndex:
+    """
+    Bitmap index over catalog rows
+
+    Every facet value owns one bitmap stored as a Python int where bit i
+    is set when catalog row i has that value. Conjunctive filters are a
+    chain of bitwise ANDs and facet counts are popcounts, so a filtered
+    count query never touches the product dicts.
+    """
+
+    def __init__(self, products):
+        self.size = len(products)
+        self.all_rows = (1 << self.size) - 1
+        self.bitmaps = {}
+
+        for facet in FACETS:
+            rows_by_value = {}
+            for row, product in enumerate(products):
+                rows_by_value.setdefault(facet_value(facet, product), []).append(row)
+
+            self.bitmaps[facet] = {
+                value: self._rows_to_bitmap(rows)
+                for value, rows in rows_by_value.items()
+            }
+
+    def _rows_to_bitmap(self, rows):
+        """Pack a list of row numbers into an int bitmap"""
+        bits = np.zeros(self.size, dtype=np.uint8)
+        bits[rows] = 1
+        packed = np.packbits(bits, bitorder='little')
+        return int.from_bytes(packed.tobytes(), 'little')
+
+    def rows(self, bitmap, limit=None):
+        """
+        Decode a bitmap into ascending row numbers
+
+        Args:
+            bitmap (int): Row bitmap
+            limit (int): Maximum rows to return
+
+        Returns:
+            np.array: Row numbers
+        """
+        if not bitmap:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.flatnonzero(self.mask(bitmap))
+        return rows[:limit] if limit is not None else rows
+
+    def mask(self, bitmap):
+        """
+        Decode a bitmap into a boolean array with one entry per row
+
+        Args:
+            bitmap (int): Row bitmap
+
+        Returns:
+            np.array: Boolean row mask
+        """
+        n_bytes = (self.size + 7) // 8
+        packed = np.frombuffer(bitmap.to_bytes(n_bytes, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.size, bitorder='little').astype(bool)
+
+    def _parse_filters(self, filters):
+        """Keep only active facet filters, normalized to lists of values"""
+        active = {}
+        for facet in FACETS:
+            value = (filters or {}).get(facet)
+            if not value or value == 'all' or (facet == 'gender' and value == 'unisex'):
+                continue
+
+            values = value if isinstance(value, (list, tuple)) else str(value).split(',')
+            if facet == 'category':
+                values = [normalize_category(v) for v in values]
+            elif facet not in ('priceRange', 'rating'):
+                values = [str(v).strip().lower() for v in values]
+
+            active[facet] = values
+        return active
+
+    def _facet_mask(self, facet, values):
+        """OR together the bitmaps of the selected values of one facet"""
+        mask = 0
+        for value in values:
+            mask |= self.bitmaps[facet].get(value, 0)
+        return mask
+
+    def match(self, filters):
+        """
+        Get the bitmap of rows matching every active filter
+
+        Args:
+            filters (dict): Filter criteria keyed by facet name
+
+        Returns:
+            int: Row bitmap
+        """
+        mask = self.all_rows
+        for facet, values in self._parse_filters(filters).items():
+            mask &= self._facet_mask(facet, values)
+        return mask
+
+    def search(self, filters=None):
+        """
+        Match filters and count facet values in one pass
+
+        Counts for a facet ignore that facet's own filter, so the client
+        can show how many items each alternative value would return.
+
+        Args:
+            filters (dict): Filter criteria keyed by facet name
+
+        Returns:
+            tuple: (row bitmap, {facet: {value: count}})
+        """
+        facet_masks = {
+            facet: self._facet_mask(facet, values)
+            for facet, values in self._parse_filters(filters).items()
+        }
+
+        match = self.all_rows
+        for mask in facet_masks.values():
+            match &= mask
+
+        counts = {}
+        for facet in FACETS:
+            others = self.all_rows
+            for other, mask in facet_masks.items():
+                if other != facet:
+                    others &= mask
+
+            counts[facet] = {
+                value: (others & bitmap).bit_count()
+                for value, bitmap in self.bitmaps[facet].items()
+            }
+
+        return match, counts
@@ -0,0 +1,363 @@
+"""
+Interaction Log - durable write-behind ingestion for user interactions
+Requests only enqueue events in memory; a background writer appends them
+in batches to newline-delimited JSON segment files with one fsync per batch
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: orphans are detected by pid only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Sealed segments end in SEALED_SUFFIX, the segment being written in OPEN_SUFFIX;
+# a segment is created under CREATING_SUFFIX and renamed once its writer holds the lock
+SEALED_SUFFIX = '.log'
+OPEN_SUFFIX = '.open'
+CREATING_SUFFIX = '.open.new'
+
+
+def _pid_alive(pid):
+    """Check whether a process with this pid exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _try_lock(f):
+    """
+    Take an exclusive lock on an open file without blocking
+
+    Returns:
+        bool: False if another open file holds the lock
+    """
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class InteractionLog:
+    """
+    Append-only, segment-based interaction log with a write-behind buffer
+
+    Features:
+    - O(1) enqueue on the request path, no I/O
+    - Group commit: one write + fsync per batch; a batch leaves the buffer
+      only once it is durable, and is retried if the write fails
+    - Flush on batch size or on flush interval, whichever comes first
+    - Backpressure: append() refuses events once the buffer is full
+    - Segments rotate by size and age; sealed segments are immutable and
+      named so that sorting by name orders them by creation time
+    - The writer holds an flock on its open segment; the kernel releases it
+      when the process dies, so an open segment nobody holds is an orphan
+    - Listeners run on their own thread, so a slow listener never delays
+      writes; batches waiting for listeners are bounded by max_buffer
+    """
+
+    def __init__(self, directory, batch_size=1000, flush_interval=0.2, max_buffer=100000,
+                 segment_max_bytes=64 * 1024 * 1024, segment_max_age=300, fsync=True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.fsync = fsync
+
+        self.buffer = deque()
+        self.listeners = []
+        self.dropped = 0
+        self.written = 0
+        self.listener_dropped = 0
+
+        self._cond = threading.Condition()
+        self._writer = None
+        self._notify = deque()
+        self._notify_events = 0
+        self._notify_cond = threading.Condition()
+        self._notifier = None
+        self._notifier_stopping = False
+        self._pid = None
+        self._stopping = False
+        self._atexit_registered = False
+
+        self._segment = None
+        self._segment_path = None
+        self._segment_opened = 0
+        self._segment_seq = 0
+
+    def add_listener(self, listener):
+        """
+        Register a callback invoked with every batch after it is durable
+
+        Callbacks run on the listener thread, in batch order.
+
+        Args:
+            listener (callable): Function taking a list of event dicts
+        """
+        self.listeners.append(listener)
+
+    def append(self, event):
+        """
+        Enqueue one interaction event
+
+        Args:
+            event (dict): Interaction event (user_id, product_id, action, timestamp)
+
+        Returns:
+            bool: False if the buffer is full and the event was rejected
+        """
+        if self._pid != os.getpid():
+            self._start()
+
+        if len(self.buffer) >= self.max_buffer:
+            with self._cond:
+                self.dropped += 1
+            return False
+
+        self.buffer.append(event)
+        if len(self.buffer) == self.batch_size:
+            with self._cond:
+                self._cond.notify()
+        return True
+
+    def _start(self):
+        """Start the writer thread (again, after a fork)"""
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            self._seal_orphans()
+
+            self._pid = os.getpid()
+            self._stopping = False
+            self._segment = None
+            self._writer = threading.Thread(target=self._run, name='interaction-log-writer', daemon=True)
+            self._writer.start()
+
+            self._notify = deque()
+            self._notify_events = 0
+            self._notify_cond = threading.Condition()
+            self._notifier_stopping = False
+            self._notifier = threading.Thread(target=self._run_listeners, name='interaction-log-listeners',
+                                              daemon=True)
+            self._notifier.start()
+
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _seal_orphans(self):
+        """
+        Seal open segments whose writer is gone
+
+        With flock, a segment is orphaned when its lock can be taken: the
+        lock dies with the writer whatever happens to its pid. Without it,
+        fall back to checking that the pid in the name is gone.
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if fcntl is None:
+                if not name.endswith(OPEN_SUFFIX):
+                    continue
+                try:
+                    pid = int(name.split('-')[1])
+                except (IndexError, ValueError):
+                    continue
+                if not _pid_alive(pid):
+                    os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+                continue
+
+            if not name.endswith((OPEN_SUFFIX, CREATING_SUFFIX)):
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    if not _try_lock(f):
+                        continue
+                    if name.endswith(CREATING_SUFFIX):
+                        # Never written to: the writer died before taking the lock
+                        os.remove(path)
+                    else:
+                        os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+            except FileNotFoundError:
+                # Sealed by its writer or by another process in the meantime
+                continue
+
+    def _run(self):
+        """Writer loop: wait for a full batch or the flush interval, then commit"""
+        while True:
+            with self._cond:
+                if len(self.buffer) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+
+            try:
+                self._commit()
+                if self._segment and time.time() - self._segment_opened >= self.segment_max_age:
+                    self._seal()
+            except Exception as e:
+                logger.error(f"Interaction log write failed: {e}")
+                time.sleep(self.flush_interval)
+
+            if stopping:
+                return
+
+    def _commit(self):
+        """
+        Write the buffer in batch_size groups
+
+        Each batch is written and fsynced while it is still at the head of
+        the buffer and removed only afterwards, so a failed write leaves it
+        queued for the next attempt. Only this thread removes events.
+        """
+        while self.buffer:
+            # Indexing, unlike iterating, is safe while request threads append
+            batch = [self.buffer[i] for i in range(min(len(self.buffer), self.batch_size))]
+            data = ''.join(json.dumps(e, separators=(',', ':')) + '\n' for e in batch).encode('utf-8')
+
+            segment = self._current_segment()
+            position = segment.tell()
+            try:
+                segment.write(data)
+                segment.flush()
+                if self.fsync:
+                    os.fsync(segment.fileno())
+            except OSError:
+                self._discard_partial_write(position)
+                raise
+
+            with self._cond:
+                for _ in batch:
+                    self.buffer.popleft()
+                self.written += len(batch)
+
+            if segment.tell() >= self.segment_max_bytes:
+                self._seal()
+
+            if self.listeners:
+                self._notify_listeners(batch)
+
+    def _discard_partial_write(self, position):
+        """
+        Drop what a failed write left in the segment so its retry is not
+        written twice; if the segment cannot be truncated, seal it (compaction
+        skips a torn last line) and retry into a new one
+        """
+        try:
+            self._segment.truncate(position)
+            self._segment.seek(position)
+        except OSError:
+            try:
+                self._seal()
+            except OSError:
+                self._segment = None
+
+    def _notify_listeners(self, batch):
+        """Hand a durable batch to the listener thread, dropping it if listeners fall behind"""
+        with self._notify_cond:
+            if self._notify_events + len(batch) > self.max_buffer:
+                self.listener_dropped += len(batch)
+                logger.warning(f"Interaction log listeners are behind, skipped {len(batch)} events")
+                return
+            self._notify.append(batch)
+            self._notify_events += len(batch)
+            self._notify_cond.notify()
+
+    def _run_listeners(self):
+        """Listener loop: pass durable batches to the listeners in order"""
+        while True:
+            with self._notify_cond:
+                while not self._notify and not self._notifier_stopping:
+                    self._notify_cond.wait()
+                if not self._notify:
+                    return
+                batch = self._notify.popleft()
+                self._notify_events -= len(batch)
+
+            for listener in self.listeners:
+                try:
+                    listener(batch)
+                except Exception as e:
+                    logger.error(f"Interaction log listener failed: {e}")
+
+    def _current_segment(self):
+        """Open a new segment file if none is open"""
+        if self._segment is None:
+            self._segment_seq += 1
+            name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._segment_seq:06d}{OPEN_SUFFIX}"
+            self._segment_path = os.path.join(self.directory, name)
+            if fcntl is None:
+                self._segment = open(self._segment_path, 'ab')
+            else:
+                # Lock before the segment is visible as open, so no other
+                # process can take it for an orphan in between
+                creating_path = self._segment_path[:-len(OPEN_SUFFIX)] + CREATING_SUFFIX
+                self._segment = open(creating_path, 'ab')
+                fcntl.flock(self._segment.fileno(), fcntl.LOCK_EX)
+                os.replace(creating_path, self._segment_path)
+            self._segment_opened = time.time()
+        return self._segment
+
+    def _seal(self):
+        """Close the current segment and make it visible to compaction"""
+        if self._segment is None:
+            return
+        # Rename while still holding the lock, so it is never taken for an orphan
+        os.replace(self._segment_path, self._segment_path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        self._segment.close()
+        self._segment = None
+
+    def flush(self, timeout=5.0):
+        """
+        Block until everything enqueued so far has been written
+
+        Args:
+            timeout (float): Maximum seconds to wait
+        """
+        with self._cond:
+            target = self.written + len(self.buffer)
+        deadline = time.time() + timeout
+        while self.written < target and time.time() < deadline:
+            with self._cond:
+                self._cond.notify()
+            time.sleep(0.005)
+
+    def close(self):
+        """Write remaining events, seal the open segment and stop the writer"""
+        if self._pid != os.getpid() or self._writer is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._writer.join(timeout=10)
+        self._seal()
+        with self._notify_cond:
+            self._notifier_stopping = True
+            self._notify_cond.notify()
+        self._notifier.join(timeout=10)
+        self._pid = None
+
+    def stats(self):
+        """Get buffer and throughput counters"""
+        return {
+            'buffered': len(self.buffer),
+            'written': self.written,
+            'dropped': self.dropped,
+            'listener_backlog': self._notify_events,
+            'listener_dropped': self.listener_dropped
+        }
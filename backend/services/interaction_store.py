@@ -0,0 +1,446 @@
+"""
+Interaction Store - columnar, day-partitioned interaction history
+Compacts sealed interaction log segments into typed, integer-coded column
+files so training and trending windows scan arrays instead of JSON lines
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is only serialized within the process
+    fcntl = None
+
+from model.covisitation import parse_timestamp
+from services.interaction_log import SEALED_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# Action column codes
+ACTIONS = ['view', 'click', 'like', 'other']
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Lists the live parts and the log segments they were built from
+MANIFEST = 'manifest.json'
+
+# Column name -> dtype of the .npy file
+COLUMNS = {
+    'user': np.int32,
+    'product': np.int32,
+    'action': np.int8,
+    'ts': np.int64
+}
+
+
+def _fsync_directory(path):
+    """Make renames inside a directory durable (no-op where directories cannot be opened)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Dictionary:
+    """Append-only string <-> int32 code mapping persisted as a JSON list"""
+
+    def __init__(self, path):
+        self.path = path
+        self.reload()
+
+    def reload(self):
+        """Re-read the mapping from disk (another process may have extended it)"""
+        self.values = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.values = json.load(f)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self.dirty = False
+
+    def decode(self, codes):
+        """Map codes back to values"""
+        codes = [int(code) for code in codes]
+        if codes and max(codes) >= len(self.values):
+            self.reload()
+        values = self.values
+        return [values[code] for code in codes]
+
+    def encode(self, value):
+        """Get the code of a value, assigning a new one if needed"""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self.dirty = True
+        return code
+
+    def save(self):
+        """Persist new codes atomically"""
+        if not self.dirty:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.values, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+class InteractionStore:
+    """
+    Columnar interaction store
+
+    Layout:
+        <root>/dictionaries/{users,products}.json
+        <root>/day=YYYY-MM-DD/part-<n>/{user,product,action,ts}.npy
+        <root>/manifest.json
+
+    Every part is sorted by timestamp and written to a temporary directory
+    before being renamed into place, but only parts listed in the manifest
+    are read. The manifest also records which log segments are already in
+    some part. Compaction and merging first write all new parts, then
+    replace the manifest atomically, and only then delete what the
+    manifest no longer references, so a crash at any point either keeps
+    the old state or commits the new one whole: segments are never lost
+    or counted twice.
+
+    Scans prune day partitions by time range and use binary search on the
+    sorted ts column inside each part; columns are memory-mapped.
+    """
+
+    def __init__(self, root, log_directory):
+        self.root = root
+        self.log_directory = log_directory
+        self._lock = threading.Lock()
+        self._worker = None
+        self._part_seq = 0
+
+        os.makedirs(os.path.join(root, 'dictionaries'), exist_ok=True)
+        self.users = _Dictionary(os.path.join(root, 'dictionaries', 'users.json'))
+        self.products = _Dictionary(os.path.join(root, 'dictionaries', 'products.json'))
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize store writers across threads and worker processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _day_dirs(self):
+        """List (day string, path) for all day partitions, oldest first"""
+        days = []
+        for name in sorted(os.listdir(self.root)):
+            if name.startswith('day='):
+                days.append((name[4:], os.path.join(self.root, name)))
+        return days
+
+    def _parts(self, day_dir):
+        """List part directories of a day partition"""
+        return [
+            os.path.join(day_dir, name) for name in sorted(os.listdir(day_dir))
+            if name.startswith('part-')
+        ]
+
+    def _read_manifest(self):
+        """
+        Load the manifest
+
+        Returns:
+            dict: {'parts': [part path relative to root], 'segments': [consumed segment names]}
+        """
+        path = os.path.join(self.root, MANIFEST)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        # Stores written before the manifest existed: adopt their parts
+        manifest = {'parts': [], 'segments': []}
+        for _, day_dir in self._day_dirs():
+            for part in self._parts(day_dir):
+                legacy = os.path.join(part, 'segments.json')
+                if os.path.exists(legacy):
+                    with open(legacy, 'r', encoding='utf-8') as f:
+                        manifest['segments'].extend(json.load(f))
+                    manifest['parts'].append(os.path.relpath(part, self.root))
+        manifest['segments'] = sorted(set(manifest['segments']))
+        return manifest
+
+    def _write_manifest(self, manifest):
+        """Replace the manifest atomically (write, fsync, rename)"""
+        path = os.path.join(self.root, MANIFEST)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_directory(self.root)
+
+    def _clean_up(self, manifest):
+        """
+        Delete what the manifest does not reference: parts replaced by a
+        merge, parts and temporary directories of interrupted runs, and log
+        segments that are already compacted
+        """
+        live = set(manifest['parts'])
+        for _, day_dir in self._day_dirs():
+            for name in os.listdir(day_dir):
+                if os.path.relpath(os.path.join(day_dir, name), self.root) not in live:
+                    shutil.rmtree(os.path.join(day_dir, name), ignore_errors=True)
+            if not os.listdir(day_dir):
+                os.rmdir(day_dir)
+
+        if os.path.isdir(self.log_directory):
+            for name in manifest['segments']:
+                try:
+                    os.remove(os.path.join(self.log_directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def compact(self, max_segments=256):
+        """
+        Roll sealed log segments into columnar day partitions
+
+        Args:
+            max_segments (int): Maximum segments to consume in one run
+
+        Returns:
+            int: Number of events compacted
+        """
+        with self._exclusive():
+            if not os.path.isdir(self.log_directory):
+                return 0
+
+            self.users.reload()
+            self.products.reload()
+
+            # Finish whatever an interrupted run committed or left behind
+            manifest = self._read_manifest()
+            self._clean_up(manifest)
+
+            compacted = set(manifest['segments'])
+            segments = sorted(
+                name for name in os.listdir(self.log_directory)
+                if name.endswith(SEALED_SUFFIX) and name not in compacted
+            )[:max_segments]
+
+            if not segments:
+                return 0
+
+            rows_by_day = {}
+            day_names = {}
+            for name in segments:
+                with open(os.path.join(self.log_directory, name), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            event = json.loads(line)
+                        except ValueError:
+                            continue  # Torn write at the end of a crashed segment
+                        if not isinstance(event, dict) or not event.get('user_id') or not event.get('product_id'):
+                            continue
+
+                        ts = int(parse_timestamp(event.get('timestamp') or event.get('received_at')))
+                        day_number = ts // 86400
+                        day = day_names.get(day_number)
+                        if day is None:
+                            day = day_names[day_number] = datetime.fromtimestamp(
+                                day_number * 86400, tz=timezone.utc).strftime('%Y-%m-%d')
+                        rows_by_day.setdefault(day, []).append((
+                            self.users.encode(str(event['user_id'])),
+                            self.products.encode(str(event['product_id'])),
+                            ACTION_CODES.get(event.get('action'), ACTION_CODES['other']),
+                            ts
+                        ))
+
+            # Dictionaries first: parts must never reference unknown codes
+            self.users.save()
+            self.products.save()
+
+            total = 0
+            parts = []
+            for day, rows in rows_by_day.items():
+                parts.append(self._write_part(day, rows))
+                total += len(rows)
+
+            # Commit point: the new parts and their segments become visible together.
+            # Segments no longer in the log directory were deleted after an earlier commit.
+            on_disk = set(os.listdir(self.log_directory))
+            self._write_manifest({
+                'parts': manifest['parts'] + parts,
+                'segments': sorted(name for name in compacted | set(segments) if name in on_disk)
+            })
+
+            for name in segments:
+                os.remove(os.path.join(self.log_directory, name))
+
+            logger.info(f"✓ Compacted {total} interactions from {len(segments)} segments")
+            return total
+
+    def _write_part(self, day, rows):
+        """
+        Write one sorted part into a day partition via rename
+
+        The part is not visible to scans until it is added to the manifest.
+
+        Returns:
+            str: Part path relative to the store root
+        """
+        day_dir = os.path.join(self.root, f"day={day}")
+        os.makedirs(day_dir, exist_ok=True)
+
+        self._part_seq += 1
+        part_name = f"part-{int(time.time() * 1000):013d}-{os.getpid()}-{self._part_seq:06d}"
+        tmp_dir = os.path.join(day_dir, f".tmp-{part_name}")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        columns = np.array(rows, dtype=np.int64).reshape(-1, 4)
+        columns = columns[np.argsort(columns[:, 3], kind='stable')]
+        for i, (name, dtype) in enumerate(COLUMNS.items()):
+            with open(os.path.join(tmp_dir, f"{name}.npy"), 'wb') as f:
+                np.save(f, columns[:, i].astype(dtype))
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(tmp_dir, os.path.join(day_dir, part_name))
+        _fsync_directory(day_dir)
+        return os.path.relpath(os.path.join(day_dir, part_name), self.root)
+
+    def merge_parts(self, max_parts=8):
+        """
+        Merge the parts of day partitions that have accumulated too many
+
+        The merged part replaces the originals in one manifest write; the
+        originals are deleted afterwards.
+
+        Args:
+            max_parts (int): Parts per day above which they are merged
+        """
+        with self._exclusive():
+            manifest = self._read_manifest()
+            self._clean_up(manifest)
+
+            parts_by_day = {}
+            for part in manifest['parts']:
+                parts_by_day.setdefault(os.path.dirname(part), []).append(part)
+
+            merged = {}
+            for day_name, parts in parts_by_day.items():
+                if len(parts) <= max_parts:
+                    continue
+
+                rows = []
+                for part in parts:
+                    data = [np.load(os.path.join(self.root, part, f"{name}.npy")).astype(np.int64)
+                            for name in COLUMNS]
+                    rows.append(np.stack(data, axis=1))
+                merged[self._write_part(day_name[4:], np.concatenate(rows))] = set(parts)
+
+            if not merged:
+                return
+
+            replaced = set().union(*merged.values())
+            manifest = {
+                'parts': [part for part in manifest['parts'] if part not in replaced] + list(merged),
+                'segments': manifest['segments']
+            }
+            self._write_manifest(manifest)
+            self._clean_up(manifest)
+
+    def scan(self, start=None, end=None, columns=('user', 'product', 'action', 'ts')):
+        """
+        Read interactions in a time range as column arrays
+
+        Args:
+            start (float): Inclusive start, epoch seconds (None for unbounded)
+            end (float): Exclusive end, epoch seconds (None for unbounded)
+            columns (tuple): Columns to read
+
+        Returns:
+            dict: {column: np.array}, rows ordered by time within each day
+        """
+        start_day = datetime.fromtimestamp(start, tz=timezone.utc).strftime('%Y-%m-%d') if start else None
+        end_day = datetime.fromtimestamp(end, tz=timezone.utc).strftime('%Y-%m-%d') if end else None
+
+        # A concurrent merge may delete parts of the manifest read here; read it again
+        for attempt in range(3):
+            try:
+                chunks = self._scan_parts(self._read_manifest()['parts'], start, end, start_day, end_day, columns)
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+        return {
+            name: np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[name])
+            for name, parts in chunks.items()
+        }
+
+    def _scan_parts(self, parts, start, end, start_day, end_day, columns):
+        """Collect the column slices of the given parts that fall in the time range"""
+        chunks = {name: [] for name in columns}
+        for part in sorted(parts):
+            # Partition pruning on the day directory name
+            day = os.path.dirname(part)[4:]
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+
+            part = os.path.join(self.root, part)
+            ts = np.load(os.path.join(part, 'ts.npy'), mmap_mode='r')
+            low = int(np.searchsorted(ts, start, side='left')) if start else 0
+            high = int(np.searchsorted(ts, end, side='left')) if end else len(ts)
+            if low >= high:
+                continue
+
+            for name in columns:
+                column = np.load(os.path.join(part, f"{name}.npy"), mmap_mode='r')
+                chunks[name].append(np.asarray(column[low:high]))
+        return chunks
+
+    def decode_products(self, codes):
+        """Map product codes back to product ids"""
+        return self.products.decode(codes)
+
+    def decode_users(self, codes):
+        """Map user codes back to user ids"""
+        return self.users.decode(codes)
+
+    def start_background(self, interval=60):
+        """
+        Run compaction and part merging periodically in a daemon thread
+
+        Args:
+            interval (float): Seconds between runs
+        """
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact()
+                    self.merge_parts()
+                except Exception as e:
+                    logger.error(f"Interaction compaction failed: {e}")
+
+        self._worker = threading.Thread(target=run, name='interaction-compactor', daemon=True)
+        self._worker.start()
@@ -4,9 +4,10 @@ Free API with 200+ products including fashion items
 Website: https://fakeapi.platzi.com/
 Documentation: https://fakeapi.platzi.com/doc/
 """
-import requests
 import logging
 
+from utils.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_REQUESTS, stage
+
 logger = logging.getLogger(__name__)
 
 class PlatziAPI:
@@ -22,9 +23,17 @@ class PlatziAPI:
     CATEGORY_SHOES = 4
     
     def __init__(self):
-        self.session = requests.Session()
+        self._session = None
         logger.info("✓ Platzi Fake Store API initialized (no credentials required)")
-        print("✓ Platzi API: 200+ products available")
+        logger.info("✓ Platzi API: 200+ products available")
+    
+    @property
+    def session(self):
+        """HTTP session, created on first request (requests is slow to import)"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
     
     def get_all_fashion_products(self, limit=100):
         """Get all fashion products (clothes + shoes)"""
@@ -95,11 +104,21 @@ class PlatziAPI:
             
             logger.info(f"🔍 Fetching from Platzi API: {url}")
             
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            products = response.json()
+            UPSTREAM_IN_FLIGHT.inc()
+            try:
+                with stage('upstream_fetch'):
+                    response = self.session.get(url, params=params, timeout=10)
+                    response.raise_for_status()
+                    products = response.json()
+            except Exception:
+                UPSTREAM_REQUESTS.labels('platzi', 'error').inc()
+                raise
+            finally:
+                UPSTREAM_IN_FLIGHT.dec()
+            UPSTREAM_REQUESTS.labels('platzi', 'ok').inc()
             
-            formatted = self._format_products(products, category_id)
+            with stage('format'):
+                formatted = self._format_products(products, category_id)
             logger.info(f"✓ Fetched {len(formatted)} products from category: {category_id}")
             
             return formatted
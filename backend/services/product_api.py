@@ -1,11 +1,15 @@
 """
 Product API Service - Integration with Platzi Fake Store API for fashion products
 """
-import requests
+import logging
 import os
 from datetime import datetime, timedelta
 import json
 from services.platzi_api import PlatziAPI
+from services.catalog import ProductCatalog
+from utils.metrics import CACHE_REQUESTS, stage
+
+logger = logging.getLogger(__name__)
 
 class ProductAPIService:
     """
@@ -31,7 +35,10 @@ class ProductAPIService:
         self.cache = {}
         self.cache_ttl = timedelta(hours=6)  # Cache for 6 hours
         
-        print("✓ Using Platzi Fake Store API (200+ products, free, unlimited, no credentials required)")
+        # Materialized catalog with facet index, refreshed on the same cadence as the cache
+        self.catalog = ProductCatalog(self.platzi_api, ttl=self.cache_ttl)
+        
+        logger.info("✓ Using Platzi Fake Store API (200+ products, free, unlimited, no credentials required)")
     
     def _get_cache_key(self, api_type, query, **kwargs):
         """Generate cache key from parameters"""
@@ -43,7 +50,9 @@ class ProductAPIService:
         if cache_key in self.cache:
             data, timestamp = self.cache[cache_key]
             if datetime.now() - timestamp < self.cache_ttl:
+                CACHE_REQUESTS.labels('api_response', 'hit').inc()
                 return data
+        CACHE_REQUESTS.labels('api_response', 'miss').inc()
         return None
     
     def _set_cache(self, cache_key, data):
@@ -150,50 +159,36 @@ class ProductAPIService:
         #     print(f"API request error: {str(e)}")
         #     raise
     
-    def search_amazon_products(self, query, category=None, max_results=20, gender='unisex'):
+    def search_amazon_products(self, query, category=None, max_results=20, gender='unisex', snapshot=None):
         """
-        Search fashion products using Fake Store API
+        Search fashion products in the product catalog
         
         Args:
             query (str): Search query
             category (str): Product category
             max_results (int): Maximum number of results
             gender (str): User gender (male, female, unisex)
+            snapshot (CatalogSnapshot): Catalog snapshot to read (default: the served one)
             
         Returns:
             list: Formatted product list
         """
-        # Check cache first
-        cache_key = self._get_cache_key('fakestore', query, category=category, gender=gender)
-        cached_data = self._get_from_cache(cache_key)
-        if cached_data:
-            print(f"✓ Returning cached FakeStore data for: {query}")
-            return cached_data
-        
         try:
-            print(f"🔍 Searching Platzi API for: {query} (gender: {gender})")
-            
-            # Search using Platzi API
-            products = self.platzi_api.search_fashion(query, gender=gender, limit=max_results)
+            logger.debug("🔍 Searching catalog for: %s (gender: %s)", query, gender)
             
-            # Filter by category if specified
-            if category and category != 'all':
-                category_lower = category.lower()
-                products = [p for p in products if p.get('category', '').lower() == category_lower]
+            with stage('catalog_search'):
+                products = self.catalog.search(
+                    query,
+                    filters={'category': category or 'all', 'gender': gender},
+                    limit=max_results,
+                    snapshot=snapshot
+                )
             
-            # Limit results
-            products = products[:max_results]
-            
-            # Cache results
-            self._set_cache(cache_key, products)
-            
-            print(f"✓ Fetched {len(products)} fashion products from Platzi API")
+            logger.debug("✓ Found %d fashion products in catalog", len(products))
             return products
             
         except Exception as e:
-            print(f"❌ Error fetching products from Platzi API: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error searching product catalog: %s", e)
             return []
     
     def search_flipkart_products(self, query, category=None, max_results=20):
@@ -212,7 +207,7 @@ class ProductAPIService:
         cache_key = self._get_cache_key('flipkart', query, category=category)
         cached_data = self._get_from_cache(cache_key)
         if cached_data:
-            print(f"✓ Returning cached Flipkart data for: {query}")
+            logger.debug("✓ Returning cached Flipkart data for: %s", query)
             return cached_data
         
         try:
@@ -237,68 +232,68 @@ class ProductAPIService:
             # Cache results
             self._set_cache(cache_key, products)
             
-            print(f"✓ Fetched {len(products)} Flipkart products for: {query}")
+            logger.debug("✓ Fetched %d Flipkart products for: %s", len(products), query)
             return products
             
         except Exception as e:
-            print(f"Error fetching Flipkart products: {str(e)}")
+            logger.error("Error fetching Flipkart products: %s", e)
             return []
     
-    def get_products_by_category(self, category, source='fakestore', max_results=30, gender='unisex'):
+    def get_products_by_category(self, category, source='fakestore', max_results=30, gender='unisex', filters=None,
+                                 snapshot=None):
         """
-        Get products for a specific category from Fake Store API
+        Get products for a specific category from the product catalog
         
         Args:
             category (str): Category name (Casual Wear, Formal Wear, etc.)
             source (str): Data source (always 'fakestore' now)
             max_results (int): Maximum products to return
             gender (str): User gender for filtering
+            filters (dict): Extra facet filters (priceRange, source, rating)
+            snapshot (CatalogSnapshot): Catalog snapshot to read (default: the served one)
             
         Returns:
-            list: Product list from Fake Store API
+            list: Product list from the catalog facet index
         """
-        print(f"🔍 Fetching {max_results} products for category: {category} (gender: {gender})")
+        logger.debug("🔍 Fetching %d products for category: %s (gender: %s)", max_results, category, gender)
         
         try:
-            # Get all fashion products from Platzi API
-            products = self.platzi_api.get_all_fashion_products(limit=max_results * 2)
-            
-            print(f"✓ Fetched {len(products)} total fashion products from Platzi API")
-            
-            # Filter by gender if specified
-            if gender and gender != 'unisex':
-                products = [p for p in products if p.get('gender', 'unisex').lower() == gender.lower()]
-                print(f"✓ After gender filter ({gender}): {len(products)} products")
+            query = dict(filters or {})
+            query['category'] = category
+            query['gender'] = gender
             
-            # Filter by category if specified (category matching is loose)
-            if category and category != 'all':
-                # Normalize category name (remove "Wear" suffix and make lowercase)
-                category_key = category.lower().replace(' wear', '').replace(' ', '')
-                
-                # Filter products that match the category
-                filtered = []
-                for p in products:
-                    product_category = p.get('category', '').lower()
-                    # Match if category keyword is in product category or vice versa
-                    if category_key in product_category or product_category in category_key:
-                        filtered.append(p)
-                
-                products = filtered
-                print(f"✓ After category filter ({category}): {len(products)} products")
-            
-            result = products[:max_results]
-            print(f"✓ Returning {len(result)} products for {category}")
+            with stage('catalog_query'):
+                result = self.catalog.query(query, limit=max_results, snapshot=snapshot)
+            logger.debug("✓ Returning %d products for %s", len(result), category)
             return result
             
         except Exception as e:
-            print(f"❌ Error in get_products_by_category: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error in get_products_by_category: %s", e)
             return []
     
+    def iter_products_by_category(self, category, max_results=30, gender='unisex', filters=None, snapshot=None):
+        """
+        Iterate over catalog products of a category without building a list
+        
+        Args:
+            category (str): Category name (Casual Wear, Formal Wear, etc.)
+            max_results (int): Maximum products to yield
+            gender (str): User gender for filtering
+            filters (dict): Extra facet filters (priceRange, source, rating)
+            snapshot (CatalogSnapshot): Catalog snapshot to read (default: the served one)
+            
+        Returns:
+            iterator: Products from the catalog facet index
+        """
+        query = dict(filters or {})
+        query['category'] = category
+        query['gender'] = gender
+        
+        return self.catalog.iter_query(query, limit=max_results, snapshot=snapshot)
+    
     def get_trending_products(self, limit=20, gender='unisex'):
         """
-        Get trending products from Fake Store API
+        Get trending products from the product catalog
         
         Args:
             limit (int): Number of trending products
@@ -307,20 +302,106 @@ class ProductAPIService:
         Returns:
             list: Trending products (all clothing products)
         """
-        print(f"Fetching trending products (limit: {limit}, gender: {gender})")
+        logger.debug("Fetching trending products (limit: %d, gender: %s)", limit, gender)
+        
+        # Highest rated first, served from the presorted rating index
+        with stage('catalog_query'):
+            products, _ = self.catalog.page(gender=gender, sort='rating', limit=limit)
+        
+        logger.debug("✓ Fetched %d trending products", len(products))
+        return products
+    
+    def get_sorted_products(self, category='all', gender='unisex', sort='rating', cursor=None, limit=20, filters=None,
+                            snapshot=None):
+        """
+        Get one page of products in sorted order
+        
+        Args:
+            category (str): Category name or 'all'
+            gender (str): User gender for filtering
+            sort (str): price_asc, price_desc, rating or reviews
+            cursor (str): Cursor returned with the previous page
+            limit (int): Page size
+            filters (dict): Extra facet filters (priceRange, source, rating)
+            snapshot (CatalogSnapshot): Catalog snapshot to read (default: the served one)
+            
+        Returns:
+            tuple: (list of products, next cursor or None)
+            
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        with stage('catalog_query'):
+            return self.catalog.page(
+                category=category,
+                gender=gender,
+                sort=sort,
+                cursor=cursor,
+                limit=limit,
+                filters=filters,
+                snapshot=snapshot
+            )
+    
+    def iter_sorted_products(self, category='all', gender='unisex', sort='rating', cursor=None, limit=20,
+                             filters=None, snapshot=None):
+        """
+        Iterate over one page of products in sorted order without building a list
         
-        # Get all fashion products from Platzi API
-        products = self.platzi_api.get_all_fashion_products(limit=limit * 2)
+        Same arguments as get_sorted_products().
+        
+        Returns:
+            SortedPage: Iterable of products; its next_cursor is set once iterated
+            
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        with stage('catalog_query'):
+            return self.catalog.iter_page(
+                category=category,
+                gender=gender,
+                sort=sort,
+                cursor=cursor,
+                limit=limit,
+                filters=filters,
+                snapshot=snapshot
+            )
+    
+    def get_product_by_id(self, product_id):
+        """
+        Get a single product from the catalog by id
         
-        # Filter by gender if specified
-        if gender and gender != 'unisex':
-            products = [p for p in products if p.get('gender', 'unisex').lower() == gender.lower()]
+        Args:
+            product_id (str): Product id
+            
+        Returns:
+            dict: Product, or None if not found
+        """
+        return self.catalog.get(product_id)
+    
+    def get_products_by_ids(self, product_ids, snapshot=None):
+        """
+        Get several products from the catalog by id in one lookup
         
-        # Sort by rating to get "trending" items
-        products.sort(key=lambda x: x.get('rating', 0), reverse=True)
+        Args:
+            product_ids (list): Product ids
+            snapshot (CatalogSnapshot): Catalog snapshot to read (default: the served one)
+            
+        Returns:
+            tuple: (list of found products in request order, list of missing ids)
+        """
+        return self.catalog.get_many(product_ids, snapshot)
+    
+    def get_facet_counts(self, filters=None):
+        """
+        Get per-facet product counts for the given filters
         
-        print(f"✓ Fetched {len(products)} trending products")
-        return products[:limit]
+        Args:
+            filters (dict): Active filters keyed by facet name
+            
+        Returns:
+            dict: Total matches and {facet: {value: count}}
+        """
+        return self.catalog.facets(filters)
     
     def _format_amazon_products(self, raw_products, gender='unisex'):
         """
@@ -374,7 +455,7 @@ class ProductAPIService:
                 
                 formatted.append(product)
             except Exception as e:
-                print(f"Error formatting Amazon product: {str(e)}")
+                logger.error("Error formatting Amazon product: %s", e)
                 continue
         
         return formatted
@@ -417,7 +498,7 @@ class ProductAPIService:
                 
                 formatted.append(product)
             except Exception as e:
-                print(f"Error formatting Flipkart product: {str(e)}")
+                logger.error("Error formatting Flipkart product: %s", e)
                 continue
         
         return formatted
@@ -0,0 +1,195 @@
+"""
+Product JSON fragments
+Serializes each catalog product once per field projection and snapshot, so
+list responses are assembled by joining cached byte strings instead of
+encoding full product dicts on every request
+"""
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Named projections accepted by ?fields=
+PROJECTIONS = {
+    'card': ('id', 'title', 'price', 'originalPrice', 'currency', 'image', 'rating', 'reviews', 'category', 'source')
+}
+
+# Projections serialized for every product while a snapshot is built (None = all fields)
+PRECOMPUTED_PROJECTIONS = (None, PROJECTIONS['card'])
+
+FIELD_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+MAX_FIELDS = 30
+
+_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+def dumps(value):
+    """Compact JSON bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encoder.encode(value).encode('utf-8')
+
+
+def parse_fields(value):
+    """
+    Parse a fields= parameter into a projection
+
+    Args:
+        value (str): A named projection ("card") or comma-separated field names
+
+    Returns:
+        tuple: Field names in request order, or None for all fields
+
+    Raises:
+        ValueError: If a field name is invalid
+    """
+    if not value:
+        return None
+    if value in PROJECTIONS:
+        return PROJECTIONS[value]
+
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f"Invalid field name: '{field}'")
+        if field not in fields:
+            fields.append(field)
+    if len(fields) > MAX_FIELDS:
+        raise ValueError(f"At most {MAX_FIELDS} fields can be requested")
+    return tuple(fields) or None
+
+
+def project(product, fields):
+    """Keep only the requested fields that the product has"""
+    if fields is None:
+        return product
+    return {field: product[field] for field in fields if field in product}
+
+
+class ProductFragments:
+    """
+    Serialized products of one catalog snapshot, per projection
+
+    A fragment is only used for the exact product dict it was built from,
+    so products copied and enriched by an endpoint (scores, flags) are
+    always serialized fresh. `hits`/`misses` count encodes served from and
+    outside the cache (unlocked, so approximate under concurrency).
+    """
+
+    def __init__(self, products, projections=PRECOMPUTED_PROJECTIONS, max_projections=16):
+        self.products = products
+        self.row_by_id = {p.get('id'): row for row, p in enumerate(products)}
+        self.max_projections = max_projections
+        self.hits = 0
+        self.misses = 0
+        self.fragments = {
+            fields: [dumps(project(p, fields)) for p in products]
+            for fields in projections
+        }
+
+    def encode(self, product, fields=None):
+        """
+        Get the JSON of a product, from the cache when it is a snapshot product
+
+        Args:
+            product (dict): Product
+            fields (tuple): Projection from parse_fields()
+
+        Returns:
+            bytes: Compact JSON object
+        """
+        row = self.row_by_id.get(product.get('id'))
+        if row is None or self.products[row] is not product:
+            self.misses += 1
+            return dumps(project(product, fields))
+
+        fragments = self.fragments.get(fields)
+        if fragments is None:
+            if len(self.fragments) >= self.max_projections:
+                self.misses += 1
+                return dumps(project(product, fields))
+            fragments = self.fragments.setdefault(fields, [None] * len(self.products))
+
+        fragment = fragments[row]
+        if fragment is None:
+            self.misses += 1
+            fragment = fragments[row] = dumps(project(product, fields))
+        else:
+            self.hits += 1
+        return fragment
+
+
+class ProductSerializer:
+    """
+    Catalog component serving the fragments of the current snapshot
+
+    Fragments are prepared with every catalog snapshot (off the request
+    path) and replaced together with it.
+    """
+
+    def __init__(self):
+        self.fragments = ProductFragments([])
+        self.retired_hits = 0
+        self.retired_misses = 0
+
+    def prepare(self, products):
+        """Serialize a snapshot's products for the precomputed projections"""
+        return ProductFragments(products)
+
+    def install(self, fragments):
+        """Start serving fragments returned by prepare()"""
+        retired, self.fragments = self.fragments, fragments
+        self.retired_hits += retired.hits
+        self.retired_misses += retired.misses
+
+    def encode(self, product, fields=None):
+        """
+        Serialize one product
+
+        Args:
+            product (dict): Product
+            fields (tuple): Projection from parse_fields()
+
+        Returns:
+            bytes: Compact JSON object
+        """
+        return self.fragments.encode(product, fields)
+
+    def stats(self):
+        """Get fragment cache hits and misses since start"""
+        fragments = self.fragments
+        return {'hits': self.retired_hits + fragments.hits, 'misses': self.retired_misses + fragments.misses}
+
+    def encode_list(self, products, fields=None):
+        """
+        Serialize products as a JSON array by joining their fragments
+
+        Args:
+            products (list): Products
+            fields (tuple): Projection from parse_fields()
+
+        Returns:
+            bytes: Compact JSON array
+        """
+        fragments = self.fragments
+        return b'[' + b','.join([fragments.encode(p, fields) for p in products]) + b']'
+
+    def response_body(self, products, fields=None, **envelope):
+        """
+        Serialize a list response: the envelope fields plus "products"
+
+        Args:
+            products (list): Products
+            fields (tuple): Projection from parse_fields()
+            **envelope: Other top-level response fields
+
+        Returns:
+            bytes: Compact JSON object
+        """
+        head = dumps(envelope)
+        separator = b',' if len(head) > 2 else b''
+        return head[:-1] + separator + b'"products":' + self.encode_list(products, fields) + b'}'
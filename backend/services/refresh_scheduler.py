@@ -0,0 +1,211 @@
+"""
+Catalog refresh scheduler
+Refreshes catalog partitions in a background thread so that requests only
+ever read materialised snapshots and never wait on the upstream API
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRefreshScheduler:
+    """
+    Background refresher for catalog partitions
+
+    Every partition is refreshed on its own cadence with random jitter, so
+    partitions (and processes) do not all hit the upstream API at once.
+    Partitions that received more than `hot_share` of the catalog reads since
+    their last refresh are hot and use the shorter `hot_interval`; when
+    several partitions are due together, the most-read goes first. A failed
+    refresh is retried while the old data (or, before the first load, the
+    empty catalog) keeps serving, after `retry_interval` doubled for every
+    consecutive failure and capped at `interval`.
+
+    Args:
+        catalog (ProductCatalog): Catalog to refresh
+        interval (float): Seconds between refreshes of a partition
+        hot_interval (float): Seconds between refreshes of a hot partition
+        hot_share (float): Share of reads that makes a partition hot
+        jitter (float): Relative random spread applied to every interval
+        retry_interval (float): Seconds before the first retry of a failed refresh
+    """
+
+    def __init__(self, catalog, interval=21600, hot_interval=3600, hot_share=0.5, jitter=0.1, retry_interval=300):
+        self.catalog = catalog
+        self.interval = interval
+        self.hot_interval = hot_interval
+        self.hot_share = hot_share
+        self.jitter = jitter
+        self.retry_interval = retry_interval
+
+        now = time.time()
+        self.partitions = {
+            name: {
+                'next_due': now,
+                'last_refresh': None,
+                'last_duration': None,
+                'last_error': None,
+                'refreshes': 0,
+                'failures': 0,
+                'consecutive_failures': 0,
+                'requested_at': None,
+                'hits_at_refresh': dict.fromkeys(catalog.partitions, 0)
+            }
+            for name in catalog.partitions
+        }
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+    def start(self):
+        """
+        Take over catalog refreshes from the request path and start the thread
+
+        Partitions already loaded are first refreshed one jittered interval
+        after their load.
+        """
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        self.catalog.auto_reload = False
+        loaded_at = self.catalog.loaded_at
+        if loaded_at is not None:
+            with self._lock:
+                for name, state in self.partitions.items():
+                    if name in self.catalog.partition_products:
+                        state['last_refresh'] = loaded_at.timestamp()
+                        state['next_due'] = state['last_refresh'] + self._jittered(self.interval)
+
+        self._worker = threading.Thread(target=self._run, name='catalog-refresh', daemon=True)
+        self._worker.start()
+
+    def refresh_soon(self, name=None):
+        """
+        Make one partition (or all) due now
+
+        Args:
+            name (str): Partition name, None for all partitions
+        """
+        with self._lock:
+            for partition, state in self.partitions.items():
+                if name is None or partition == name:
+                    state['next_due'] = state['requested_at'] = time.time()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            for name in self._due():
+                self._refresh(name)
+
+            with self._lock:
+                next_due = min(state['next_due'] for state in self.partitions.values())
+            self._wake.wait(max(0.0, next_due - time.time()))
+            self._wake.clear()
+
+    def _due(self):
+        """Partitions due for a refresh, most-read first"""
+        now = time.time()
+        hits = self._hits_since_refresh()
+        with self._lock:
+            due = [name for name, state in self.partitions.items() if state['next_due'] <= now]
+        return sorted(due, key=lambda name: -hits[name])
+
+    def _hits_since_refresh(self, hits=None):
+        """Catalog reads per partition since its last refresh"""
+        hits = self.catalog.partition_hits() if hits is None else hits
+        with self._lock:
+            return {
+                name: hits.get(name, 0) - state['hits_at_refresh'].get(name, 0)
+                for name, state in self.partitions.items()
+            }
+
+    def _is_hot(self, name, hits):
+        """
+        Whether a partition got more than hot_share of the reads since its
+        last refresh
+
+        Args:
+            name (str): Partition name
+            hits (dict): Total catalog reads per partition
+
+        Returns:
+            bool: True for a hot partition
+        """
+        base = self.partitions[name]['hits_at_refresh']
+        window = {partition: hits.get(partition, 0) - base.get(partition, 0) for partition in self.partitions}
+        total = sum(window.values())
+        return total > 0 and window[name] / total > self.hot_share
+
+    def _refresh(self, name):
+        """Refresh one partition and schedule its next refresh"""
+        hits = self.catalog.partition_hits()
+        started = time.time()
+        try:
+            count = self.catalog.refresh_partition(name)
+            error = None
+        except Exception as e:
+            count, error = 0, str(e)
+            logger.error(f"Catalog partition '{name}' refresh failed: {e}")
+        finished = time.time()
+
+        with self._lock:
+            hot = self._is_hot(name, hits)
+            state = self.partitions[name]
+            state['last_duration'] = finished - started
+            state['last_error'] = error
+            if error is None:
+                state['refreshes'] += 1
+                state['consecutive_failures'] = 0
+                state['last_refresh'] = finished
+                state['hits_at_refresh'] = dict(self.catalog.partition_hits())
+                state['next_due'] = finished + self._jittered(self.hot_interval if hot else self.interval)
+                logger.info(f"✓ Refreshed catalog partition '{name}' ({count} products, "
+                            f"{state['last_duration']:.2f}s{', hot' if hot else ''})")
+            else:
+                state['failures'] += 1
+                state['consecutive_failures'] += 1
+                state['next_due'] = finished + self._jittered(self._retry_delay(state['consecutive_failures']))
+
+            # A refresh requested while this one was running still happens
+            if state['requested_at'] is not None and state['requested_at'] > started:
+                state['next_due'] = state['requested_at']
+            else:
+                state['requested_at'] = None
+
+    def _retry_delay(self, failures):
+        """Backoff before the next attempt after `failures` consecutive failures"""
+        return min(self.retry_interval * 2 ** min(failures - 1, 30), max(self.interval, self.retry_interval))
+
+    def _jittered(self, seconds):
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def status(self):
+        """
+        Get refresh duration, staleness and schedule per partition
+
+        Returns:
+            dict: {partition: {'stalenessSeconds', 'lastDurationSeconds',
+                'nextRefreshSeconds', 'refreshes', 'failures', 'consecutiveFailures', 'lastError',
+                'hitsSinceRefresh', 'hot'}}
+        """
+        now = time.time()
+        totals = self.catalog.partition_hits()
+        hits = self._hits_since_refresh(totals)
+        with self._lock:
+            return {
+                name: {
+                    'stalenessSeconds': round(now - state['last_refresh'], 1) if state['last_refresh'] else None,
+                    'lastDurationSeconds': round(state['last_duration'], 3) if state['last_duration'] is not None else None,
+                    'nextRefreshSeconds': round(max(0.0, state['next_due'] - now), 1),
+                    'refreshes': state['refreshes'],
+                    'failures': state['failures'],
+                    'consecutiveFailures': state['consecutive_failures'],
+                    'lastError': state['last_error'],
+                    'hitsSinceRefresh': hits[name],
+                    'hot': self._is_hot(name, totals)
+                }
+                for name, state in self.partitions.items()
+            }
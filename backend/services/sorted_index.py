@@ -0,0 +1,215 @@
+"""
+Sorted Index - presorted product orders for paginated listings
+Keeps one global order per sort key plus per (category, gender) partition
+position arrays, so a page is a binary search plus a slice
+"""
+import base64
+import json
+
+import numpy as np
+
+from services.facet_index import normalize_category
+
+# Sort name -> (product field, descending)
+SORTS = {
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'rating': ('rating', True),
+    'reviews': ('reviews', True)
+}
+
+# Partition positions read per step when walking a page
+PAGE_CHUNK_SIZE = 256
+
+
+def encode_cursor(sort, key, product_id):
+    """Encode the position after (key, product_id) as an opaque cursor"""
+    payload = json.dumps({'s': sort, 'k': key, 'id': product_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (sort, key, product_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return payload['s'], float(payload['k']), str(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+class SortedPage:
+    """
+    One page of a sorted listing, produced lazily
+
+    Iterating walks the partition PAGE_CHUNK_SIZE positions at a time and
+    yields rows (or the items at those rows) as it goes, so memory does not
+    depend on the page size. next_cursor is set once iteration is done.
+    """
+
+    def __init__(self, sort, order, positions, start, limit, allowed=None, items=None):
+        self.sort = sort
+        self.order = order
+        self.positions = positions
+        self.start = start
+        self.limit = limit
+        self.allowed = allowed
+        self.items = items
+        self.next_cursor = None
+
+    def _chunks(self):
+        """Positions passing the allowed mask, one chunk at a time"""
+        rows = self.order['rows']
+        start = self.start
+        while start < len(self.positions):
+            candidates = self.positions[start:start + PAGE_CHUNK_SIZE]
+            start += PAGE_CHUNK_SIZE
+            if self.allowed is not None:
+                candidates = candidates[self.allowed[rows[candidates]]]
+            if len(candidates):
+                yield candidates
+
+    def __iter__(self):
+        if self.limit <= 0:
+            return
+        rows, remaining = self.order['rows'], self.limit
+        chunks = self._chunks()
+        for positions in chunks:
+            page_positions = positions[:remaining]
+            for row in rows[page_positions].tolist():
+                yield row if self.items is None else self.items[row]
+            remaining -= len(page_positions)
+            if remaining == 0:
+                # More rows follow if this chunk had some left or another one passes
+                if len(positions) > len(page_positions) or next(chunks, None) is not None:
+                    last = page_positions[-1]
+                    self.next_cursor = encode_cursor(
+                        self.sort, float(self.order['keys'][last]), self.order['ids'][last])
+                return
+
+
+class SortedIndex:
+    """
+    Presorted listing index
+
+    For every sort, products are ordered once by (sort key, product id).
+    Each (category, gender) partition, including the 'all' wildcards, stores
+    the ascending global positions of its rows. Cursors carry the last
+    (sort key, product id) rather than an offset, so they stay valid across
+    catalog rebuilds and a deep page costs O(log n + page size).
+    """
+
+    def __init__(self, products):
+        self.size = len(products)
+        ids = np.array([str(p.get('id')) for p in products], dtype=str)
+
+        categories = [normalize_category(p.get('category')) for p in products]
+        genders = [str(p.get('gender') or 'unisex').lower() for p in products]
+
+        self.orders = {}
+        for sort, (field, descending) in SORTS.items():
+            values = np.array([float(p.get(field) or 0) for p in products], dtype=np.float64)
+            keys = -values if descending else values
+
+            # Ties broken by product id so the order is total and reproducible
+            order = np.lexsort((ids, keys)) if self.size else np.empty(0, dtype=np.int64)
+            position = np.empty(self.size, dtype=np.int64)
+            position[order] = np.arange(self.size)
+
+            partitions = {}
+            for row in range(self.size):
+                for partition in self._partition_keys(categories[row], genders[row]):
+                    partitions.setdefault(partition, []).append(position[row])
+
+            self.orders[sort] = {
+                'rows': order,
+                'keys': keys[order],
+                'ids': ids[order],
+                'partitions': {
+                    partition: np.sort(np.array(positions, dtype=np.int64))
+                    for partition, positions in partitions.items()
+                }
+            }
+
+    def _partition_keys(self, category, gender):
+        """All partitions a row with this category and gender belongs to"""
+        return [(category, gender), (category, 'all'), ('all', gender), ('all', 'all')]
+
+    def _position_after(self, order, key, product_id):
+        """Number of products ordered at or before (key, product_id)"""
+        keys, ids = order['keys'], order['ids']
+        low = int(np.searchsorted(keys, key, side='left'))
+        high = int(np.searchsorted(keys, key, side='right'))
+        return low + int(np.searchsorted(ids[low:high], product_id, side='right'))
+
+    def iter_page(self, category='all', gender='all', sort='rating', cursor=None, limit=20, allowed=None,
+                  items=None):
+        """
+        Get one page of rows in sorted order, produced lazily
+
+        The sort and cursor are validated here; rows are read only while
+        the returned page is iterated.
+
+        Args:
+            category (str): Category name or 'all'
+            gender (str): Gender or 'all'/'unisex'
+            sort (str): One of SORTS
+            cursor (str): Cursor returned with the previous page
+            limit (int): Page size
+            allowed (np.array): Optional boolean mask of rows passing extra filters
+            items (list): Optional items to yield instead of row numbers, indexed by row
+
+        Returns:
+            SortedPage: Iterable page; its next_cursor is set once iterated
+
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        if cursor:
+            sort, key, product_id = decode_cursor(cursor)
+        if sort not in SORTS:
+            raise ValueError(f"Invalid sort '{sort}', expected one of {', '.join(SORTS)}")
+
+        order = self.orders[sort]
+        category = normalize_category(category) if category and category != 'all' else 'all'
+        gender = gender.lower() if gender and gender.lower() not in ('all', 'unisex') else 'all'
+
+        positions = order['partitions'].get((category, gender))
+        if positions is None:
+            positions = np.empty(0, dtype=np.int64)
+
+        start = 0
+        if cursor:
+            start = int(np.searchsorted(positions, self._position_after(order, key, product_id)))
+
+        return SortedPage(sort, order, positions, start, limit, allowed=allowed, items=items)
+
+    def page(self, category='all', gender='all', sort='rating', cursor=None, limit=20, allowed=None):
+        """
+        Get one page of rows in sorted order
+
+        Args:
+            category (str): Category name or 'all'
+            gender (str): Gender or 'all'/'unisex'
+            sort (str): One of SORTS
+            cursor (str): Cursor returned with the previous page
+            limit (int): Page size
+            allowed (np.array): Optional boolean mask of rows passing extra filters
+
+        Returns:
+            tuple: (list of rows, next cursor or None)
+
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        page = self.iter_page(category, gender, sort, cursor, limit, allowed)
+        rows = list(page)
+        return rows, page.next_cursor
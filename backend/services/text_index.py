@@ -0,0 +1,89 @@
+"""
+Text Index - inverted token index over the product catalog
+Maps every token of a product's title, description, category and tags to
+the catalog rows containing it, for keyword candidate retrieval
+"""
+import math
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'the', 'this', 'to', 'with', 'your'
+])
+
+
+def tokenize(text):
+    """
+    Split text into lowercase tokens without stop words
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        list: Tokens in order of appearance
+    """
+    return [t for t in TOKEN_PATTERN.findall(str(text or '').lower()) if t not in STOP_WORDS]
+
+
+def product_tokens(product):
+    """Distinct searchable tokens of a product"""
+    fields = [
+        product.get('title', ''),
+        product.get('description', ''),
+        product.get('category', ''),
+        ' '.join(product.get('tags', []) or [])
+    ]
+    return set(tokenize(' '.join(fields)))
+
+
+class TextIndex:
+    """
+    Inverted index: token -> sorted int32 array of catalog rows
+
+    Queries score rows by the summed IDF of matched tokens, accumulated
+    into one array with NumPy instead of scanning product texts.
+    """
+
+    def __init__(self, products):
+        self.size = len(products)
+
+        postings = {}
+        for row, product in enumerate(products):
+            for token in product_tokens(product):
+                postings.setdefault(token, []).append(row)
+
+        self.postings = {token: np.array(rows, dtype=np.int32) for token, rows in postings.items()}
+        self.idf = {
+            token: math.log(1 + self.size / len(rows)) for token, rows in self.postings.items()
+        }
+
+    def search(self, query, limit=50, allowed=None):
+        """
+        Find rows matching any query token, best first
+
+        Args:
+            query (str): Free-text query
+            limit (int): Maximum rows to return
+            allowed (np.array): Optional boolean row mask
+
+        Returns:
+            list: Row numbers ordered by score
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(tokenize(query)):
+            rows = self.postings.get(token)
+            if rows is not None:
+                scores[rows] += self.idf[token]
+
+        if allowed is not None:
+            scores[~allowed] = 0
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        # Stable order among equal scores keeps catalog order
+        return matched[np.argsort(-scores[matched], kind='stable')].tolist()
@@ -0,0 +1 @@
+# Unit tests (run from the backend directory: python -m pytest)
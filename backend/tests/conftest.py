@@ -0,0 +1,94 @@
+"""
+Shared fixtures for the backend unit tests
+Modules are imported relative to the backend directory, as in app.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_product(product_id, **fields):
+    """Catalog product with sensible defaults for the fields the indexes read"""
+    product = {
+        'id': product_id,
+        'title': f'Product {product_id}',
+        'description': '',
+        'category': 'Casual Wear',
+        'gender': 'unisex',
+        'source': 'platzi',
+        'price': 999,
+        'rating': 4.0,
+        'reviews': 10,
+        'tags': []
+    }
+    product.update(fields)
+    return product
+
+
+@pytest.fixture
+def products():
+    """A small catalog spanning several facet values"""
+    return [
+        make_product('p1', category='Casual Wear', gender='male', price=500, rating=4.6, reviews=5),
+        make_product('p2', category='Casual Wear', gender='female', price=1500, rating=4.1, reviews=50),
+        make_product('p3', category='Formal Wear', gender='male', price=3000, rating=3.2, reviews=7),
+        make_product('p4', category='Formal Wear', gender='female', price=12000, rating=4.6, reviews=1),
+        make_product('p5', category='Streetwear', gender='unisex', price=800, rating=3.9, reviews=30),
+        make_product('p6', category='Casual Wear', gender='male', price=2200, rating=4.6, reviews=12)
+    ]
+
+
+def fake_partition(prefix, categories):
+    """Upstream partition fetcher returning distinct products over the given categories"""
+    def fetch(limit):
+        return [
+            make_product(
+                f'{prefix}_{i}',
+                title=f'{categories[i % len(categories)]} {prefix} item number {i}',
+                description=f'{prefix} {i} ' + ' '.join(f'word{i * 7 + k}' for k in range(6)),
+                category=categories[i % len(categories)],
+                gender=('male', 'female', 'unisex')[i % 3],
+                price=500 + 250 * i,
+                rating=round(3.5 + (i % 15) / 10, 1),
+                reviews=10 + i
+            )
+            for i in range(min(limit, 24))
+        ]
+    return fetch
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """
+    The Flask app module, importable without network access
+
+    Interaction data goes to a temporary directory, background warm-up is
+    pushed out of the test run, and the catalog reads fake partitions.
+    """
+    data_dir = tmp_path_factory.mktemp('app-data')
+    os.environ.update({
+        'INTERACTION_LOG_DIR': str(data_dir / 'interactions'),
+        'INTERACTION_STORE_DIR': str(data_dir / 'interaction_store'),
+        'PROFILE_DIR': str(data_dir / 'profiles'),
+        'WARM_UP_DELAY': '100000',
+        'LOG_LEVEL': 'WARNING'
+    })
+    # Log to the real stderr: pytest closes its capture streams before the atexit flush
+    from utils.logging_setup import configure_logging
+    configure_logging(stream=sys.__stderr__)
+    import app as app_module
+
+    app_module.catalog.partitions = {
+        'clothes': fake_partition('clothes', ['Casual Wear', 'Formal Wear', 'Streetwear']),
+        'shoes': fake_partition('shoes', ['Athletic Wear', 'Formal Wear'])
+    }
+    app_module.catalog.load()
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    return 'secret'
+
+
+def test_status_is_public(client, app_module):
+    body = client.get('/api/admin/snapshot').get_json()
+    assert body['snapshot']['version'] == app_module.catalog.version
+    assert set(body['partitions']) == {'clothes', 'shoes'}
+
+
+def test_refresh_requires_the_admin_token(client, admin_token):
+    assert client.post('/api/admin/snapshot').status_code == 403
+    assert client.post('/api/admin/snapshot', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+
+def test_refresh_is_refused_when_no_token_is_configured(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.post('/api/admin/snapshot', headers={'X-Admin-Token': ''}).status_code == 403
+
+
+def test_refresh_with_the_token_is_scheduled(client, app_module, admin_token, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(app_module.catalog_refresh, 'refresh_soon', scheduled.append)
+
+    response = client.post('/api/admin/snapshot', json={'partition': 'shoes'},
+                           headers={'X-Admin-Token': admin_token})
+    assert response.status_code == 202 and response.get_json()['reloadStarted']
+    assert scheduled == ['shoes']
@@ -0,0 +1,233 @@
+import threading
+import time
+
+import pytest
+
+from services.catalog import ProductCatalog
+from tests.conftest import make_product
+
+DESCRIPTIONS = [
+    'relaxed cotton shirt for weekends', 'tailored wool blazer with notch lapels',
+    'leather chelsea boots with elastic sides', 'canvas sneakers with rubber soles',
+    'pleated midi skirt in light linen', 'oversized graphic hoodie in fleece'
+]
+
+
+class FakePlatzi:
+    """Upstream with a clothes and a shoes partition"""
+
+    def __init__(self):
+        self.clothes = [
+            make_product('c1', title='Weekend Shirt', description=DESCRIPTIONS[0], category='Casual Wear'),
+            make_product('c2', title='Wool Blazer', description=DESCRIPTIONS[1], category='Formal Wear'),
+        ]
+        self.shoes = [
+            make_product('s1', title='Chelsea Boots', description=DESCRIPTIONS[2], category='Formal Wear'),
+            make_product('s2', title='Canvas Sneakers', description=DESCRIPTIONS[3], category='Sneakers'),
+        ]
+
+    def get_clothes(self, limit):
+        return list(self.clothes[:limit])
+
+    def get_shoes(self, limit):
+        return list(self.shoes[:limit])
+
+
+@pytest.fixture
+def upstream():
+    return FakePlatzi()
+
+
+@pytest.fixture
+def catalog(upstream):
+    catalog = ProductCatalog(upstream, size=20)
+    catalog.refresh()
+    return catalog
+
+
+def test_only_snapshot_categories_are_counted(catalog):
+    catalog.record_access('Casual Wear')
+    catalog.record_access('casual,sneakers')
+    catalog.record_access(['formal', 'no-such-category'])
+    catalog.record_access('all')
+    for i in range(100):
+        catalog.record_access(f'made-up-{i}')
+
+    assert catalog.category_hits == {'casual': 2, 'sneakers': 1, 'formal': 1, 'all': 1}
+    assert catalog.partition_hits() == {'clothes': 4, 'shoes': 3}
+
+
+def test_snapshot_swap_resets_category_counts_but_keeps_partition_totals(catalog, upstream):
+    catalog.record_access('sneakers')
+    catalog.record_access('casual')
+    before = catalog.partition_hits()
+
+    # The new snapshot no longer has sneakers
+    upstream.shoes = upstream.shoes[:1]
+    catalog.refresh_partition('shoes')
+
+    assert catalog.category_hits == {}
+    assert catalog.partition_hits() == before == {'clothes': 1, 'shoes': 1}
+
+    catalog.record_access('sneakers')
+    catalog.record_access('formal')
+    assert catalog.category_hits == {'formal': 1}
+    assert catalog.partition_hits() == {'clothes': 2, 'shoes': 2}
+
+
+def test_queries_record_access(catalog):
+    catalog.query({'category': 'formal'})
+    catalog.facets({'category': 'unknown'})
+    catalog.page(category='all')
+    assert catalog.category_hits == {'formal': 1, 'all': 1}
+
+
+def test_id_lookups_preserve_request_order(catalog):
+    assert catalog.get('s1')['title'] == 'Chelsea Boots'
+    assert catalog.get('missing') is None
+
+    found, missing = catalog.get_many(['s2', 'nope', 'c1', 's2'])
+    assert [p['id'] for p in found] == ['s2', 'c1', 's2']
+    assert missing == ['nope']
+
+
+def test_near_duplicate_ids_resolve_to_their_representative(upstream):
+    upstream.shoes.append(dict(upstream.clothes[0], id='s3'))
+    catalog = ProductCatalog(upstream, size=20)
+    catalog.refresh()
+
+    assert 's3' not in catalog.snapshot.row_by_id
+    assert catalog.snapshot.canonical_ids == {'s3': 'c1'}
+    assert catalog.get('s3')['id'] == 'c1'
+    assert [p['id'] for p in catalog.get_many(['s3'])[0]] == ['c1']
+
+
+def test_restrict_keeps_unknown_products(catalog):
+    candidates = [catalog.get('c1'), catalog.get('c2'), {'id': 'external'}]
+    kept = catalog.restrict(candidates, {'category': 'formal'})
+    assert [p['id'] for p in kept] == ['c2', 'external']
+
+
+class Recorder:
+    """Catalog component that records what it was given"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.installed = []
+
+    def prepare(self, products):
+        if self.fail:
+            raise RuntimeError('boom')
+        return [p['id'] for p in products]
+
+    def install(self, artifact):
+        self.installed.append(artifact)
+
+
+def test_components_are_built_into_every_snapshot(upstream):
+    catalog = ProductCatalog(upstream, size=20)
+    recorder, broken = Recorder(), Recorder(fail=True)
+    catalog.add_component('ids', recorder)
+    catalog.add_component('broken', broken)
+    catalog.refresh()
+
+    assert catalog.snapshot.artifacts == {'ids': ['c1', 'c2', 's1', 's2']}
+    assert recorder.installed == [['c1', 'c2', 's1', 's2']] and broken.installed == []
+
+    upstream.clothes = upstream.clothes[:1]
+    catalog.refresh_partition('clothes')
+    assert recorder.installed[-1] == ['c1', 's1', 's2']
+
+
+def test_readers_keep_their_snapshot_across_a_swap(catalog, upstream):
+    held = catalog.snapshot
+    upstream.shoes = upstream.shoes[:1]
+    catalog.refresh_partition('shoes')
+
+    assert catalog.version == held.version + 1
+    assert catalog.get('s2') is None
+    assert catalog.get('s2', snapshot=held)['title'] == 'Canvas Sneakers'
+    assert catalog.status()['retainedVersions'] == [held.version]
+
+    del held
+    assert catalog.status()['retainedVersions'] == []
+
+
+def test_failed_fetch_keeps_serving_the_current_snapshot(catalog, upstream):
+    version = catalog.version
+    upstream.shoes = []
+    with pytest.raises(ValueError):
+        catalog.refresh_partition('shoes')
+
+    upstream.clothes = []
+    catalog.refresh()
+    assert catalog.version == version
+    assert catalog.last_error == 'Catalog fetch returned no products'
+    assert catalog.get('s1') is not None
+
+
+def test_status_describes_the_served_snapshot(catalog):
+    status = catalog.status()
+    assert status['version'] == 1 and status['products'] == 4
+    assert status['partitions'] == {'clothes': 2, 'shoes': 2}
+    assert len(status['fingerprint']) == 24
+    assert not status['stale'] and status['lastError'] is None
+
+
+class SlowPlatzi(FakePlatzi):
+    """Upstream whose fetches block until released, or fail"""
+
+    def __init__(self, products=True):
+        super().__init__()
+        self.release = threading.Event()
+        self.fetches = 0
+        if not products:
+            self.clothes, self.shoes = [], []
+
+    def get_clothes(self, limit):
+        self.fetches += 1
+        self.release.wait(5)
+        return super().get_clothes(limit)
+
+
+def test_requests_never_fetch_on_their_own_thread():
+    upstream = SlowPlatzi()
+    catalog = ProductCatalog(upstream, size=20)
+
+    started = time.monotonic()
+    assert catalog.query({'category': 'formal'}) == []
+    assert catalog.get('c1') is None
+    assert time.monotonic() - started < 1
+    assert catalog.is_loading() and catalog.version == 0
+
+    upstream.release.set()
+    catalog._loader.join(5)
+    assert catalog.get('c1')['id'] == 'c1'
+
+
+def test_failed_first_load_is_not_retried_on_every_request():
+    upstream = SlowPlatzi(products=False)
+    upstream.release.set()
+    catalog = ProductCatalog(upstream, size=20)
+
+    for _ in range(20):
+        catalog.ensure_fresh()
+        catalog._loader.join(5)
+    assert upstream.fetches == 1 and catalog.version == 0
+    assert catalog.last_error == 'Catalog fetch returned no products'
+
+
+def test_load_waits_for_a_background_load_instead_of_fetching_again():
+    upstream = SlowPlatzi()
+    catalog = ProductCatalog(upstream, size=20)
+    catalog.ensure_fresh()
+
+    loaded = []
+    waiter = threading.Thread(target=lambda: loaded.append(catalog.load()))
+    waiter.start()
+    time.sleep(0.05)
+    upstream.release.set()
+    waiter.join(5)
+
+    assert loaded == [True] and upstream.fetches == 1
+    assert catalog.load() and upstream.fetches == 1
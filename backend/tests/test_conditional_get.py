@@ -0,0 +1,62 @@
+import pytest
+
+
+def test_etag_revalidation_answers_304(client):
+    first = client.get('/api/products/category/Casual Wear?limit=5')
+    assert first.status_code == 200 and first.headers['ETag']
+    assert 'max-age' in first.headers['Cache-Control']
+
+    again = client.get('/api/products/category/Casual Wear?limit=5',
+                       headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+
+    other = client.get('/api/products/category/Casual Wear?limit=6',
+                       headers={'If-None-Match': first.headers['ETag']})
+    assert other.status_code == 200 and other.headers['ETag'] != first.headers['ETag']
+
+
+def test_etag_matches_the_snapshot_the_view_used(client, app_module, monkeypatch):
+    catalog = app_module.catalog
+    fetch_shoes = catalog.partitions['shoes']
+    before = catalog.snapshot
+    client_etag = client.get('/api/products/all?sort=price_asc&limit=3').headers['ETag']
+
+    # Publish a new snapshot while the view runs
+    page = catalog.page
+
+    def page_during_swap(*args, **kwargs):
+        catalog.partitions['shoes'] = lambda limit: fetch_shoes(limit)[:-1]
+        catalog.refresh_partition('shoes')
+        return page(*args, **kwargs)
+
+    monkeypatch.setattr(catalog, 'page', page_during_swap)
+    response = client.get('/api/products/all?sort=price_asc&limit=3')
+    monkeypatch.undo()
+    catalog.partitions['shoes'] = fetch_shoes
+
+    assert catalog.snapshot is not before
+    # Body and ETag both describe the snapshot the request started on
+    assert response.headers['ETag'] == client_etag
+    assert [p['id'] for p in response.get_json()['products']] == [
+        p['id'] for p in catalog.page(sort='price_asc', limit=3, snapshot=before)[0]]
+
+    # The next request sees the new snapshot and a new ETag
+    revalidated = client.get('/api/products/all?sort=price_asc&limit=3', headers={'If-None-Match': client_etag})
+    assert revalidated.status_code == 200 and revalidated.headers['ETag'] != client_etag
+
+
+def test_errors_carry_no_etag(client):
+    response = client.get('/api/products/all?sort=bogus')
+    assert response.status_code == 400 and 'ETag' not in response.headers
+
+
+def test_no_snapshot_yet_answers_503_without_fetching(client, app_module, monkeypatch):
+    from services.catalog import CatalogSnapshot
+    catalog = app_module.catalog
+    monkeypatch.setattr(catalog, 'snapshot', CatalogSnapshot(0, []))
+    monkeypatch.setattr(catalog, 'auto_reload', False)
+    monkeypatch.setattr(catalog, '_refresh', lambda: pytest.fail('fetched on the request thread'))
+
+    response = client.get('/api/products/category/Casual Wear?limit=5')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5' and 'ETag' not in response.headers
@@ -0,0 +1,96 @@
+import math
+import time
+
+from model.covisitation import MAX_EVENT_AGE, CoVisitationModel, event_time, parse_timestamp
+
+
+def test_parse_timestamp():
+    assert parse_timestamp('1970-01-02T00:00:00Z') == 86400
+    assert parse_timestamp(12.5) == 12.5
+    assert abs(parse_timestamp('not a time') - time.time()) < 5
+
+
+def test_event_time_is_clamped():
+    now = 1_800_000_000.0
+
+    assert event_time(now - 60, now=now) == now - 60
+    assert event_time('1970-01-02T00:00:00Z', now=now) == now - MAX_EVENT_AGE
+    assert event_time('2099-01-01T00:00:00Z', now=now) == now
+    assert event_time(float('nan'), now=now) == now
+    assert event_time(None, now=now) == now
+    assert event_time('', now=now) == now
+
+
+def test_session_items_are_co_visited():
+    model = CoVisitationModel(batch_size=1)
+    now = time.time()
+    for offset, product_id in enumerate(['a', 'b', 'c']):
+        model.add('u1', product_id, timestamp=now - 30 + offset)
+
+    neighbours = dict(model.lookup('b'))
+    assert set(neighbours) == {'a', 'c'}
+    assert model.lookup('unknown') == []
+
+
+def test_ancient_event_does_not_stop_updates():
+    model = CoVisitationModel(batch_size=1)
+    model.add('u0', 'old', timestamp='1970-01-02T00:00:00Z')
+
+    now = time.time()
+    model.add('u1', 'a', timestamp=now - 2)
+    model.add('u1', 'b', timestamp=now - 1)
+
+    assert [product_id for product_id, _ in model.lookup('a')] == ['b']
+
+
+def test_large_exponent_rebases_reference_time():
+    model = CoVisitationModel(batch_size=1)
+    now = time.time()
+    model.add('u1', 'a', timestamp=now - 1)
+    # A reference time far in the past would overflow exp() on the next event
+    model.reference_time = now - 10 * 365 * 86400
+
+    model.add('u1', 'b', timestamp=now)
+
+    weights = [weight for _, weight in model.lookup('b')]
+    assert weights and all(math.isfinite(w) for w in weights)
+    assert model.reference_time == now
+
+
+def test_idle_sessions_expire_on_every_flush():
+    model = CoVisitationModel(batch_size=1, session_gap_minutes=1)
+    now = time.time()
+    model.add('idle', 'a', timestamp=now - 300)
+    model.add('active', 'b', timestamp=now - 30)
+    assert list(model.sessions) == ['active']
+
+    model.add('idle', 'c', timestamp=now)
+    assert list(model.sessions) == ['active', 'idle']
+    assert list(model.sessions['idle']) == ['c']
+
+
+def test_rows_are_capped_when_a_batch_is_applied():
+    model = CoVisitationModel(batch_size=1000, max_neighbors=3, max_session_items=10)
+    now = time.time()
+    # 'hub' is co-visited with seven products, 'p6' most often
+    for n in range(7):
+        for repeat in range(n + 1):
+            model.add(f'u{n}-{repeat}', f'p{n}', timestamp=now - 10)
+            model.add(f'u{n}-{repeat}', 'hub', timestamp=now - 5)
+    model.flush()
+
+    assert set(model.counts['hub']) == {'p4', 'p5', 'p6'}
+    assert [product_id for product_id, _ in model.lookup('hub')] == ['p6', 'p5', 'p4']
+
+
+def test_entries_below_min_weight_are_dropped_with_their_batch():
+    model = CoVisitationModel(batch_size=1, half_life_days=1, min_weight=0.5, prune_interval_hours=1000)
+    now = time.time()
+    model.add('u1', 'a', timestamp=now - 3 * 86400)
+    model.add('u1', 'b', timestamp=now - 3 * 86400 + 1)
+    assert 'b' in model.counts['a']
+
+    # Three half-lives later the pair weighs 0.125; touching 'a' trims it, 'b' waits for the prune
+    model.add('u2', 'a', timestamp=now - 1)
+    model.add('u2', 'c', timestamp=now)
+    assert set(model.counts['a']) == {'c'} and 'b' in model.counts
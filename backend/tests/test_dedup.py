@@ -0,0 +1,68 @@
+import pytest
+
+from services.dedup import NearDuplicateDetector, normalize_text
+
+
+def product(product_id, title, description='soft breathable fabric for everyday wear'):
+    return {'id': product_id, 'title': title, 'description': description}
+
+
+@pytest.fixture
+def detector():
+    return NearDuplicateDetector()
+
+
+def bucket_ids(detector):
+    return {product_id for bucket in detector.buckets for product_id in bucket.values()}
+
+
+def test_normalize_text_collapses_case_and_whitespace():
+    assert normalize_text({'title': ' Blue  Shirt ', 'description': 'Cotton\nSlim'}) == 'blue shirt cotton slim'
+
+
+def test_near_duplicates_share_the_first_id(detector):
+    clusters = detector.add([
+        product('a', 'Classic Navy Cotton Oxford Shirt for Men'),
+        product('b', 'classic navy cotton oxford shirt for men'),
+        product('c', 'Floral Print Summer Maxi Dress for Women'),
+    ])
+    assert clusters == {'a': 'a', 'b': 'a', 'c': 'c'}
+
+
+def test_unchanged_products_are_not_rehashed(detector, monkeypatch):
+    products = [product('a', 'Classic Navy Cotton Oxford Shirt'), product('b', 'Floral Summer Maxi Dress')]
+    detector.add(products)
+
+    hashed = []
+    signatures_of = detector.signatures_of
+    monkeypatch.setattr(detector, 'signatures_of', lambda texts: hashed.extend(texts) or signatures_of(texts))
+    detector.add(products + [product('c', 'Black Leather Chelsea Boots')])
+    assert hashed == [normalize_text(product('c', 'Black Leather Chelsea Boots'))]
+
+
+def test_state_is_pruned_to_each_snapshot(detector):
+    detector.add([product(f'p{i}', f'Product number {i} with a distinct title {i * 31}') for i in range(50)])
+    assert len(detector.row_by_id) == 50
+
+    snapshot = [product(f'p{i}', f'Product number {i} with a distinct title {i * 31}') for i in range(40, 50)]
+    detector.add(snapshot)
+    assert set(detector.row_by_id) == set(detector.canonical) == {f'p{i}' for i in range(40, 50)}
+    assert bucket_ids(detector) == set(detector.row_by_id)
+    assert len(detector.signatures) == 10
+
+
+def test_removed_representative_hands_over_its_cluster(detector):
+    original = product('a', 'Classic Navy Cotton Oxford Shirt for Men')
+    duplicate = product('b', 'classic navy cotton oxford shirt for men')
+    assert detector.add([original, duplicate])['b'] == 'a'
+
+    assert detector.add([duplicate]) == {'b': 'b'}
+    # A new copy now joins the surviving product, not the removed one
+    assert detector.add([duplicate, dict(original, id='c')])['c'] == 'b'
+
+
+def test_changed_text_leaves_its_old_cluster(detector):
+    detector.add([product('a', 'Classic Navy Cotton Oxford Shirt'), product('b', 'classic navy cotton oxford shirt')])
+    clusters = detector.add([product('a', 'Classic Navy Cotton Oxford Shirt'),
+                             product('b', 'Floral Summer Maxi Dress', 'light chiffon with a tiered skirt')])
+    assert clusters == {'a': 'a', 'b': 'b'}
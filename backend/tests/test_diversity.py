@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from model.diversity import MMRReranker, ProductVectorBlock
+
+
+def text(product):
+    return product['title']
+
+
+def ranked_products():
+    """Three near-identical shirts outscore a dress and boots"""
+    titles = [('s1', 'blue cotton shirt', 'Shirts'), ('s2', 'blue cotton shirt', 'Shirts'),
+              ('s3', 'blue cotton shirt', 'Shirts'), ('d1', 'floral summer dress', 'Dresses'),
+              ('b1', 'leather chelsea boots', 'Shoes')]
+    return [{'id': product_id, 'title': title, 'category': category, 'relevanceScore': 1.0 - i * 0.05}
+            for i, (product_id, title, category) in enumerate(titles)]
+
+
+@pytest.fixture
+def vectors():
+    block = ProductVectorBlock(text)
+    block.build(ranked_products())
+    return block
+
+
+def ids(products):
+    return [p['id'] for p in products]
+
+
+def test_block_rows_are_unit_vectors(vectors):
+    assert vectors.vectors.shape == (5, vectors.n_features)
+    assert np.allclose(np.linalg.norm(vectors.vectors, axis=1), 1.0)
+
+
+def test_gather_embeds_products_outside_the_block(vectors):
+    products = [{'id': 'd1'}, {'id': 'new', 'title': 'floral summer dress'}]
+    block = vectors.gather(products)
+    assert np.allclose(block[0], block[1])
+
+
+def test_zero_diversity_keeps_the_ranking(vectors):
+    ranked = ranked_products()
+    assert ids(MMRReranker(vectors, diversity=0).rerank(ranked, 3)) == ['s1', 's2', 's3']
+
+
+def test_duplicates_are_pushed_down(vectors):
+    reranked = MMRReranker(vectors, diversity=0.5).rerank(ranked_products(), 3)
+    assert ids(reranked) == ['s1', 'd1', 'b1']
+
+
+def test_context_overrides_diversity(vectors):
+    reranker = MMRReranker(vectors, diversity=0.5)
+    assert ids(reranker({'diversity': 0}, ranked_products(), 2)) == ['s1', 's2']
+    assert ids(reranker(None, ranked_products(), 2)) == ['s1', 'd1']
+
+
+def test_category_quota_fills_up_in_relevance_order(vectors):
+    reranker = MMRReranker(vectors, diversity=0, max_per_category=1)
+    assert ids(reranker.rerank(ranked_products(), 4)) == ['s1', 'd1', 'b1', 's2']
+
+
+def test_depth_and_empty_input(vectors):
+    reranker = MMRReranker(vectors, diversity=0.5, depth=2)
+    assert ids(reranker.rerank(ranked_products(), 5)) == ['s1', 's2']
+    assert reranker.rerank([], 5) == []
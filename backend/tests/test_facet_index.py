@@ -0,0 +1,71 @@
+from services.facet_index import FacetIndex, price_bucket, rating_bucket
+
+
+def ids(index, products, bitmap):
+    return [products[row]['id'] for row in index.rows(bitmap)]
+
+
+def test_buckets():
+    assert price_bucket(999) == '0-1000'
+    assert price_bucket(1000) == '1000-2500'
+    assert price_bucket(25000) == '10000+'
+    assert price_bucket(None) == '0-1000'
+    assert rating_bucket(4.5) == '4.5+'
+    assert rating_bucket(3.49) == '0-3.5'
+
+
+def test_match_intersects_facets(products):
+    index = FacetIndex(products)
+
+    assert ids(index, products, index.match({'category': 'Casual Wear', 'gender': 'male'})) == ['p1', 'p6']
+    assert ids(index, products, index.match({'category': 'casual', 'priceRange': '0-1000'})) == ['p1']
+    assert ids(index, products, index.match({'category': 'Formal Wear', 'rating': '4.5+'})) == ['p4']
+
+
+def test_values_of_one_facet_are_ored(products):
+    index = FacetIndex(products)
+
+    assert ids(index, products, index.match({'category': 'casual,streetwear', 'gender': 'male'})) == ['p1', 'p6']
+    assert ids(index, products, index.match({'priceRange': ['0-1000', '10000+']})) == ['p1', 'p4', 'p5']
+
+
+def test_inactive_filters_match_everything(products):
+    index = FacetIndex(products)
+
+    for filters in (None, {}, {'category': 'all'}, {'gender': 'unisex'}, {'source': ''}):
+        assert index.match(filters) == index.all_rows
+
+
+def test_unknown_value_matches_nothing(products):
+    index = FacetIndex(products)
+
+    assert index.match({'category': 'Swimwear'}) == 0
+    assert len(index.rows(0)) == 0
+
+
+def test_counts_ignore_their_own_facet(products):
+    index = FacetIndex(products)
+
+    match, counts = index.search({'category': 'Casual Wear', 'gender': 'male'})
+
+    assert ids(index, products, match) == ['p1', 'p6']
+    # Category counts are for male products, gender counts for casual products
+    assert counts['category'] == {'casual': 2, 'formal': 1, 'streetwear': 0}
+    assert counts['gender'] == {'male': 2, 'female': 1, 'unisex': 0}
+    assert counts['rating']['4.5+'] == 2
+
+
+def test_mask_matches_rows(products):
+    index = FacetIndex(products)
+    bitmap = index.match({'gender': 'female'})
+
+    assert index.mask(bitmap).tolist() == [False, True, False, True, False, False]
+    assert index.rows(bitmap, limit=1).tolist() == [1]
+
+
+def test_empty_catalog():
+    index = FacetIndex([])
+
+    match, counts = index.search({'category': 'casual'})
+    assert match == 0
+    assert counts['category'] == {}
@@ -0,0 +1,32 @@
+from services.facet_index import normalize_category
+
+
+def count(products, category=None, gender=None):
+    return sum(1 for p in products
+               if (category is None or normalize_category(p['category']) in category)
+               and (gender is None or p['gender'] == gender))
+
+
+def test_facet_counts_ignore_their_own_filter(client, app_module):
+    products = app_module.catalog.snapshot.products
+    body = client.get('/api/products/facets?category=formal&gender=male').get_json()
+
+    assert body['filters'] == {'category': 'formal', 'gender': 'male'}
+    assert body['total'] == count(products, {'formal'}, 'male')
+    assert body['facets']['category'] == {
+        value: count(products, {value}, 'male') for value in ('athletic', 'casual', 'formal', 'streetwear')
+    }
+    assert body['facets']['gender']['male'] == count(products, {'formal'}, 'male')
+    assert sum(body['facets']['source'].values()) == body['total']
+
+
+def test_values_within_a_facet_are_ored(client, app_module):
+    products = app_module.catalog.snapshot.products
+    body = client.get('/api/products/facets?category=formal,streetwear').get_json()
+    assert body['total'] == count(products, {'formal', 'streetwear'}) > count(products, {'formal'})
+
+
+def test_no_filters_count_the_whole_catalog(client, app_module):
+    body = client.get('/api/products/facets').get_json()
+    assert body['total'] == len(app_module.catalog.snapshot.products)
+    assert sum(body['facets']['category'].values()) == body['total']
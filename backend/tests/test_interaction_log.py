@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from services import interaction_log as log_module
+from services.interaction_log import OPEN_SUFFIX, SEALED_SUFFIX, InteractionLog
+
+
+@pytest.fixture
+def log(tmp_path):
+    interaction_log = InteractionLog(str(tmp_path), batch_size=10, flush_interval=0.01, fsync=True)
+    yield interaction_log
+    interaction_log.close()
+
+
+def logged_events(directory):
+    events = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((SEALED_SUFFIX, OPEN_SUFFIX)):
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                events.extend(json.loads(line) for line in f)
+    return events
+
+
+def test_events_are_written_in_order_and_sealed_on_close(log, tmp_path):
+    for i in range(25):
+        assert log.append({'i': i})
+    log.flush()
+    assert log.stats()['written'] == 25 and log.stats()['buffered'] == 0
+
+    log.close()
+    names = os.listdir(tmp_path)
+    assert names and all(name.endswith(SEALED_SUFFIX) for name in names)
+    assert [e['i'] for e in logged_events(tmp_path)] == list(range(25))
+
+
+def test_failed_write_keeps_batch_queued_and_retries(log, tmp_path, monkeypatch):
+    real_fsync = os.fsync
+    failures = []
+
+    def flaky_fsync(fd):
+        if len(failures) < 2:
+            failures.append(fd)
+            raise OSError('disk full')
+        real_fsync(fd)
+
+    monkeypatch.setattr(log_module.os, 'fsync', flaky_fsync)
+    for i in range(5):
+        log.append({'i': i})
+    deadline = time.time() + 5
+    while len(failures) < 2 and time.time() < deadline:
+        time.sleep(0.005)
+    log.flush()
+
+    assert len(failures) == 2
+    assert log.stats()['written'] == 5
+    # The partial writes of the failed attempts were truncated away
+    assert [e['i'] for e in logged_events(tmp_path)] == list(range(5))
+
+
+def test_slow_listener_does_not_delay_writes(log):
+    release = threading.Event()
+    received = []
+
+    def slow_listener(batch):
+        release.wait(5)
+        received.extend(e['i'] for e in batch)
+
+    log.add_listener(slow_listener)
+    for i in range(30):
+        log.append({'i': i})
+    log.flush(timeout=1)
+
+    assert log.stats()['written'] == 30
+    assert received == []
+    release.set()
+    log.close()
+    assert received == list(range(30))
+
+
+def test_listener_backlog_is_bounded(tmp_path):
+    log = InteractionLog(str(tmp_path), batch_size=10, flush_interval=0.01, max_buffer=20, fsync=False)
+    release = threading.Event()
+    log.add_listener(lambda batch: release.wait(5))
+    try:
+        for i in range(60):
+            log.append({'i': i})
+            if i % 10 == 9:
+                log.flush()
+        stats = log.stats()
+        assert stats['written'] == 60
+        assert stats['listener_backlog'] <= 20 and stats['listener_dropped'] > 0
+    finally:
+        release.set()
+        log.close()
+
+
+def test_full_buffer_rejects_events(tmp_path):
+    log = InteractionLog(str(tmp_path), batch_size=100, flush_interval=10, max_buffer=3)
+    log._start()
+    try:
+        assert all(log.append({'i': i}) for i in range(3))
+        assert not log.append({'i': 3})
+        assert log.stats()['dropped'] == 1
+    finally:
+        log.close()
+
+
+@pytest.mark.skipif(log_module.fcntl is None, reason='needs flock')
+def test_unlocked_open_segment_is_sealed_even_if_its_pid_is_alive(tmp_path):
+    # The pid was reused (here: it is our own), but nobody holds the segment
+    orphan = tmp_path / f"0000000000001-{os.getpid()}-000001{OPEN_SUFFIX}"
+    orphan.write_text('{"i":0}\n')
+    (tmp_path / f"0000000000002-{os.getpid()}-000002{log_module.CREATING_SUFFIX}").write_bytes(b'')
+
+    log = InteractionLog(str(tmp_path), batch_size=10, flush_interval=0.01)
+    log._start()
+    try:
+        assert sorted(os.listdir(tmp_path)) == [f"0000000000001-{os.getpid()}-000001{SEALED_SUFFIX}"]
+    finally:
+        log.close()
+
+
+@pytest.mark.skipif(log_module.fcntl is None, reason='needs flock')
+def test_segment_of_a_live_writer_is_not_sealed(tmp_path):
+    writer = InteractionLog(str(tmp_path), batch_size=10, flush_interval=0.01)
+    writer.append({'i': 0})
+    writer.flush()
+    try:
+        [segment] = os.listdir(tmp_path)
+        assert segment.endswith(OPEN_SUFFIX)
+
+        # A second process starting on the same directory leaves it alone
+        writer._seal_orphans()
+        assert os.listdir(tmp_path) == [segment]
+    finally:
+        writer.close()
+    assert [e['i'] for e in logged_events(tmp_path)] == [0]
+
+
+def test_dropped_count_is_exact_under_concurrent_appends(tmp_path):
+    log = InteractionLog(str(tmp_path), batch_size=100, flush_interval=10, max_buffer=0)
+    log._start()
+    try:
+        threads = [threading.Thread(target=lambda: [log.append({'i': i}) for i in range(5000)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert log.stats()['dropped'] == 8 * 5000
+    finally:
+        log.close()
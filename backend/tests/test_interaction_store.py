@@ -0,0 +1,161 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from services import interaction_store as store_module
+from services.interaction_store import InteractionStore
+
+DAY = 86400
+T0 = 1767225600  # 2026-01-01T00:00:00Z
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    log_dir = tmp_path / 'log'
+    log_dir.mkdir()
+    return str(tmp_path / 'store'), str(log_dir)
+
+
+def write_segment(log_dir, name, events):
+    with open(os.path.join(log_dir, f'{name}.log'), 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+
+
+def events(user, products, ts):
+    return [{'user_id': user, 'product_id': p, 'action': 'view', 'timestamp': ts + i}
+            for i, p in enumerate(products)]
+
+
+def scanned_products(store, **kwargs):
+    return store.decode_products(store.scan(**kwargs)['product'])
+
+
+def test_compaction_partitions_by_day_and_scans_ranges(dirs):
+    root, log_dir = dirs
+    write_segment(log_dir, '0001', events('u1', ['a', 'b'], T0) + events('u2', ['c'], T0 + DAY))
+    write_segment(log_dir, '0002', events('u1', ['d'], T0 + 2 * DAY) + ['not an event'])
+    with open(os.path.join(log_dir, '0002.log'), 'a') as f:
+        f.write('{"user_id": "u1", "prod')
+
+    store = InteractionStore(root, log_dir)
+    assert store.compact() == 4
+    assert os.listdir(log_dir) == []
+    assert sorted(d for d in os.listdir(root) if d.startswith('day=')) == [
+        'day=2026-01-01', 'day=2026-01-02', 'day=2026-01-03']
+
+    assert scanned_products(store) == ['a', 'b', 'c', 'd']
+    assert scanned_products(store, start=T0 + 1, end=T0 + DAY + 1) == ['b', 'c']
+    assert store.decode_users(store.scan(start=T0 + 2 * DAY)['user']) == ['u1']
+    assert store.compact() == 0
+
+
+def test_crash_before_manifest_recompacts_without_duplicates(dirs, monkeypatch):
+    root, log_dir = dirs
+    write_segment(log_dir, '0001', events('u1', ['a'], T0) + events('u1', ['b'], T0 + DAY))
+    store = InteractionStore(root, log_dir)
+
+    def crash(manifest):
+        raise Crash()
+
+    monkeypatch.setattr(store, '_write_manifest', crash)
+    with pytest.raises(Crash):
+        store.compact()
+    monkeypatch.undo()
+
+    # Both day parts exist on disk but are not committed
+    assert scanned_products(store) == []
+    assert os.listdir(log_dir) == ['0001.log']
+
+    restarted = InteractionStore(root, log_dir)
+    assert restarted.compact() == 2
+    assert scanned_products(restarted) == ['a', 'b']
+    assert sum(len(os.listdir(os.path.join(root, d))) for d in os.listdir(root) if d.startswith('day=')) == 2
+
+
+def test_crash_after_manifest_deletes_consumed_segments(dirs, monkeypatch):
+    root, log_dir = dirs
+    write_segment(log_dir, '0001', events('u1', ['a', 'b'], T0))
+    store = InteractionStore(root, log_dir)
+
+    def crash(path):
+        raise Crash()
+
+    monkeypatch.setattr(store_module.os, 'remove', crash)
+    with pytest.raises(Crash):
+        store.compact()
+    monkeypatch.undo()
+
+    assert os.listdir(log_dir) == ['0001.log']
+    assert scanned_products(store) == ['a', 'b']
+
+    write_segment(log_dir, '0002', events('u2', ['c'], T0 + 10))
+    assert store.compact() == 1
+    assert os.listdir(log_dir) == []
+    assert scanned_products(store) == ['a', 'b', 'c']
+
+    with open(os.path.join(root, store_module.MANIFEST)) as f:
+        assert json.load(f)['segments'] == ['0002.log']
+
+
+def compact_parts(store, log_dir, count):
+    for i in range(count):
+        write_segment(log_dir, f'{i:04d}', events(f'u{i}', [f'p{i}'], T0 + i))
+        store.compact()
+
+
+def test_merge_replaces_parts_in_one_manifest_write(dirs):
+    root, log_dir = dirs
+    store = InteractionStore(root, log_dir)
+    compact_parts(store, log_dir, 4)
+
+    store.merge_parts(max_parts=2)
+    day_dir = os.path.join(root, 'day=2026-01-01')
+    assert len(os.listdir(day_dir)) == 1
+    scan = store.scan()
+    assert store.decode_products(scan['product']) == ['p0', 'p1', 'p2', 'p3']
+    assert np.all(np.diff(scan['ts']) >= 0)
+
+
+def test_merge_crash_before_manifest_keeps_originals(dirs, monkeypatch):
+    root, log_dir = dirs
+    store = InteractionStore(root, log_dir)
+    compact_parts(store, log_dir, 3)
+
+    def crash(manifest):
+        raise Crash()
+
+    monkeypatch.setattr(store, '_write_manifest', crash)
+    with pytest.raises(Crash):
+        store.merge_parts(max_parts=2)
+    monkeypatch.undo()
+
+    # The merged part is on disk but never read
+    assert scanned_products(store) == ['p0', 'p1', 'p2']
+    store.merge_parts(max_parts=2)
+    assert len(os.listdir(os.path.join(root, 'day=2026-01-01'))) == 1
+    assert scanned_products(store) == ['p0', 'p1', 'p2']
+
+
+def test_merge_crash_after_manifest_cleans_up_originals(dirs, monkeypatch):
+    root, log_dir = dirs
+    store = InteractionStore(root, log_dir)
+    compact_parts(store, log_dir, 3)
+
+    monkeypatch.setattr(store, '_clean_up', lambda manifest: None)
+    store.merge_parts(max_parts=2)
+    monkeypatch.undo()
+
+    # Originals linger on disk but the manifest only lists the merged part
+    assert len(os.listdir(os.path.join(root, 'day=2026-01-01'))) == 4
+    assert scanned_products(store) == ['p0', 'p1', 'p2']
+
+    store.compact()
+    assert len(os.listdir(os.path.join(root, 'day=2026-01-01'))) == 1
+    assert scanned_products(store) == ['p0', 'p1', 'p2']
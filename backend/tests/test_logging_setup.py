@@ -0,0 +1,68 @@
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from utils.logging_setup import (
+    JSONFormatter, NonBlockingQueueHandler, SamplingFilter, TextFormatter, parse_sample_rates, record_fields
+)
+
+
+def make_record(name='app', level=logging.INFO, msg='served %s', args=('page',), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates('app=0.1, model.engine = 2,services=-1,') == {
+        'app': 0.1, 'model.engine': 1.0, 'services': 0.0
+    }
+    assert parse_sample_rates(None) == {}
+    for value in ('app', 'app=often'):
+        with pytest.raises(ValueError):
+            parse_sample_rates(value)
+
+
+def test_extra_fields_are_structured():
+    record = make_record(category='shoes', limit=5)
+    assert record_fields(record) == {'category': 'shoes', 'limit': 5}
+    assert TextFormatter().format(record).endswith('INFO app: served page category=shoes limit=5')
+
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry['message'] == 'served page' and entry['logger'] == 'app'
+    assert entry['category'] == 'shoes' and entry['limit'] == 5
+
+
+def test_text_fields_stay_on_the_first_line_of_a_traceback():
+    try:
+        raise RuntimeError('boom')
+    except RuntimeError:
+        record = logging.LogRecord('app', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+    record.user = 'u1'
+    first, _, rest = TextFormatter().format(record).partition('\n')
+    assert first.endswith('failed user=u1') and 'RuntimeError: boom' in rest
+
+
+def test_sampling_uses_the_longest_prefix_and_keeps_warnings():
+    sampling = SamplingFilter({'model': 1.0, 'model.engine': 0.0, 'app': 0.0})
+    assert sampling.rate('model.engine.stage') == 0.0
+    assert sampling.rate('model.other') == 1.0
+    assert sampling.rate('application') == 1.0
+
+    assert not sampling.filter(make_record('model.engine', logging.INFO))
+    assert sampling.filter(make_record('model.engine', logging.WARNING))
+    assert sampling.filter(make_record('services.catalog', logging.DEBUG))
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    records = [make_record(msg=f'record {i}', args=()) for i in range(5)]
+    for record in records:
+        handler.handle(record)
+
+    assert handler.dropped == 3
+    # Records are passed on unformatted
+    assert handler.queue.get_nowait() is records[0]
@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import pytest
+
+from model.matrix_factorization import CollaborativeModel
+
+
+@pytest.fixture
+def model():
+    """Two taste groups: u-users interact with a-items, v-users with b-items"""
+    users = [f'u{i}' for i in range(10)] + [f'v{i}' for i in range(10)]
+    items = [f'a{i}' for i in range(5)] + [f'b{i}' for i in range(5)]
+    user_rows, item_rows = [], []
+    for user_row, user in enumerate(users):
+        group = 0 if user.startswith('u') else 5
+        for offset in range(5):
+            if (user_row + offset) % 5:  # every user skips one item of their group
+                user_rows.append(user_row)
+                item_rows.append(group + offset)
+
+    model = CollaborativeModel(factors=2, iterations=10, num_threads=2)
+    model.fit(np.array(user_rows), np.array(item_rows), np.ones(len(user_rows)), users, items)
+    return model
+
+
+def test_untrained_model_scores_nothing():
+    model = CollaborativeModel()
+    model.add_interactions([{'user_id': 'u', 'product_id': 'p', 'action': 'view'}])
+    assert model.score('u', ['p']) is None
+    assert model.recommend('u') == []
+
+
+def test_recommendations_follow_the_taste_group(model):
+    top = [product_id for product_id, _ in model.recommend('u0', top_n=3)]
+    assert top[0].startswith('a')
+    # u0 interacted with a1..a4 only
+    assert not set(top) & {'a1', 'a2', 'a3', 'a4'}
+
+    scores = model.score('v3', ['a0', 'b0', 'unknown'])
+    assert scores[1] > scores[0] and scores[2] == 0
+    assert model.score('stranger', ['a0']) is None
+
+
+def test_new_user_is_folded_in(model):
+    model.add_interactions([{'user_id': 'new', 'product_id': p, 'action': 'view'} for p in ('b0', 'b1')])
+    assert model.score('new', ['b2']) is None  # below min_interactions
+
+    model.add_interactions([{'user_id': 'new', 'product_id': 'b2', 'action': 'view'}])
+    scores = model.score('new', ['a3', 'b3'])
+    assert scores[1] > scores[0]
+
+
+def test_new_product_is_folded_in(model):
+    model.add_interactions([
+        {'user_id': f'u{i}', 'product_id': 'a_new', 'action': 'view'} for i in range(6)
+    ] + [{'user_id': 'v0', 'product_id': 'a_new', 'action': 'view'}, {'user_id': None, 'product_id': 'x'}])
+
+    assert 'a_new' in model.folded_items and 'x' not in model.folded_items
+    u_score, v_score = model.score('u8', ['a_new'])[0], model.score('v8', ['a_new'])[0]
+    assert u_score > v_score
+
+
+def test_recent_interactions_are_capped_least_recently_active_first(model):
+    model.max_recent_users = 2
+    model.add_interactions([{'user_id': user, 'product_id': 'b_new', 'action': 'view'}
+                            for user in ('v0', 'v1', 'v2')])
+    model.add_interactions([{'user_id': 'v0', 'product_id': 'b_new', 'action': 'view'}])
+    model.add_interactions([{'user_id': 'v3', 'product_id': 'b_new', 'action': 'view'}])
+
+    assert list(model.recent) == ['v0', 'v3']
+    assert model.item_users['b_new'] == {'v0', 'v3'}
+    assert 'v1' not in model.folded_users and 'v2' not in model.folded_users
+
+
+def test_scores_never_mix_two_trained_models(model):
+    catalogs = [['x0', 'x1', 'x2'], ['a0', 'b0', 'a1']]
+    stop = threading.Event()
+
+    def retrain():
+        n = 0
+        while not stop.is_set():
+            model.fit(np.array([0, 0, 1]), np.array([0, 1, 2]), np.ones(3), ['u0', 'u1'], catalogs[n % 2])
+            n += 1
+
+    thread = threading.Thread(target=retrain)
+    thread.start()
+    try:
+        for _ in range(500):
+            scores = model.score('u0', ['x0', 'a0', 'b0'])
+            # Either x0 is known, or a0 and b0 are; never factors of one with the index of the other
+            assert (scores[0] != 0) != (scores[1] != 0 and scores[2] != 0)
+    finally:
+        stop.set()
+        thread.join()
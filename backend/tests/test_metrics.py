@@ -0,0 +1,81 @@
+import pytest
+
+from utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter_and_gauge_render(registry):
+    requests = Counter('requests_total', 'Requests', ('route', 'status'), registry=registry)
+    in_flight = Gauge('in_flight', 'In flight', registry=registry)
+    requests.labels('/a', '200').inc()
+    requests.labels('/a', '200').inc(2)
+    requests.labels('/b "x"', '500').inc()
+    in_flight.inc(3)
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{route="/a",status="200"} 3.0',
+        'requests_total{route="/b \\"x\\"",status="500"} 1.0',
+        '# HELP in_flight In flight',
+        '# TYPE in_flight gauge',
+        'in_flight 2.0',
+    ]
+
+
+def test_label_count_is_checked(registry):
+    requests = Counter('requests_total', 'Requests', ('route',), registry=registry)
+    with pytest.raises(ValueError):
+        requests.labels('/a', 'extra')
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = Histogram('latency_seconds', 'Latency', buckets=(0.1, 0.5), registry=registry)
+    for value in (0.05, 0.1, 0.3, 2.0):
+        latency.observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="0.5"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 2.45',
+        'latency_seconds_count 4',
+    ]
+
+
+def test_timer_observes_its_block(registry):
+    latency = Histogram('stage_seconds', 'Stages', ('stage',), buckets=(60,), registry=registry)
+    with latency.labels('score').time():
+        pass
+    assert 'stage_seconds_count{stage="score"} 1' in registry.render()
+
+
+def test_callbacks_and_collectors_report_values_kept_elsewhere(registry):
+    cache = Counter('cache_total', 'Cache', ('cache', 'result'), registry=registry)
+    cache.add_callback(lambda: {('profiles', 'hit'): 4})
+    registry.add_collector(lambda: [('catalog_version', 'gauge', 'Version', [({}, 7), ({'x': 'y'}, None)])])
+
+    def broken():
+        raise RuntimeError('down')
+    registry.add_collector(broken)
+
+    lines = registry.render().splitlines()
+    assert 'cache_total{cache="profiles",result="hit"} 4' in lines
+    assert 'catalog_version 7' in lines and not any('x="y"' in line for line in lines)
+    assert '# collector broken failed: down' in lines
+
+
+def test_metrics_endpoint(client):
+    # Requests are recorded when the server closes the response
+    client.get('/api/products/category/Casual Wear?limit=2').close()
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4')
+    assert 'http_requests_total{endpoint="/api/products/category/<category>",method="GET",status="200"}' in text
+    assert 'catalog_snapshot_version' in text
@@ -0,0 +1,51 @@
+def test_batch_returns_products_in_request_order(client):
+    response = client.get('/api/products/batch?ids=shoes_3, clothes_1,unknown,clothes_0')
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert [p['id'] for p in body['products']] == ['shoes_3', 'clothes_1', 'clothes_0']
+    assert body['missing'] == ['unknown'] and body['count'] == 3
+
+
+def test_batch_applies_field_projection(client):
+    body = client.get('/api/products/batch?ids=clothes_1&fields=id,price').get_json()
+    assert body['products'] == [{'id': 'clothes_1', 'price': 750}]
+
+
+def test_batch_validates_ids(client, app_module):
+    assert client.get('/api/products/batch').status_code == 400
+    too_many = ','.join(f'p{i}' for i in range(app_module.MAX_BATCH_IDS + 1))
+    assert client.get(f'/api/products/batch?ids={too_many}').status_code == 400
+
+
+def test_similar_products_by_id(client):
+    response = client.post('/api/similar-products', json={'productId': 'clothes_0', 'limit': 3})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    ids = [p['id'] for p in body['products']]
+    assert 0 < len(ids) <= 3 and 'clothes_0' not in ids
+    assert all(p['category'] == 'Casual Wear' for p in body['products'])
+
+
+def test_similar_products_unknown_id(client):
+    response = client.post('/api/similar-products', json={'productId': 'nope'})
+    assert response.status_code == 404
+
+
+def test_similar_products_accepts_a_string_limit(client):
+    response = client.post('/api/similar-products', json={'productId': 'clothes_1', 'limit': '3'})
+    assert response.status_code == 200
+    assert 0 < len(response.get_json()['products']) <= 3
+
+
+def test_similar_products_clamps_the_limit(client):
+    response = client.post('/api/similar-products', json={'productId': 'clothes_1', 'limit': -4})
+    assert response.status_code == 200
+    assert len(response.get_json()['products']) == 1
+
+
+def test_similar_products_rejects_a_non_numeric_limit(client):
+    for limit in ('three', [3], {'n': 3}):
+        response = client.post('/api/similar-products', json={'productId': 'clothes_1', 'limit': limit})
+        assert response.status_code == 400
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from services.product_json import PROJECTIONS, ProductFragments, ProductSerializer, dumps, parse_fields
+from tests.conftest import make_product
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None and parse_fields('') is None
+    assert parse_fields('card') == PROJECTIONS['card']
+    assert parse_fields(' price,id,price ') == ('price', 'id')
+
+
+@pytest.mark.parametrize('value', ['id,__class__.x', 'id;drop', '1st', 'id,', ','.join(f'f{i}' for i in range(31))])
+def test_parse_fields_rejects_bad_input(value):
+    with pytest.raises(ValueError):
+        parse_fields(value)
+
+
+def test_fragments_are_reused_for_snapshot_products(products):
+    fragments = ProductFragments(products)
+    assert fragments.encode(products[0]) is fragments.encode(products[0])
+    assert json.loads(fragments.encode(products[1], ('id', 'price', 'missing'))) == {'id': 'p2', 'price': 1500}
+    assert fragments.hits == 2 and fragments.misses == 1
+
+    # An enriched copy of a snapshot product is serialized fresh
+    enriched = dict(products[0], relevanceScore=0.9)
+    assert json.loads(fragments.encode(enriched))['relevanceScore'] == 0.9
+    assert fragments.misses == 2
+
+
+def test_projection_cache_is_bounded(products):
+    fragments = ProductFragments(products, projections=(None,), max_projections=2)
+    fragments.encode(products[0], ('id',))
+    fragments.encode(products[0], ('price',))
+    assert set(fragments.fragments) == {None, ('id',)}
+    assert fragments.encode(products[0], ('price',)) == b'{"price":500}'
+
+
+def test_response_body_matches_plain_json(products):
+    serializer = ProductSerializer()
+    serializer.install(serializer.prepare(products))
+    listed = products[:2] + [make_product('external')]
+
+    body = json.loads(serializer.response_body(listed, None, status='success', count=3))
+    assert body == {'status': 'success', 'count': 3, 'products': listed}
+    assert json.loads(serializer.response_body([], ('id',))) == {'products': []}
+    assert json.loads(dumps({'a': [1, 'é']})) == {'a': [1, 'é']}
+
+
+def test_stats_survive_snapshot_swaps(products):
+    serializer = ProductSerializer()
+    serializer.install(serializer.prepare(products))
+    serializer.encode(products[0])
+    serializer.encode(make_product('external'))
+    serializer.install(serializer.prepare(products[:1]))
+    serializer.encode(products[0])
+
+    assert serializer.stats() == {'hits': 2, 'misses': 1}
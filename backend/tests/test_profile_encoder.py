@@ -0,0 +1,95 @@
+from model.profile_encoder import ProfileEncoder, canonical_profile
+from model.text_cache import ProductTextCache
+from tests.conftest import make_product
+
+
+def profile_text(profile):
+    return ' '.join(profile['interests'] + [profile['fashion_style']])
+
+
+def make_encoder(max_size=4096):
+    cache = ProductTextCache(lambda p: p['title'])
+    cache.build([make_product('p1', title='denim jacket'), make_product('p2', title='silk dress')])
+    embedded = []
+    encoder = ProfileEncoder(cache, profile_text, embed_fn=lambda text: embedded.append(text) or len(text),
+                             max_size=max_size)
+    return encoder, cache, embedded
+
+
+def test_canonical_profile_ignores_order_case_and_duplicates():
+    profile = {'interests': ['Denim', ' jackets', 'denim', ''], 'fashion_style': ' Casual '}
+    assert canonical_profile(profile) == (('denim', 'jackets'), 'casual')
+    assert canonical_profile({}) == ((), '')
+
+
+def test_equivalent_profiles_share_one_entry():
+    encoder, _, embedded = make_encoder()
+    first = encoder.encode({'interests': ['Denim', 'Silk'], 'fashion_style': 'Casual'})
+    second = encoder.encode({'interests': ['silk', 'denim'], 'fashion_style': 'casual'})
+
+    assert first is second
+    assert embedded == ['denim silk casual']
+    assert encoder.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+    assert first[0].shape[0] == 1 and first[0].nnz == 2
+
+
+def test_catalog_rebuild_invalidates_entries():
+    encoder, cache, _ = make_encoder()
+    before = encoder.encode({'interests': ['denim']})
+    cache.build([make_product('p3', title='denim shorts denim')])
+    after = encoder.encode({'interests': ['denim']})
+
+    assert after is not before
+    assert after[0].shape != before[0].shape
+    assert encoder.stats()['misses'] == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    encoder, _, _ = make_encoder(max_size=2)
+    encoder.encode({'interests': ['a']})
+    encoder.encode({'interests': ['b']})
+    encoder.encode({'interests': ['a']})
+    encoder.encode({'interests': ['c']})
+
+    assert [key[0] for key in encoder.entries] == [('a',), ('c',)]
+
+
+def test_no_catalog_yet():
+    encoder = ProfileEncoder(ProductTextCache(str), profile_text)
+    assert encoder.encode({'interests': ['denim']}) == (None, None)
+
+
+def test_rows_are_keyed_by_the_vocabulary_they_were_encoded_with():
+    encoder, cache, _ = make_encoder()
+    old = cache.current()
+    encode = cache.encode
+
+    def encode_during_rebuild(text, state=None):
+        # Same vocabulary size, different terms
+        cache.build([make_product('p3', title='wool scarf'), make_product('p4', title='linen shorts')])
+        return encode(text, state)
+
+    cache.encode = encode_during_rebuild
+    row, _ = encoder.encode({'interests': ['denim']})
+    cache.encode = encode
+
+    assert list(encoder.entries)[0][2] == old[-1] == 1
+    assert row.nnz == 1 and (row != old[2].transform(['denim'])).nnz == 0
+
+    # The next request uses the new vocabulary, where 'denim' is unknown
+    new_row, _ = encoder.encode({'interests': ['denim']}, cache.current())
+    assert new_row.nnz == 0 and encoder.stats()['misses'] == 2
+
+
+def test_missing_embedding_is_computed_again_once_available():
+    cache = ProductTextCache(lambda p: p['title'])
+    cache.build([make_product('p1', title='denim jacket')])
+    embeddings = {'enabled': False}
+    encoder = ProfileEncoder(cache, profile_text, embed_fn=lambda text: [1.0] if embeddings['enabled'] else None)
+
+    assert encoder.encode({'interests': ['denim']})[1] is None
+    embeddings['enabled'] = True
+    first = encoder.encode({'interests': ['denim']})
+    assert first[1] == [1.0]
+    assert encoder.encode({'interests': ['denim']}) is first
+    assert encoder.stats() == {'size': 1, 'hits': 2, 'misses': 1}
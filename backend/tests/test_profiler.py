@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from utils.profiler import ProfilerBusy, SamplingProfiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,), name='busy-worker')
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def read_stacks(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.rsplit(' ', 1) for line in f.read().splitlines()]
+
+
+def test_profile_writes_collapsed_stacks(tmp_path, busy_thread):
+    profiler = SamplingProfiler(str(tmp_path), default_interval=0.002)
+    profiler.start(seconds=0.2)
+    time.sleep(0.1)
+    status = profiler.stop()
+
+    assert not status['running'] and status['samples'] > 0
+    profile = status['lastProfile']
+    stacks = read_stacks(profile['path'])
+    assert len(stacks) == profile['stacks']
+    busy = [stack for stack, _ in stacks if stack.startswith('busy-worker;')]
+    assert busy and all('busy_loop (test_profiler.py:' in stack for stack in busy)
+    assert sum(int(count) for _, count in stacks) >= profile['samples']
+    assert not any(stack.startswith('sampling-profiler') for stack, _ in stacks)
+
+
+def test_profile_ends_after_max_requests(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), default_interval=0.001)
+    profiler.start(requests=2)
+    profiler.request_finished()
+    assert profiler.status()['running']
+
+    profiler.request_finished()
+    profiler._worker.join(5)
+    status = profiler.status()
+    assert not status['running'] and status['lastProfile']['requests'] == 2
+
+
+def test_requests_finished_on_several_threads_are_all_counted(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), default_interval=0.01)
+    profiler.start(seconds=30, requests=8 * 2000)
+    threads = [threading.Thread(target=lambda: [profiler.request_finished() for _ in range(2000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profiler._worker.join(5)
+    status = profiler.status()
+    assert not status['running'] and status['lastProfile']['requests'] == 8 * 2000
+
+
+def test_one_profile_at_a_time(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path))
+    profiler.start(seconds=5)
+    try:
+        with pytest.raises(ProfilerBusy):
+            profiler.start()
+    finally:
+        profiler.stop()
+    assert profiler.start(seconds=0.05)['running']
+    profiler.stop()
+
+
+@pytest.mark.parametrize('kwargs', [{'seconds': 0}, {'seconds': 301}, {'requests': 0}, {'interval': 0.0001}])
+def test_arguments_are_validated(tmp_path, kwargs):
+    profiler = SamplingProfiler(str(tmp_path), max_seconds=300)
+    with pytest.raises(ValueError):
+        profiler.start(**kwargs)
+    assert not profiler.running
+
+
+def test_profile_endpoint_requires_the_admin_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert client.get('/api/admin/profile').status_code == 403
+
+    headers = {'X-Admin-Token': 'secret'}
+    assert client.post('/api/admin/profile', json={'interval': 5}, headers=headers).status_code == 400
+    assert client.get('/api/admin/profile', headers=headers).get_json()['profile']['running'] is False
@@ -0,0 +1,69 @@
+import logging
+import time
+
+import pytest
+
+from model.recommendation_engine import RecommendationEngine
+
+
+@pytest.fixture
+def engine():
+    return RecommendationEngine()
+
+
+def record_batches(engine, monkeypatch):
+    batches = []
+    monkeypatch.setattr(engine.collaborative, 'add_interactions', batches.append)
+    return batches
+
+
+def test_invalid_events_are_skipped_and_logged(engine, monkeypatch, caplog):
+    batches = record_batches(engine, monkeypatch)
+    now = time.time()
+    interactions = [
+        {'user_id': 'u1', 'product_id': 'p1', 'action': 'view', 'timestamp': now},
+        {'user_id': 'u1', 'product_id': {'id': 'p2'}, 'action': 'view'},
+        {'user_id': None, 'product_id': 'p3'},
+        {'user_id': 'u1', 'product_id': 'p4', 'action': ['purchase']},
+        'not an event',
+        {'user_id': 'u1', 'product': {'id': 5}, 'action': 'purchase', 'timestamp': now},
+    ]
+
+    with caplog.at_level(logging.WARNING, logger='model.recommendation_engine'):
+        engine.train_on_interactions(interactions)
+
+    skipped = [r for r in caplog.records if r.getMessage().startswith('Skipping invalid interaction')]
+    assert len(skipped) == 4
+    assert [(e['user_id'], e['product_id'], e['action']) for e in batches[0]] == [
+        ('u1', 'p1', 'view'), ('u1', '5', 'purchase')]
+    assert list(engine.seen_items.contains('u1', ['p1', '5'])) == [True, True]
+    assert set(engine.trending.scores) == {'p1', '5'}
+
+
+def test_failing_model_does_not_drop_batch_for_others(engine, monkeypatch, caplog):
+    batches = record_batches(engine, monkeypatch)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(engine.covisitation, 'add', broken)
+    monkeypatch.setattr(engine.trending, 'update', broken)
+
+    with caplog.at_level(logging.ERROR, logger='model.recommendation_engine'):
+        engine.train_on_interactions([
+            {'user_id': 'u1', 'product_id': 'p1'},
+            {'user_id': 'u2', 'product_id': 'p2'},
+        ])
+
+    assert len(batches) == 1 and len(batches[0]) == 2
+    assert engine.seen_items.contains('u2', ['p2'])[0]
+    assert len([r for r in caplog.records if 'co-visitation' in r.getMessage()]) == 2
+    assert any('trending' in r.getMessage() for r in caplog.records)
+
+
+def test_empty_or_all_invalid_batch_is_a_no_op(engine, monkeypatch):
+    batches = record_batches(engine, monkeypatch)
+    engine.train_on_interactions([])
+    engine.train_on_interactions(None)
+    engine.train_on_interactions([{'product_id': 'p1'}])
+    assert batches == []
@@ -0,0 +1,146 @@
+import time
+
+import pytest
+
+from services.catalog import ProductCatalog
+from services.refresh_scheduler import CatalogRefreshScheduler
+from tests.test_catalog import FakePlatzi
+
+
+@pytest.fixture
+def catalog():
+    catalog = ProductCatalog(FakePlatzi(), size=20)
+    catalog.refresh()
+    return catalog
+
+
+def make_scheduler(catalog, **kwargs):
+    return CatalogRefreshScheduler(catalog, interval=1000, hot_interval=100, jitter=0, retry_interval=10, **kwargs)
+
+
+def test_start_takes_over_and_schedules_from_the_load(catalog, monkeypatch):
+    scheduler = make_scheduler(catalog)
+    monkeypatch.setattr(scheduler, '_run', lambda: None)
+    scheduler.start()
+
+    assert not catalog.auto_reload
+    loaded = catalog.loaded_at.timestamp()
+    assert all(state['next_due'] == loaded + 1000 for state in scheduler.partitions.values())
+    assert all(state['nextRefreshSeconds'] > 990 for state in scheduler.status().values())
+
+
+def test_most_read_partition_is_refreshed_first_and_sooner(catalog):
+    scheduler = make_scheduler(catalog)
+    catalog.record_access('sneakers')
+    catalog.record_access('sneakers')
+    catalog.record_access('casual')
+
+    assert scheduler._due() == ['shoes', 'clothes']
+    status = scheduler.status()
+    assert status['shoes']['hot'] and not status['clothes']['hot']
+
+    before = time.time()
+    for name in scheduler._due():
+        scheduler._refresh(name)
+    shoes, clothes = scheduler.partitions['shoes'], scheduler.partitions['clothes']
+    assert before + 100 <= shoes['next_due'] < before + 200
+    assert clothes['next_due'] >= before + 1000
+    assert shoes['refreshes'] == clothes['refreshes'] == 1
+
+
+def test_hits_are_counted_from_the_last_refresh(catalog):
+    scheduler = make_scheduler(catalog)
+    catalog.record_access('sneakers')
+    scheduler._refresh('shoes')
+    assert scheduler.status()['shoes']['hitsSinceRefresh'] == 0
+
+    catalog.record_access('sneakers')
+    assert scheduler.status()['shoes']['hitsSinceRefresh'] == 1
+
+
+def test_failed_refresh_is_retried_while_the_old_data_serves(catalog):
+    scheduler = make_scheduler(catalog)
+    catalog.platzi_api.shoes = []
+    version = catalog.version
+
+    before = time.time()
+    scheduler._refresh('shoes')
+    state = scheduler.partitions['shoes']
+    assert state['failures'] == 1 and state['refreshes'] == 0
+    assert before + 10 <= state['next_due'] < before + 20
+    assert "no products" in scheduler.status()['shoes']['lastError']
+    assert catalog.version == version and catalog.get('s1') is not None
+
+
+def test_refresh_soon_makes_partitions_due(catalog):
+    scheduler = make_scheduler(catalog)
+    for state in scheduler.partitions.values():
+        state['next_due'] = time.time() + 1000
+
+    scheduler.refresh_soon('shoes')
+    assert scheduler._due() == ['shoes']
+    scheduler.refresh_soon()
+    assert sorted(scheduler._due()) == ['clothes', 'shoes']
+
+
+def test_jitter_stays_within_its_spread(catalog):
+    scheduler = CatalogRefreshScheduler(catalog, jitter=0.1)
+    assert all(90 <= scheduler._jittered(100) <= 110 for _ in range(100))
+
+
+def test_retries_back_off_until_a_refresh_succeeds(catalog):
+    scheduler = make_scheduler(catalog)
+    shoes = catalog.platzi_api.shoes
+    catalog.platzi_api.shoes = []
+
+    delays = []
+    for _ in range(8):
+        before = time.time()
+        scheduler._refresh('shoes')
+        delays.append(round(scheduler.partitions['shoes']['next_due'] - before))
+    assert delays == [10, 20, 40, 80, 160, 320, 640, 1000]
+    assert scheduler.status()['shoes']['consecutiveFailures'] == 8
+
+    catalog.platzi_api.shoes = shoes
+    scheduler._refresh('shoes')
+    assert scheduler.status()['shoes']['consecutiveFailures'] == 0
+    assert scheduler.partitions['shoes']['failures'] == 8
+
+
+def test_scheduler_owns_the_first_load_after_a_failed_start():
+    upstream = FakePlatzi()
+    shoes, upstream.clothes, upstream.shoes = upstream.shoes, [], []
+    catalog = ProductCatalog(upstream, size=20)
+    assert not catalog.load()
+
+    scheduler = make_scheduler(catalog)
+    scheduler.start()
+    assert not catalog.auto_reload
+    catalog.ensure_fresh()
+    assert not catalog.is_loading()
+
+    upstream.shoes = shoes
+    scheduler.refresh_soon()
+    deadline = time.time() + 5
+    while catalog.version == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert catalog.get('s1') is not None
+
+
+def test_refresh_requested_during_a_refresh_is_kept(catalog):
+    scheduler = make_scheduler(catalog)
+    for state in scheduler.partitions.values():
+        state['next_due'] = time.time() + 1000
+    fetch = catalog.partitions['shoes']
+
+    def fetch_while_requested(limit):
+        scheduler.refresh_soon('shoes')
+        return fetch(limit)
+
+    catalog.partitions['shoes'] = fetch_while_requested
+    scheduler._refresh('shoes')
+    assert scheduler._due() == ['shoes']
+
+    catalog.partitions['shoes'] = fetch
+    scheduler._refresh('shoes')
+    assert scheduler._due() == []
@@ -0,0 +1,62 @@
+from model.seen_filter import SeenItemFilter
+
+
+def test_seen_products_are_reported():
+    seen = SeenItemFilter()
+    seen.add('u1', ['p1', 'p2'])
+    seen.add(42, [7])
+
+    assert seen.contains('u1', ['p2', 'p3', 'p1']).tolist() == [True, False, True]
+    assert seen.contains('42', ['7']).tolist() == [True]
+
+
+def test_unknown_users_and_empty_input():
+    seen = SeenItemFilter()
+    seen.add('', ['p1'])
+    seen.add('u1', [])
+
+    assert seen.rows == {}
+    assert seen.contains('u1', ['p1']).tolist() == [False]
+    assert seen.contains(None, ['p1', 'p2']).tolist() == [False, False]
+    assert seen.contains('u1', []).shape == (0,)
+
+
+def test_false_positive_rate_at_capacity():
+    seen = SeenItemFilter()
+    seen.add('u1', [f'seen_{i}' for i in range(seen.capacity)])
+
+    assert seen.contains('u1', [f'seen_{i}' for i in range(seen.capacity)]).all()
+    assert seen.contains('u1', [f'other_{i}' for i in range(5000)]).mean() < 0.02
+
+
+def test_old_items_age_out_after_two_generations():
+    seen = SeenItemFilter(capacity=10)
+    seen.add('u1', [f'old_{i}' for i in range(10)])
+    seen.add('u1', [f'mid_{i}' for i in range(10)])
+    # Still remembered in the previous generation
+    assert seen.contains('u1', ['old_0', 'mid_0']).all()
+
+    seen.add('u1', [f'new_{i}' for i in range(10)])
+    mask = seen.contains('u1', [f'old_{i}' for i in range(10)] + ['mid_0', 'new_0'])
+    assert mask[:10].sum() <= 1
+    assert mask[10:].all()
+
+
+def test_repeated_items_do_not_fill_the_generation():
+    seen = SeenItemFilter(capacity=10)
+    seen.add('u1', ['p1'] * 50)
+    assert seen.counts[seen.rows['u1']] == 1
+
+
+def test_rows_grow_then_recycle_oldest_first():
+    seen = SeenItemFilter(max_users=3, initial_users=2)
+    for user in ('a', 'b', 'c'):
+        seen.add(user, [f'{user}_item'])
+    assert len(seen.filters) == 3
+
+    seen.add('d', ['d_item'])
+    assert 'a' not in seen.rows and seen.rows['d'] == 0
+    assert not seen.contains('a', ['a_item']).any()
+    assert not seen.contains('d', ['a_item']).any()
+    assert seen.contains('b', ['b_item']).all()
+    assert seen.memory_bytes() == 3 * 2 * 128 + 3 * 4 + 3
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from model.similarity_table import SimilarityTable, SimilarityTableBuilder
+from tests.conftest import make_product
+
+
+def product_text(product):
+    return f"{product['title']} {product['description']}"
+
+
+@pytest.fixture
+def catalog_products():
+    return [
+        make_product('a', title='blue denim jacket', description='washed cotton denim'),
+        make_product('b', title='blue denim jeans', description='slim cotton denim'),
+        make_product('c', title='black denim jacket', description='heavy denim with buttons'),
+        make_product('d', title='wool suit', description='navy wool suit', category='Formal Wear'),
+        make_product('e', title='wool blazer', description='navy wool blazer', category='Formal Wear'),
+    ]
+
+
+def neighbor_ids(table, product_id):
+    return [p['id'] for p in table.lookup(product_id, top_n=5)]
+
+
+def test_neighbours_stay_within_category(catalog_products):
+    table = SimilarityTable(product_text, top_k=3)
+    table.build(catalog_products)
+
+    assert set(neighbor_ids(table, 'a')) == {'b', 'c'}
+    assert neighbor_ids(table, 'd') == ['e']
+    assert table.lookup('missing') is None
+    scores = [p['similarityScore'] for p in table.lookup('a')]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_incremental_update_matches_full_build(catalog_products):
+    table = SimilarityTable(product_text, top_k=3)
+    table.build(catalog_products)
+
+    changed = [dict(p) for p in catalog_products if p['id'] != 'c']
+    changed[0]['description'] = 'washed cotton denim with buttons'
+    changed.append(make_product('f', title='grey denim jacket', description='washed denim'))
+    table.update(changed, max_changed_ratio=1.0)
+
+    rebuilt = SimilarityTable(product_text, top_k=3)
+    rebuilt.vectorizer = table.vectorizer
+    rebuilt._load(changed, [product_text(p) for p in changed], table.vectorizer.transform(
+        [product_text(p) for p in changed]).tocsr())
+    rebuilt.neighbors = np.full((len(changed), 3), -1, dtype=np.int32)
+    rebuilt.scores = np.zeros((len(changed), 3), dtype=np.float16)
+    rebuilt._compute_rows(np.arange(len(changed)))
+
+    for product in changed:
+        assert neighbor_ids(table, product['id']) == neighbor_ids(rebuilt, product['id'])
+    assert 'c' not in table.row_by_id
+
+
+def test_prepare_leaves_served_table_untouched(catalog_products):
+    builder = SimilarityTableBuilder(product_text, top_k=3)
+    assert builder.lookup('a') is None
+
+    builder.install(builder.prepare(catalog_products))
+    served = builder.table
+    before = neighbor_ids(builder, 'a')
+
+    prepared = builder.prepare(catalog_products[:2])
+    assert builder.table is served and neighbor_ids(builder, 'a') == before
+    assert builder.lookup('c') is not None
+
+    builder.install(prepared)
+    assert builder.lookup('c') is None
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from services import sorted_index as sorted_index_module
+from services.sorted_index import SortedIndex, decode_cursor, encode_cursor
+from tests.conftest import make_product
+
+
+def paginate(index, **kwargs):
+    """Follow cursors to the end and return all rows page by page"""
+    pages, cursor = [], None
+    while True:
+        rows, cursor = index.page(cursor=cursor, **kwargs)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('price_asc', 1499.5, 'platzi_7')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ('price_asc', 1499.5, 'platzi_7')
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor', encode_cursor('rating', 4.0, 'x')[:-3], 'e30'])
+def test_malformed_cursor_is_rejected(products, cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_sorts_are_total_with_id_tie_break(products):
+    index = SortedIndex(products)
+    ids = [p['id'] for p in products]
+
+    rows, _ = index.page(sort='rating', limit=10)
+    assert [ids[r] for r in rows] == ['p1', 'p4', 'p6', 'p2', 'p5', 'p3']
+    rows, _ = index.page(sort='price_asc', limit=10)
+    assert [products[r]['price'] for r in rows] == sorted(p['price'] for p in products)
+    rows, _ = index.page(sort='reviews', category='Casual Wear', gender='male', limit=10)
+    assert [ids[r] for r in rows] == ['p6', 'p1']
+
+
+@pytest.mark.parametrize('sort', ['price_asc', 'price_desc', 'rating', 'reviews'])
+@pytest.mark.parametrize('limit', [1, 2, 4])
+def test_pages_cover_every_row_once_in_order(products, sort, limit):
+    index = SortedIndex(products)
+    pages = paginate(index, sort=sort, limit=limit)
+    rows = [row for page in pages for row in page]
+
+    full, cursor = index.page(sort=sort, limit=len(products))
+    assert rows == full and cursor is None
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_cursor_survives_a_rebuild(products):
+    index = SortedIndex(products)
+    first, cursor = index.page(sort='price_asc', limit=2)
+    assert [products[r]['id'] for r in first] == ['p1', 'p5']
+
+    # p2 is removed and a cheaper product arrives before the cursor
+    rebuilt = [p for p in products if p['id'] != 'p2'] + [make_product('p0', price=100)]
+    rows, _ = SortedIndex(rebuilt).page(sort='price_asc', cursor=cursor, limit=10)
+    assert [rebuilt[r]['id'] for r in rows] == ['p6', 'p3', 'p4']
+
+
+def test_allowed_mask_filters_pages(products):
+    index = SortedIndex(products)
+    allowed = np.array([p['rating'] >= 4.5 for p in products])
+    pages = paginate(index, sort='price_desc', limit=1, allowed=allowed)
+    assert [products[r]['id'] for page in pages for r in page] == ['p4', 'p6', 'p1']
+
+
+def test_unknown_sort_or_partition(products):
+    index = SortedIndex(products)
+    with pytest.raises(ValueError):
+        index.page(sort='newest')
+    assert index.page(category='Party Wear') == ([], None)
+    assert SortedIndex([]).page() == ([], None)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 6, 7])
+def test_pages_walk_the_index_in_chunks(products, monkeypatch, limit):
+    monkeypatch.setattr(sorted_index_module, 'PAGE_CHUNK_SIZE', 2)
+    index = SortedIndex(products)
+    rows = [row for page in paginate(index, sort='rating', limit=limit) for row in page]
+    assert [products[r]['id'] for r in rows] == ['p1', 'p4', 'p6', 'p2', 'p5', 'p3']
+
+    # The rows after a full page fail the mask: no cursor to an empty page
+    allowed = np.array([p['id'] in ('p1', 'p4') for p in products])
+    assert index.page(sort='rating', limit=2, allowed=allowed)[1] is None
+
+
+def test_lazy_page_reads_rows_as_it_is_iterated(products, monkeypatch):
+    monkeypatch.setattr(sorted_index_module, 'PAGE_CHUNK_SIZE', 2)
+
+    class Items(list):
+        read = []
+
+        def __getitem__(self, row):
+            self.read.append(row)
+            return list.__getitem__(self, row)
+
+    page = SortedIndex(products).iter_page(sort='rating', limit=1000, items=Items(products))
+    assert not Items.read
+
+    first = iter(page)
+    assert [next(first)['id'], next(first)['id']] == ['p1', 'p4']
+    assert len(Items.read) == 2 and page.next_cursor is None
+
+    assert [p['id'] for p in first] == ['p6', 'p2', 'p5', 'p3'] and page.next_cursor is None
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_leaves_ml_libraries_unloaded(tmp_path):
+    env = dict(os.environ,
+               INTERACTION_LOG_DIR=str(tmp_path / 'interactions'),
+               INTERACTION_STORE_DIR=str(tmp_path / 'interaction_store'),
+               PROFILE_DIR=str(tmp_path / 'profiles'),
+               WARM_UP_DELAY='100000',
+               LOG_LEVEL='WARNING')
+    script = ("import sys, app; "
+              "print(','.join(m for m in ('sklearn', 'scipy', 'sentence_transformers') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == ''
+
+
+def test_health_reports_readiness(client, app_module, monkeypatch):
+    body = client.get('/api/health').get_json()
+    assert body['status'] == 'success'
+    assert body['catalogVersion'] == app_module.catalog.version
+
+    monkeypatch.setattr(app_module.recommendation_engine, 'warmed_up', False)
+    assert client.get('/api/health').get_json()['ready'] is False
+    monkeypatch.setattr(app_module.recommendation_engine, 'warmed_up', True)
+    assert client.get('/api/health').get_json()['ready'] is True
+
+
+def test_preload_requires_the_gunicorn_config(app_module, monkeypatch):
+    monkeypatch.setenv(app_module.PRELOAD_MARKER, '1')
+    # The marker alone is not enough outside a gunicorn process
+    assert 'gunicorn' not in sys.modules
+    assert not app_module.gunicorn_preloading()
+    assert not app_module.PRELOADED
+
+    with pytest.raises(RuntimeError):
+        app_module.preload()
+
+    monkeypatch.setitem(sys.modules, 'gunicorn', object())
+    assert app_module.gunicorn_preloading()
+    monkeypatch.setenv(app_module.PRELOAD_MARKER, '0')
+    assert not app_module.gunicorn_preloading()
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+
+def test_stream_matches_the_json_listing(client):
+    listing = client.get('/api/products/category/Formal Wear?limit=5').get_json()
+    response = client.get('/api/products/category/Formal Wear?limit=5&stream=1')
+    lines = ndjson(response)
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert lines[:-1] == listing['products']
+    assert lines[-1] == {'status': 'success', 'count': len(listing['products']), 'category': 'Formal Wear'}
+
+
+def test_accept_header_selects_the_stream(client):
+    response = client.get('/api/products/category/Streetwear?limit=3',
+                          headers={'Accept': 'application/x-ndjson'})
+    lines = ndjson(response)
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(lines) == 4 and all(p['category'] == 'Streetwear' for p in lines[:-1])
+
+
+def test_json_and_stream_have_different_etags(client):
+    json_etag = client.get('/api/products/category/Streetwear?limit=3').headers['ETag']
+    stream_etag = client.get('/api/products/category/Streetwear?limit=3&stream=1').headers['ETag']
+    assert json_etag != stream_etag
+
+
+def test_sorted_stream_carries_the_cursor(client):
+    lines = ndjson(client.get('/api/products/all?sort=price_asc&limit=2&stream=1&fields=id,price'))
+    assert [set(p) for p in lines[:-1]] == [{'id', 'price'}] * 2
+    assert lines[0]['price'] <= lines[1]['price']
+
+    rest = ndjson(client.get(f"/api/products/all?sort=price_asc&limit=2&stream=1&cursor={lines[-1]['nextCursor']}"))
+    assert rest[0]['price'] >= lines[1]['price']
+
+
+def test_sorted_stream_is_produced_lazily_and_validated_up_front(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module.product_api_service, 'get_sorted_products',
+                        lambda **kwargs: pytest.fail('the stream built the page as a list'))
+    lines = ndjson(client.get('/api/products/category/Casual Wear?sort=rating&limit=1&stream=1'))
+    assert len(lines) == 2 and lines[-1]['nextCursor']
+
+    response = client.get('/api/products/category/Casual Wear?sort=newest&stream=1')
+    assert response.status_code == 400 and response.get_json()['status'] == 'error'
+
+
+def test_products_are_written_in_chunks(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'STREAM_CHUNK_SIZE', 2)
+    response = client.get('/api/products/category/Casual Wear?limit=5&stream=1')
+    chunks = list(response.response)
+
+    assert [chunk.count(b'\n') for chunk in chunks] == [2, 2, 2]
+    assert json.loads(chunks[-1].splitlines()[-1])['count'] == 5
+
+
+def test_error_while_streaming_ends_with_an_error_line(client, app_module, monkeypatch):
+    def failing(category, max_results, filters, snapshot):
+        yield app_module.catalog.get('clothes_0')
+        raise RuntimeError('upstream went away')
+
+    monkeypatch.setattr(app_module.product_api_service, 'iter_products_by_category', failing)
+    lines = ndjson(client.get('/api/products/category/Casual Wear?stream=1'))
+
+    assert lines[0]['id'] == 'clothes_0'
+    assert lines[-1] == {'status': 'error', 'message': 'upstream went away'}
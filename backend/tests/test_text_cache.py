@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from model.text_cache import ProductTextCache
+from tests.conftest import make_product
+
+
+def text(product):
+    return f"{product['title']} {product['description']}"
+
+
+@pytest.fixture
+def catalog():
+    return [
+        make_product('p1', title='Blue Oxford Shirt', description='cotton button down'),
+        make_product('p2', title='Floral Maxi Dress', description='light summer chiffon'),
+        make_product('p3', title='Chelsea Boots', description='brown leather'),
+    ]
+
+
+@pytest.fixture
+def cache(catalog):
+    cache = ProductTextCache(text)
+    cache.build(catalog)
+    return cache
+
+
+def test_empty_catalog_is_not_installed():
+    cache = ProductTextCache(text)
+    cache.build([])
+    assert not cache.ready and cache.version == 0
+
+
+def test_catalog_texts_come_from_the_cache(cache, catalog):
+    calls = []
+    cache.text_fn = lambda p: calls.append(p['id']) or text(p)
+
+    assert cache.text(dict(catalog[0], title='changed')) == text(catalog[0])
+    assert cache.text(make_product('new', title='Wool Scarf')) == 'Wool Scarf '
+    assert calls == ['new']
+
+
+def test_vectors_keep_request_order_with_unknown_products(cache, catalog):
+    outsider = make_product('new', title='Blue Oxford Shirt', description='cotton button down')
+    vectors = cache.vectors([catalog[2], outsider, catalog[0]])
+
+    assert vectors.shape[0] == 3
+    dense = vectors.toarray()
+    assert np.allclose(dense[1], dense[2])
+    assert np.allclose(np.linalg.norm(dense, axis=1), 1.0, atol=1e-5)
+    assert np.allclose(cache.vectors(catalog).toarray(), cache._state[3].toarray())
+
+
+def test_encode_uses_the_catalog_vocabulary(cache):
+    query = cache.encode('leather boots').toarray()[0]
+    rows = cache.vectors([make_product('p1'), make_product('p3')]).toarray()
+    assert rows[1] @ query > rows[0] @ query
+    assert cache.encode('words nobody uses').nnz == 0
+
+
+def test_rebuild_bumps_the_version(cache, catalog):
+    cache.build(catalog[:1])
+    assert cache.version == 2 and cache._state[-1] == 2
+    assert cache.text(catalog[1]) == text(catalog[1])
@@ -0,0 +1,35 @@
+import numpy as np
+
+from services.text_index import TextIndex, product_tokens, tokenize
+from tests.conftest import make_product
+
+
+def test_tokenize_drops_stop_words_and_punctuation():
+    assert tokenize('The Slim-Fit shirt, for Men!') == ['slim', 'fit', 'shirt', 'men']
+    assert tokenize(None) == []
+
+
+def test_product_tokens_cover_every_searchable_field():
+    product = make_product('p1', title='Blue Shirt', description='cotton', category='Casual Wear',
+                           tags=['summer'])
+    assert product_tokens(product) == {'blue', 'shirt', 'cotton', 'casual', 'wear', 'summer'}
+
+
+def test_rare_tokens_rank_first():
+    index = TextIndex([
+        make_product('p1', title='Blue Shirt', description='', category=''),
+        make_product('p2', title='Blue Jeans', description='', category=''),
+        make_product('p3', title='Linen Shirt', description='', category=''),
+        make_product('p4', title='Blue Linen Dress', description='', category=''),
+    ])
+    # 'dress' is the rarest token; equal scores keep catalog order
+    assert index.search('blue dress') == [3, 0, 1]
+    assert index.search('blue dress', limit=2) == [3, 0]
+    assert index.search('shirt') == [0, 2]
+    assert index.search('unknown words') == []
+
+
+def test_allowed_mask_limits_rows():
+    index = TextIndex([make_product(f'p{i}', title='Blue Shirt') for i in range(4)])
+    allowed = np.array([False, True, False, True])
+    assert index.search('shirt', allowed=allowed) == [1, 3]
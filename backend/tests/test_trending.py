@@ -0,0 +1,72 @@
+import math
+import time
+
+import numpy as np
+
+from model.trending import TrendingCounter, interaction_events
+
+
+def test_ranking_orders_by_decayed_score():
+    counter = TrendingCounter(top_k=2)
+    now = time.time()
+    counter.update([('a', now, 1.0), ('b', now, 3.0), ('c', now, 2.0), ('a', now, 0.5)])
+
+    assert [product_id for product_id, _ in counter.top(5)] == ['b', 'c']
+
+
+def test_old_events_count_less():
+    counter = TrendingCounter(half_life_hours=1)
+    now = time.time()
+    counter.update([('old', now - 3 * 3600, 2.0), ('new', now, 1.0)])
+
+    scores = dict(counter.top())
+    assert scores['new'] > scores['old']
+    assert math.isclose(scores['old'] / scores['new'], 0.25, rel_tol=1e-3)
+
+
+def test_far_future_event_does_not_overflow():
+    counter = TrendingCounter()
+    now = time.time()
+    counter.update([('a', now, 1.0)])
+    counter.update([('b', now + 80 * 365 * 86400, 1.0)])
+    counter.update([('c', now, 1.0)])
+
+    assert all(math.isfinite(score) for _, score in counter.ranking)
+    assert 'b' in dict(counter.ranking)
+
+
+def test_interaction_events_clamp_timestamps():
+    now = time.time()
+    events = interaction_events([
+        {'product_id': 'a', 'action': 'like', 'timestamp': '1970-01-02T00:00:00Z'},
+        {'product_id': 'b', 'timestamp': '2099-01-01T00:00:00Z'},
+        {'product': {'id': 'c'}},
+        {'action': 'view'}
+    ])
+
+    assert [e[0] for e in events] == ['a', 'b', 'c']
+    assert all(now - 31 * 86400 < ts <= time.time() for _, ts, _ in events)
+    assert events[0][2] == 3.0
+
+
+def test_updates_after_out_of_range_events_are_kept():
+    counter = TrendingCounter()
+    counter.update(interaction_events([{'product_id': 'bad', 'timestamp': '1970-01-02T00:00:00Z'}]))
+    for i in range(100):
+        counter.update(interaction_events([{'product_id': f'p{i % 5}'}]))
+
+    # The clamped event is 30 days old and decays below min_score
+    top = dict(counter.top(10))
+    assert set(top) == {'p0', 'p1', 'p2', 'p3', 'p4'}
+    assert all(math.isclose(score, 20, rel_tol=1e-3) for score in top.values())
+
+
+def test_load_and_merge():
+    counter = TrendingCounter(min_score=0.0)
+    now = time.time()
+    latest, scores = counter.load(np.array([0, 1, 1]), np.array([now - 10, now - 5, now]))
+    counter.merge(latest, {f'p{code}': score for code, score in scores.items()})
+
+    assert [product_id for product_id, _ in counter.top()] == ['p1', 'p0']
+    counter.merge(now + 80 * 365 * 86400, {'p2': 1.0})
+    assert all(math.isfinite(score) for _, score in counter.ranking)
@@ -0,0 +1,227 @@
+"""
+Logging configuration
+Routes every logger through one non-blocking queue: request threads only
+enqueue records, and a listener thread formats and writes them. Records
+below WARNING can be sampled per logger, and `extra={...}` fields are
+written as structured key=value pairs (or JSON keys)
+
+Environment:
+    LOG_LEVEL: Root level (default INFO)
+    LOG_FORMAT: text (default) or json
+    LOG_SAMPLE_RATES: Share of sub-WARNING records kept per logger prefix,
+        e.g. "app=0.1,model.recommendation_engine=0.01"
+    LOG_QUEUE_SIZE: Records buffered before new ones are dropped (default 10000)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+
+def record_fields(record):
+    """Structured fields passed with extra={...}"""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    """`time LEVEL logger: message key=value ...`"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            pairs = ' '.join(f'{key}={value}' for key, value in fields.items())
+            if record.exc_text or record.stack_info:
+                head, _, tail = line.partition('\n')
+                return f'{head} {pairs}\n{tail}'
+            return f'{line} {pairs}'
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, fields, exc"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a share of the records below WARNING per logger; warnings and
+    errors always pass
+
+    Args:
+        rates (dict): {logger name prefix: share kept in [0, 1]}, the longest
+            matching prefix applies
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._rate_by_logger = {}
+
+    def rate(self, name):
+        rate = self._rate_by_logger.get(name)
+        if rate is None:
+            rate = 1.0
+            matched = -1
+            for prefix, prefix_rate in self.rates.items():
+                if (name == prefix or name.startswith(prefix + '.')) and len(prefix) > matched:
+                    rate, matched = prefix_rate, len(prefix)
+            self._rate_by_logger[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks or formats on the calling thread
+
+    Records are enqueued as they are (message arguments are formatted by
+    the listener, so they should not be mutated after logging). When the
+    queue is full the record is dropped and counted in `dropped`.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(value):
+    """
+    Parse LOG_SAMPLE_RATES
+
+    Args:
+        value (str): Comma-separated logger=rate pairs
+
+    Returns:
+        dict: {logger prefix: rate}
+
+    Raises:
+        ValueError: If a pair or rate is invalid
+    """
+    rates = {}
+    for pair in (value or '').split(','):
+        if not pair.strip():
+            continue
+        name, separator, rate = pair.partition('=')
+        if not separator:
+            raise ValueError(f"Invalid LOG_SAMPLE_RATES entry: '{pair}'")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def configure_logging(level=None, log_format=None, sample_rates=None, queue_size=None, stream=None):
+    """
+    Install the queue handler on the root logger and start its listener
+
+    Safe to call more than once; later calls are ignored. Arguments default
+    to the environment variables listed in the module docstring.
+
+    Returns:
+        NonBlockingQueueHandler: The root handler
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is not None:
+            return _handler
+
+        level = level or os.getenv('LOG_LEVEL', 'INFO').upper()
+        log_format = log_format or os.getenv('LOG_FORMAT', 'text').lower()
+        if sample_rates is None:
+            sample_rates = parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))
+        queue_size = queue_size or int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JSONFormatter() if log_format == 'json' else TextFormatter())
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        if sample_rates:
+            _handler.addFilter(SamplingFilter(sample_rates))
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(_handler)
+
+        _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(flush_logging)
+        os.register_at_fork(after_in_child=_restart_listener)
+        return _handler
+
+
+def _restart_listener():
+    """
+    Give a forked worker its own queue and listener thread
+
+    The parent's listener thread does not exist in the child, and its queue
+    lock may have been held at fork time.
+    """
+    global _listener
+    if _handler is None:
+        return
+    _handler.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def flush_logging(timeout=2.0):
+    """Write out queued records (the listener keeps running)"""
+    if _handler is None:
+        return
+    deadline = time.monotonic() + timeout
+    while not _handler.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for output in _listener.handlers:
+        output.flush()
+
+
+def logging_stats():
+    """
+    Get the queue depth and dropped record count
+
+    Returns:
+        dict: {'queued', 'dropped'}, or None if logging is not configured
+    """
+    if _handler is None:
+        return None
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
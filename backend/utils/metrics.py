@@ -0,0 +1,322 @@
+"""
+Request and stage metrics
+Counters, gauges and latency histograms kept in process memory and rendered
+in the Prometheus text exposition format for GET /metrics
+
+Recording a sample is a dict lookup, a bisect and a locked increment, so
+metrics stay on in production. Every process (gunicorn worker) has its own
+registry; a scrape reports the worker that answered it.
+"""
+import bisect
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds (seconds) of the latency histogram buckets, +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return f'{value:.1f}'
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Registry:
+    """
+    Metrics of this process plus collectors evaluated at scrape time
+
+    A collector is a function returning [(name, type, help, samples)] where
+    samples is a list of ({label: value}, number); it reports values that
+    already live elsewhere (cache counters, catalog state) without hooks.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        with self._lock:
+            self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f'# collector {getattr(collector, "__name__", collector)} failed: {_escape(e)}')
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    """A metric family: one child per combination of label values"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        registry.register(self)
+
+    def labels(self, *values):
+        """
+        Get the child for a set of label values (in labelnames order)
+
+        Label values must come from a small fixed set (route patterns, stage
+        names), never from request data.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def add_callback(self, callback):
+        """
+        Report values kept elsewhere as more samples of this family
+
+        Args:
+            callback (callable): Returns {label values tuple: value}, called at scrape time
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def samples(self):
+        with self._lock:
+            children = sorted(self._children.items())
+            callbacks = list(self._callbacks)
+        lines = []
+        for values, child in children:
+            lines.extend(self._child_samples(values, child))
+        for callback in callbacks:
+            try:
+                values_by_labels = callback()
+            except Exception as e:
+                lines.append(f'# callback {getattr(callback, "__name__", callback)} failed: {_escape(e)}')
+                continue
+            for values, value in sorted(values_by_labels.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}')
+        return lines
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child_samples(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}']
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or errors"""
+
+    type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    type = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self._children[()].dec(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the seconds spent in its block"""
+        return Timer(self)
+
+
+class Histogram(_Metric):
+    """Distribution of observations (seconds) over fixed buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def _child_samples(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [('le', _format_value(float(bound)))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Timer:
+    """Observe the duration of a with-block into a histogram child"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+# Shared metrics recorded by services and models
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status',
+                        ('endpoint', 'method', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency by route',
+                         ('endpoint', 'method'))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being served')
+
+STAGE_LATENCY = Histogram('stage_duration_seconds', 'Latency of request processing stages', ('stage',))
+
+UPSTREAM_REQUESTS = Counter('upstream_requests_total', 'Requests to upstream product APIs by outcome',
+                            ('api', 'outcome'))
+UPSTREAM_IN_FLIGHT = Gauge('upstream_requests_in_flight', 'Requests to upstream product APIs in progress')
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result (hit/miss)',
+                         ('cache', 'result'))
+
+
+def stage(name):
+    """
+    Time a processing stage
+
+        with stage('score'):
+            ...
+
+    Args:
+        name (str): Stage name (upstream_fetch, format, vectorise, score, filter, serialise, ...)
+
+    Returns:
+        Timer: Context manager recording into stage_duration_seconds
+    """
+    return Timer(STAGE_LATENCY.labels(name))
+
+
+def observe_stage(name, started):
+    """
+    Record a stage that started at `started` (time.perf_counter()) and ended now
+
+    Returns:
+        float: The end time, i.e. the start of the next stage
+    """
+    now = time.perf_counter()
+    STAGE_LATENCY.labels(name).observe(now - started)
+    return now
+
+
+def render():
+    """Render the default registry in the Prometheus text format"""
+    return REGISTRY.render()
@@ -0,0 +1,215 @@
+"""
+On-demand sampling profiler
+Samples the Python stacks of every thread of this process from a background
+thread and writes them as collapsed stacks ("thread;outer;...;inner count"
+per line), the input format of flamegraph.pl and speedscope
+
+Nothing runs while the profiler is idle: the sampling thread only exists
+during a profile, and the per-request hook is one attribute check.
+"""
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusy(Exception):
+    """A profile is already running"""
+
+
+class SamplingProfiler:
+    """
+    Stack sampler that runs for a number of seconds and/or requests
+
+    Stacks are counted by their code objects and only turned into text when
+    the profile is written, so a sample costs a frame walk per thread. The
+    time spent sampling is measured and reported as overhead.
+
+    Args:
+        output_dir (str): Directory the .folded files are written to
+        max_seconds (float): Upper bound on a profile's duration
+        default_interval (float): Seconds between samples
+    """
+
+    def __init__(self, output_dir, max_seconds=300, default_interval=0.01):
+        self.output_dir = output_dir
+        self.max_seconds = max_seconds
+        self.default_interval = default_interval
+
+        self.running = False
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self.deadline = None
+        self.max_requests = None
+        self.requests = 0
+        self.interval = default_interval
+        self.last_profile = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+
+    def start(self, seconds=None, requests=None, interval=None):
+        """
+        Start profiling in the background
+
+        Stops after `seconds`, after `requests` finished requests, or at
+        max_seconds, whichever comes first.
+
+        Args:
+            seconds (float): Duration (default 30 when requests is not given)
+            requests (int): Number of requests to profile
+            interval (float): Seconds between samples (0.001 - 1)
+
+        Returns:
+            dict: Profiler status
+
+        Raises:
+            ValueError: If an argument is out of range
+            ProfilerBusy: If a profile is already running
+        """
+        if seconds is None and requests is None:
+            seconds = 30
+        seconds = self.max_seconds if seconds is None else float(seconds)
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be in (0, {self.max_seconds}]")
+        if requests is not None:
+            requests = int(requests)
+            if requests <= 0:
+                raise ValueError("requests must be positive")
+        interval = self.default_interval if interval is None else float(interval)
+        if not 0.001 <= interval <= 1:
+            raise ValueError("interval must be between 0.001 and 1 seconds")
+
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("A profile is already running")
+            self.counts = collections.Counter()
+            self.samples = 0
+            self.sampling_seconds = 0.0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.deadline = time.monotonic() + seconds
+            self.max_requests = requests
+            self.requests = 0
+            self.interval = interval
+            self._stop.clear()
+            self.running = True
+            self._worker = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._worker.start()
+        return self.status()
+
+    def stop(self):
+        """
+        Stop a running profile and wait until it is written
+
+        Returns:
+            dict: Profiler status
+        """
+        worker = self._worker
+        self._stop.set()
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+        return self.status()
+
+    def request_finished(self):
+        """Count a finished request; ends the profile once max_requests are done"""
+        with self._lock:
+            self.requests += 1
+            done = self.max_requests is not None and self.requests >= self.max_requests
+        if done:
+            self._stop.set()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                self._sample()
+                if time.monotonic() >= self.deadline:
+                    break
+            self.finished_at = time.time()
+            self.last_profile = self._write()
+            logger.info("✓ Wrote profile %s (%d samples)", self.last_profile['path'], self.samples)
+        except OSError as e:
+            logger.error("Could not write profile: %s", e)
+        finally:
+            self.running = False
+
+    def _sample(self):
+        """Count the current stack of every other thread"""
+        started = time.perf_counter()
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self.counts[(ident, tuple(codes))] += 1
+        self.samples += 1
+        self.sampling_seconds += time.perf_counter() - started
+
+    def _write(self):
+        """
+        Write the collected stacks as a collapsed-stack file
+
+        Returns:
+            dict: Path and summary of the written profile
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        labels = {}
+        lines = collections.Counter()
+        for (ident, codes), count in self.counts.items():
+            frames = [names.get(ident, f'thread-{ident}')]
+            for code in reversed(codes):
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = (f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+                                            f'{code.co_firstlineno})').replace(';', ':')
+                frames.append(label)
+            lines[';'.join(frames)] += count
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        started = datetime.fromtimestamp(self.started_at)
+        path = os.path.join(self.output_dir, f"profile-{os.getpid()}-{started.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in lines.most_common():
+                f.write(f'{stack} {count}\n')
+
+        return {
+            'path': path,
+            'startedAt': started.isoformat(),
+            'seconds': round(self.finished_at - self.started_at, 3),
+            'samples': self.samples,
+            'requests': self.requests,
+            'stacks': len(lines)
+        }
+
+    def status(self):
+        """
+        Get the state of the current or last profile
+
+        Returns:
+            dict: running, pid, samples, requests, overheadPercent, and the
+                last written profile
+        """
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            'running': self.running,
+            'pid': os.getpid(),
+            'intervalSeconds': self.interval,
+            'samples': self.samples,
+            'requests': self.requests,
+            'maxRequests': self.max_requests,
+            'remainingSeconds': round(max(0.0, self.deadline - time.monotonic()), 1) if self.running else None,
+            'overheadPercent': round(100 * self.sampling_seconds / elapsed, 2) if elapsed > 0 else None,
+            'lastProfile': self.last_profile
+        }